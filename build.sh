@@ -5,3 +5,9 @@ python -m pip install --upgrade pip
 pip install -r requirements.txt
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
+
+# Imports, exports and campaign sends are queued as background jobs; every
+# deploy also needs a worker process running `python manage.py run_worker`
+# (see Procfile) or those jobs stay queued. The worker also runs the periodic
+# maintenance in core/maintenance.py: applying received payment webhooks and
+# releasing stock held by abandoned online checkouts.
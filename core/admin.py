@@ -18,4 +18,16 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'created_at', 'is_read']
     list_filter = ['is_read', 'created_at']
     search_fields = ['name', 'email', 'message']
-    readonly_fields = ['created_at']
\ No newline at end of file
+    readonly_fields = ['created_at']
+
+@admin.register(ShippingZone)
+class ShippingZoneAdmin(admin.ModelAdmin):
+    list_display = ['pincode_prefix', 'name', 'rate', 'active']
+    list_editable = ['name', 'rate', 'active']
+    search_fields = ['pincode_prefix', 'name']
+
+
+@admin.register(ShippingDistanceBand)
+class ShippingDistanceBandAdmin(admin.ModelAdmin):
+    list_display = ['id', 'up_to_km', 'base_rate', 'per_km_rate', 'active']
+    list_editable = ['up_to_km', 'base_rate', 'per_km_rate', 'active']
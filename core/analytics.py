@@ -0,0 +1,150 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import DailySalesRollup, Order
+
+
+logger = logging.getLogger('core.analytics')
+
+ANALYTICS_RANGES = {'7d': 7, '30d': 30, '90d': 90, '365d': 365}
+ANALYTICS_GRANULARITIES = ('day', 'week', 'month')
+REFRESH_LOCK_TIMEOUT = 60
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='analytics-refresh')
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def build_sales_series(range_key, granularity, end=None):
+    """Revenue, units and completed orders per bucket over the range ending on ``end``.
+
+    Weeks start on Monday. Buckets with no sales are included as zeros so
+    charts keep an even axis.
+    """
+    end = end or timezone.localdate()
+    start = end - timedelta(days=ANALYTICS_RANGES[range_key] - 1)
+
+    buckets = {}
+    bucket = _bucket_start(start, granularity)
+    while bucket <= end:
+        buckets[bucket] = {'start': bucket.isoformat(), 'revenue': 0.0, 'units': 0, 'orders': 0}
+        bucket = _next_bucket(bucket, granularity)
+
+    sales = (
+        DailySalesRollup.objects.filter(date__range=(start, end))
+        .annotate(bucket=Trunc('date', granularity))
+        .values('bucket')
+        .annotate(revenue=Sum('revenue'), units=Sum('quantity'))
+        .order_by()
+    )
+    for row in sales:
+        buckets[row['bucket']].update(revenue=float(row['revenue'] or 0), units=row['units'] or 0)
+
+    # A plain datetime range (not __date) so order_complete_date_idx is used.
+    orders = (
+        Order.objects.filter(
+            complete=True,
+            date_ordered__gte=_start_of_day(start),
+            date_ordered__lt=_start_of_day(end + timedelta(days=1)),
+        )
+        .annotate(bucket=Trunc('date_ordered', granularity, output_field=DateField()))
+        .values('bucket')
+        .annotate(orders=Count('pk'))
+        .order_by()
+    )
+    for row in orders:
+        buckets[row['bucket']]['orders'] = row['orders']
+
+    series = list(buckets.values())
+    return {
+        'range': range_key,
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'buckets': series,
+        'totals': {
+            'revenue': round(sum(item['revenue'] for item in series), 2),
+            'units': sum(item['units'] for item in series),
+            'orders': sum(item['orders'] for item in series),
+        },
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def _series_key(range_key, granularity, end):
+    return f'core:analytics:sales:{range_key}:{granularity}:{end.isoformat()}'
+
+
+def _store_series(key, range_key, granularity, end):
+    payload = build_sales_series(range_key, granularity, end)
+    entry = {'payload': payload, 'fresh_until': time.time() + settings.ANALYTICS_FRESH_SECONDS}
+    cache.set(key, entry, settings.ANALYTICS_CACHE_TIMEOUT)
+    return payload
+
+
+def _refresh_series(key, range_key, granularity, end):
+    try:
+        _store_series(key, range_key, granularity, end)
+    except Exception:
+        logger.exception('Could not refresh analytics series %s', key)
+    finally:
+        cache.delete(f'{key}:refreshing')
+
+
+def _refresh_in_background(key, range_key, granularity, end):
+    try:
+        _refresh_series(key, range_key, granularity, end)
+    finally:
+        # Pool threads open their own connections; don't leave them dangling.
+        connections.close_all()
+
+
+def get_sales_series(range_key, granularity):
+    """Return (payload, state) for a sales series, state being 'fresh', 'stale' or 'miss'.
+
+    Series are cached per range, granularity and the day the range ends on.
+    A stale entry is still returned straight away; one caller per key wins
+    the refresh lock and recomputes it off the request thread. Only a cold
+    key is computed inline.
+    """
+    end = timezone.localdate()
+    key = _series_key(range_key, granularity, end)
+    entry = cache.get(key)
+    if entry is None:
+        return _store_series(key, range_key, granularity, end), 'miss'
+    if entry['fresh_until'] > time.time():
+        return entry['payload'], 'fresh'
+
+    if cache.add(f'{key}:refreshing', True, REFRESH_LOCK_TIMEOUT):
+        if settings.ANALYTICS_BACKGROUND_REFRESH:
+            _refresh_pool.submit(_refresh_in_background, key, range_key, granularity, end)
+        else:
+            _refresh_series(key, range_key, granularity, end)
+    return entry['payload'], 'stale'
@@ -0,0 +1,149 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Product, SiteSetting
+
+
+SITE_SETTINGS_VERSION_KEY = 'core:site_settings:version'
+
+# Per-process copies are reloaded after this many seconds even if the stamp
+# hasn't moved, which bounds staleness should the cache backend not be shared.
+LOCAL_COPY_MAX_AGE = 60
+
+# Per-process copy of the settings row, tagged with the shared version stamp
+# it was loaded under. Workers compare stamps instead of hitting the database.
+_site_settings_local = {'version': None, 'obj': None, 'loaded_at': 0}
+
+
+def _new_version_stamp():
+    return time.time_ns()
+
+
+def local_copy_is_current(local, version):
+    return (
+        local['version'] == version
+        and version is not None
+        and time.monotonic() - local['loaded_at'] < LOCAL_COPY_MAX_AGE
+    )
+
+
+def site_settings_version():
+    version = cache.get(SITE_SETTINGS_VERSION_KEY)
+    if version is None:
+        # The stamp was evicted (or never set); publish a fresh one so every
+        # worker treats its local copy as stale exactly once.
+        cache.add(SITE_SETTINGS_VERSION_KEY, _new_version_stamp(), None)
+        version = cache.get(SITE_SETTINGS_VERSION_KEY)
+    return version
+
+
+def get_cached_site_settings():
+    version = site_settings_version()
+    settings_obj = _site_settings_local['obj']
+    if settings_obj is not None and local_copy_is_current(_site_settings_local, version):
+        return settings_obj
+
+    settings_obj, created = SiteSetting.objects.get_or_create(id=1)
+    if created:
+        # Creating the row fires the invalidation signal; adopt its stamp.
+        version = site_settings_version()
+    _site_settings_local['version'] = version
+    _site_settings_local['obj'] = settings_obj
+    _site_settings_local['loaded_at'] = time.monotonic()
+    return settings_obj
+
+
+def invalidate_site_settings():
+    cache.set(SITE_SETTINGS_VERSION_KEY, _new_version_stamp(), None)
+    _site_settings_local['version'] = None
+    _site_settings_local['obj'] = None
+
+
+HOME_CACHE_VERSION_KEY = 'core:home:version'
+HOME_SECTION_TIMEOUT = 60 * 15
+
+
+def home_cache_version():
+    version = cache.get(HOME_CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(HOME_CACHE_VERSION_KEY, _new_version_stamp(), None)
+        version = cache.get(HOME_CACHE_VERSION_KEY)
+    return version
+
+
+def get_home_section(section, builder):
+    """Return the cached data for one home page section, building it on a miss."""
+    key = f'core:home:{section}:{home_cache_version()}'
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, HOME_SECTION_TIMEOUT)
+    return value
+
+
+def invalidate_home_sections():
+    # Bumping the stamp orphans every section key at once; stale entries
+    # simply age out of the cache.
+    cache.set(HOME_CACHE_VERSION_KEY, _new_version_stamp(), None)
+
+
+PRICE_SNAPSHOT_TIMEOUT = 30
+
+
+def _price_snapshot_key(product_id):
+    return f'core:price:{product_id}'
+
+
+def get_price_snapshots(product_ids):
+    """Return {product_id: snapshot} for purchasable products.
+
+    Snapshots (name, price, free stock) live in the cache for a short TTL;
+    misses are loaded together in one query. Products that are missing or
+    unavailable are cached too, so repeated quotes don't re-query them.
+    """
+    keys = {_price_snapshot_key(product_id): product_id for product_id in set(product_ids)}
+    if not keys:
+        return {}
+
+    snapshots = {keys[key]: value for key, value in cache.get_many(list(keys)).items()}
+    missing = [product_id for product_id in keys.values() if product_id not in snapshots]
+    if missing:
+        fresh = {product_id: {'available': False} for product_id in missing}
+        rows = Product.objects.filter(pk__in=missing).values_list(
+            'pk', 'name', 'price', 'stock', 'reserved', 'available'
+        )
+        for product_id, name, price, stock, reserved, available in rows:
+            fresh[product_id] = {
+                'available': available,
+                'name': name,
+                'price': str(price),
+                'available_stock': max(stock - reserved, 0),
+            }
+        cache.set_many(
+            {_price_snapshot_key(product_id): value for product_id, value in fresh.items()},
+            PRICE_SNAPSHOT_TIMEOUT,
+        )
+        snapshots.update(fresh)
+
+    return {product_id: value for product_id, value in snapshots.items() if value['available']}
+
+
+def invalidate_price_snapshots(product_ids):
+    cache.delete_many([_price_snapshot_key(product_id) for product_id in product_ids])
+
+
+SHIPPING_RATES_VERSION_KEY = 'core:shipping:version'
+
+
+def shipping_rates_version():
+    version = cache.get(SHIPPING_RATES_VERSION_KEY)
+    if version is None:
+        cache.add(SHIPPING_RATES_VERSION_KEY, _new_version_stamp(), None)
+        version = cache.get(SHIPPING_RATES_VERSION_KEY)
+    return version
+
+
+def invalidate_shipping_rates():
+    # Each process rebuilds its in-memory rate index when it sees the new stamp.
+    cache.set(SHIPPING_RATES_VERSION_KEY, _new_version_stamp(), None)
@@ -1,6 +1,5 @@
-from .models import SiteSetting
+from .caching import get_cached_site_settings
 
 
 def site_settings(request):
-    settings_obj, _ = SiteSetting.objects.get_or_create(id=1)
-    return {'site_settings': settings_obj}
+    return {'site_settings': get_cached_site_settings()}
@@ -0,0 +1,346 @@
+import re
+import zipfile
+import zlib
+from decimal import Decimal, InvalidOperation
+from xml.sax.saxutils import escape as xml_escape
+
+
+def format_export_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+# ------------------ PDF ------------------
+
+PDF_LINES_PER_PAGE = 42
+PDF_LINE_WIDTH = 95
+
+
+def wrap_pdf_line(text, width=PDF_LINE_WIDTH):
+    text = text or ''
+    words = text.split()
+    if not words:
+        return ['']
+
+    lines = []
+    current = words[0]
+
+    for word in words[1:]:
+        candidate = f'{current} {word}'
+        if len(candidate) <= width:
+            current = candidate
+        else:
+            lines.append(current)
+            current = word
+
+    lines.append(current)
+    return lines
+
+
+def pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+class StreamingPdfWriter:
+    """Write a plain-text table PDF page by page.
+
+    Objects are emitted as soon as a page fills up and their byte offsets are
+    recorded on the way out, so the document is produced in linear time and
+    only one page of text is buffered at a time. Object 1 is the catalog,
+    2 the page tree (written last, once every page is known) and 3 the font.
+    """
+
+    CATALOG = 1
+    PAGES = 2
+    FONT = 3
+
+    def __init__(self, compress=True, lines_per_page=PDF_LINES_PER_PAGE):
+        self.compress = compress
+        self.lines_per_page = lines_per_page
+        self._position = 0
+        self._offsets = {}
+        self._next_object = self.FONT + 1
+        self._page_objects = []
+
+    def _emit(self, data):
+        self._position += len(data)
+        return data
+
+    def _object(self, number, body):
+        self._offsets[number] = self._position
+        return self._emit(f'{number} 0 obj\n'.encode('latin-1') + body + b'\nendobj\n')
+
+    def _allocate(self):
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def _page(self, lines):
+        operations = ['BT', '/F1 10 Tf', '40 780 Td', '14 TL']
+        for line_index, line in enumerate(lines):
+            safe_line = pdf_escape(line)
+            operations.append(f'({safe_line}) Tj' if line_index == 0 else f'T* ({safe_line}) Tj')
+        operations.append('ET')
+        content = '\n'.join(operations).encode('latin-1', errors='replace')
+
+        content_number = self._allocate()
+        page_number = self._allocate()
+        self._page_objects.append(page_number)
+
+        if self.compress:
+            content = zlib.compress(content)
+            stream_header = f'<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'
+        else:
+            stream_header = f'<< /Length {len(content)} >>\nstream\n'
+
+        return self._object(
+            content_number,
+            stream_header.encode('latin-1') + content + b'\nendstream',
+        ) + self._object(
+            page_number,
+            (
+                f'<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 612 792] '
+                f'/Resources << /Font << /F1 {self.FONT} 0 R >> >> '
+                f'/Contents {content_number} 0 R >>'
+            ).encode('latin-1'),
+        )
+
+    def iter_lines(self, lines):
+        """Yield the PDF as byte chunks (one per page) for an iterable of text lines."""
+        yield self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield self._object(self.FONT, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+
+        page_lines = []
+        for line in lines:
+            page_lines.append(line)
+            if len(page_lines) == self.lines_per_page:
+                yield self._page(page_lines)
+                page_lines = []
+        if page_lines or not self._page_objects:
+            yield self._page(page_lines or ['No data available'])
+
+        kids = ' '.join(f'{number} 0 R' for number in self._page_objects)
+        tail = [
+            self._object(self.PAGES, f'<< /Type /Pages /Kids [{kids}] /Count {len(self._page_objects)} >>'.encode('latin-1')),
+            self._object(self.CATALOG, f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>'.encode('latin-1')),
+        ]
+
+        xref_start = self._position
+        size = self._next_object
+        xref = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        xref.extend(f'{self._offsets[number]:010} 00000 n \n' for number in range(1, size))
+        xref.append(f'trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref_start}\n%%EOF')
+        tail.append(''.join(xref).encode('latin-1'))
+        yield b''.join(tail)
+
+
+def iter_table_lines(title, headers, rows):
+    header_line = ' | '.join(headers)
+    yield title
+    yield ''
+    yield header_line
+    yield '-' * min(110, max(20, len(header_line)))
+    for row in rows:
+        yield from wrap_pdf_line(' | '.join(format_export_value(value) for value in row))
+
+
+def iter_table_pdf(title, headers, rows, compress=True):
+    return StreamingPdfWriter(compress=compress).iter_lines(iter_table_lines(title, headers, rows))
+
+
+# ------------------ XLSX ------------------
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+XLSX_ROWS_PER_CHUNK = 500
+# Long free text (descriptions, URLs) is rarely repeated, so it is written
+# inline rather than growing the shared string table.
+XLSX_SHARED_STRING_MAX_LENGTH = 64
+
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/sharedStrings.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '<Relationship Id="rId3" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+        'Target="sharedStrings.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+class _ZipSink:
+    """Write-only target for ZipFile; bytes are collected until drained."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _xlsx_column(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_text(value):
+    return xml_escape(_XML_ILLEGAL_RE.sub('', value))
+
+
+def _xlsx_sheet_name(title):
+    cleaned = re.sub(r'[\[\]:*?/\\]', ' ', title or 'Export').strip()
+    return _xlsx_text(cleaned[:31] or 'Export')
+
+
+class XlsxWriter:
+    """Dependency-free single-sheet XLSX writer that streams the zip archive.
+
+    Worksheet rows are deflated into the archive as they are produced; the
+    shared string table is written last, once every short string is known.
+    """
+
+    def __init__(self, numeric_columns=()):
+        self.numeric_columns = set(numeric_columns)
+        self._shared = {}
+
+    def _shared_index(self, text):
+        index = self._shared.get(text)
+        if index is None:
+            index = self._shared[text] = len(self._shared)
+        return index
+
+    def _cell(self, reference, value, numeric, style=''):
+        if value is None or value == '':
+            return ''
+        if numeric and not isinstance(value, bool):
+            try:
+                number = Decimal(str(value))
+            except (InvalidOperation, ValueError):
+                number = None
+            if number is not None and number.is_finite():
+                return f'<c r="{reference}"{style}><v>{number}</v></c>'
+
+        text = format_export_value(value)
+        if len(text) > XLSX_SHARED_STRING_MAX_LENGTH:
+            return f'<c r="{reference}" t="inlineStr"{style}><is><t xml:space="preserve">{_xlsx_text(text)}</t></is></c>'
+        return f'<c r="{reference}" t="s"{style}><v>{self._shared_index(text)}</v></c>'
+
+    def _row(self, number, values, numeric_flags, style=''):
+        cells = ''.join(
+            self._cell(f'{_xlsx_column(index)}{number}', value, numeric_flags[index] if index < len(numeric_flags) else False, style)
+            for index, value in enumerate(values)
+        )
+        return f'<row r="{number}">{cells}</row>'
+
+    def iter_bytes(self, title, headers, rows):
+        sink = _ZipSink()
+        archive = zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED)
+
+        for name, body in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, body)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{_xlsx_sheet_name(title)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield sink.drain()
+
+        numeric_flags = [header in self.numeric_columns for header in headers]
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" state="frozen"/>'
+                '</sheetView></sheetViews><sheetData>'
+                + self._row(1, headers, [False] * len(headers), ' s="1"')
+            ).encode('utf-8'))
+
+            buffer = []
+            for row_number, row in enumerate(rows, start=2):
+                buffer.append(self._row(row_number, row, numeric_flags))
+                if len(buffer) >= XLSX_ROWS_PER_CHUNK:
+                    sheet.write(''.join(buffer).encode('utf-8'))
+                    buffer = []
+                    data = sink.drain()
+                    if data:
+                        yield data
+            sheet.write((''.join(buffer) + '</sheetData></worksheet>').encode('utf-8'))
+        yield sink.drain()
+
+        with archive.open('xl/sharedStrings.xml', mode='w', force_zip64=True) as shared:
+            shared.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                f'count="{len(self._shared)}" uniqueCount="{len(self._shared)}">'
+            ).encode('utf-8'))
+            for text in self._shared:
+                shared.write(f'<si><t xml:space="preserve">{_xlsx_text(text)}</t></si>'.encode('utf-8'))
+            shared.write(b'</sst>')
+        archive.close()
+        yield sink.drain()
+
+
+def iter_table_xlsx(title, headers, rows, numeric_columns=()):
+    return XlsxWriter(numeric_columns=numeric_columns).iter_bytes(title, headers, rows)
@@ -0,0 +1,124 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def _request_hash(request):
+    if request.content_type == 'application/json':
+        body = request.body
+    else:
+        # Multipart boundaries change between retries, so hash the fields instead.
+        fields = sorted((name, request.POST.getlist(name)) for name in request.POST if name != 'csrfmiddlewaretoken')
+        body = json.dumps(fields).encode()
+    return hashlib.sha256(body).hexdigest()
+
+
+def _error(message, status):
+    return JsonResponse({'success': False, 'status': 'error', 'error': message}, status=status)
+
+
+def _is_abandoned(record, now):
+    # An in-flight claim whose lease ran out belongs to a worker that died.
+    # Claims made before leases existed have none and count as abandoned.
+    return record.status_code is None and (record.locked_until is None or record.locked_until <= now)
+
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return _error('This idempotency key was already used for a different request.', 422)
+    if record.status_code is None:
+        # Still in flight; once its lease runs out the retry takes the claim over.
+        response = _error('This request is still being processed. Please wait a moment.', 409)
+        response['Retry-After'] = '1'
+        return response
+    response = JsonResponse(record.response, status=record.status_code, safe=False)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(user, scope, key, request_hash):
+    """Return (record, created): our new claim on the key, or the live record already stored under it.
+
+    A retry costs a single lookup on the unique (user, scope, key) index.
+    Expired keys and abandoned in-flight claims are replaced.
+    """
+    lookup = {'user': user, 'scope': scope, 'key': key}
+    now = timezone.now()
+    existing = IdempotencyKey.objects.filter(**lookup).first()
+    if existing is not None:
+        if existing.expires_at > now and not _is_abandoned(existing, now):
+            return existing, False
+        existing.delete()
+
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                request_hash=request_hash,
+                locked_until=now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+                **lookup,
+            )
+    except IntegrityError:
+        # A concurrent request with the same key won the insert.
+        return IdempotencyKey.objects.filter(**lookup).first(), False
+    return record, True
+
+
+def idempotent(scope, key_func=None):
+    """Replay the stored response when a request is retried with the same key.
+
+    The key comes from the ``Idempotency-Key`` header, or ``key_func(request)``
+    when the header is absent. Only successful responses are stored (for
+    ``IDEMPOTENCY_KEY_TTL`` seconds); failures free the key so a corrected
+    retry runs again. A claim still in flight after ``IDEMPOTENCY_LOCK_TIMEOUT``
+    seconds is treated as abandoned and can be claimed again. Requests without
+    a key are passed straight through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = (request.headers.get(IDEMPOTENCY_HEADER) or '').strip()
+            if not key and key_func:
+                key = (key_func(request) or '').strip()
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return _error('Idempotency key is too long.', 400)
+
+            request_hash = _request_hash(request)
+            claimed, created = _claim(request.user, scope, key, request_hash)
+            if not created:
+                return _replay(claimed, request_hash)
+
+            # By pk, so a worker that outlived its lease can't touch a newer claim.
+            record = IdempotencyKey.objects.filter(pk=claimed.pk)
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+
+            if isinstance(response, JsonResponse) and 200 <= response.status_code < 300:
+                record.update(status_code=response.status_code, response=json.loads(response.content))
+            else:
+                record.delete()
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys(now=None):
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,246 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .caching import invalidate_home_sections, invalidate_price_snapshots
+from .models import Category, Product
+
+
+IMPORT_BATCH_SIZE = 500
+TRUE_VALUES = ('1', 'True', 'true', 'yes', 'Yes')
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.updated_ids = []
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.errors.append({'row': row_number, 'error': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated, 'errors': self.errors}
+
+
+def _field(row, *names):
+    for name in names:
+        value = row.get(name)
+        if value not in (None, ''):
+            return value.strip()
+    return ''
+
+
+def _parse_row(row_number, row, result):
+    """Validate one CSV row; returns a dict of cleaned values or None."""
+    pid = _field(row, 'id', 'ID')
+    price = _field(row, 'price', 'Price')
+    stock = _field(row, 'stock', 'Stock')
+    cleaned = {
+        'row': row_number,
+        'id': None,
+        'name': _field(row, 'name', 'Name'),
+        'slug': _field(row, 'slug', 'Slug'),
+        'category': _field(row, 'category', 'Category'),
+        'price': None,
+        'stock': 0,
+        'available': _field(row, 'available', 'Available') in TRUE_VALUES,
+        'description': _field(row, 'description', 'Description'),
+    }
+
+    if pid:
+        try:
+            cleaned['id'] = int(pid)
+        except ValueError:
+            result.add_error(row_number, f'Invalid id "{pid}".')
+            return None
+    if price:
+        try:
+            cleaned['price'] = Decimal(price)
+        except InvalidOperation:
+            result.add_error(row_number, f'Invalid price "{price}".')
+            return None
+        if not cleaned['price'].is_finite() or cleaned['price'] < 0:
+            result.add_error(row_number, f'Invalid price "{price}".')
+            return None
+    if stock:
+        try:
+            cleaned['stock'] = int(stock)
+        except ValueError:
+            result.add_error(row_number, f'Invalid stock "{stock}".')
+            return None
+        if cleaned['stock'] < 0:
+            result.add_error(row_number, 'Stock cannot be negative.')
+            return None
+    return cleaned
+
+
+class _SlugAllocator:
+    """Hands out unique slugs for a model, checking the database once per batch."""
+
+    def __init__(self, model):
+        self.model = model
+        self.taken = set()
+
+    def reserve_existing(self, slugs):
+        slugs = {slug for slug in slugs if slug and slug not in self.taken}
+        if slugs:
+            self.taken.update(self.model.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+
+    def prefetch(self, names):
+        bases = {slugify(name) for name in names if name}
+        self.reserve_existing(bases)
+        colliding = [base for base in bases if base in self.taken]
+        if colliding:
+            query = Q()
+            for base in colliding:
+                query |= Q(slug__startswith=f'{base}-')
+            self.taken.update(self.model.objects.filter(query).values_list('slug', flat=True))
+
+    def allocate(self, name):
+        base_slug = slugify(name) or 'item'
+        slug = base_slug
+        counter = 1
+        while slug in self.taken:
+            slug = f'{base_slug}-{counter}'
+            counter += 1
+        self.taken.add(slug)
+        return slug
+
+
+def _resolve_categories(names, category_map, category_slugs):
+    missing = [name for name in names if name not in category_map]
+    if missing:
+        for category in Category.objects.filter(name__in=missing).order_by('-id'):
+            category_map[category.name] = category
+    missing = [name for name in dict.fromkeys(names) if name not in category_map]
+    if missing:
+        category_slugs.prefetch(missing)
+        created = Category.objects.bulk_create([
+            Category(name=name, slug=category_slugs.allocate(name)) for name in missing
+        ])
+        category_map.update({category.name: category for category in created})
+
+
+def _apply_batch(batch, result, category_map, category_slugs, product_slugs):
+    _resolve_categories([row['category'] for row in batch if row['category']], category_map, category_slugs)
+
+    existing = Product.objects.in_bulk([row['id'] for row in batch if row['id']])
+    product_slugs.reserve_existing([row['slug'] for row in batch])
+    product_slugs.prefetch([row['name'] for row in batch if not row['slug']])
+
+    now = timezone.now()
+    to_create = []
+    to_update = {}
+
+    for row in batch:
+        category = category_map.get(row['category']) if row['category'] else None
+        product = existing.get(row['id']) if row['id'] else None
+
+        if product:
+            if row['slug'] and row['slug'] != product.slug:
+                if row['slug'] in product_slugs.taken:
+                    result.add_error(row['row'], f'Slug "{row["slug"]}" is already in use.')
+                    continue
+                product_slugs.taken.add(row['slug'])
+                product.slug = row['slug']
+            product.name = row['name'] or product.name
+            if category:
+                product.category = category
+            product.price = row['price'] or product.price
+            product.stock = row['stock']
+            product.available = row['available']
+            product.description = row['description']
+            product.updated_at = now
+            to_update[product.id] = product
+            continue
+
+        if not row['name']:
+            result.add_error(row['row'], 'Name is required for new products.')
+            continue
+        if not category:
+            result.add_error(row['row'], 'Category is required for new products.')
+            continue
+
+        if row['slug']:
+            if row['slug'] in product_slugs.taken:
+                result.add_error(row['row'], f'Slug "{row["slug"]}" is already in use.')
+                continue
+            product_slugs.taken.add(row['slug'])
+            slug = row['slug']
+        else:
+            slug = product_slugs.allocate(row['name'])
+
+        to_create.append(Product(
+            name=row['name'],
+            slug=slug,
+            category=category,
+            price=row['price'] or 0,
+            stock=row['stock'],
+            description=row['description'],
+            available=row['available'],
+        ))
+
+    if to_create:
+        Product.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+        result.created += len(to_create)
+    if to_update:
+        Product.objects.bulk_update(
+            list(to_update.values()),
+            ['name', 'slug', 'category', 'price', 'stock', 'available', 'description', 'updated_at'],
+            batch_size=IMPORT_BATCH_SIZE,
+        )
+        result.updated += len(to_update)
+        result.updated_ids.extend(to_update)
+
+
+def import_products_csv(binary_file, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Import products from a CSV file object opened in binary mode.
+
+    CSV headers: id,name,slug,category,price,stock,available,description
+    ``progress`` is called with the number of rows read after every batch.
+    """
+    result = ImportResult()
+    text_stream = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text_stream)
+
+    category_map = {}
+    category_slugs = _SlugAllocator(Category)
+    product_slugs = _SlugAllocator(Product)
+
+    try:
+        with transaction.atomic():
+            batch = []
+            rows_read = 0
+            # Row 1 is the header, so data rows start at 2.
+            for row_number, row in enumerate(reader, start=2):
+                rows_read += 1
+                cleaned = _parse_row(row_number, row, result)
+                if cleaned:
+                    batch.append(cleaned)
+                if len(batch) >= batch_size:
+                    _apply_batch(batch, result, category_map, category_slugs, product_slugs)
+                    batch = []
+                    if progress:
+                        progress(rows_read)
+            if batch:
+                _apply_batch(batch, result, category_map, category_slugs, product_slugs)
+            if progress:
+                progress(rows_read)
+    finally:
+        # Don't let the wrapper close the underlying upload.
+        text_stream.detach()
+
+    # bulk_create/bulk_update skip model signals, so refresh cached sections
+    # and the price snapshots of updated products here.
+    if result.created or result.updated:
+        invalidate_home_sections()
+    if result.updated_ids:
+        invalidate_price_snapshots(result.updated_ids)
+    return result
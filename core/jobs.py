@@ -0,0 +1,188 @@
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .imports import import_products_csv
+from .models import Campaign, Customer, Job
+
+
+logger = logging.getLogger(__name__)
+
+# Kinds that are mostly CPU (PDF/XLSX rendering) and go to the worker's process pool.
+PROCESS_POOL_KINDS = {'export'}
+MAX_ATTEMPTS = 3
+CAMPAIGN_BATCH_SIZE = 100
+
+
+def job_storage():
+    """Private storage for job files; see JOB_FILES_ROOT."""
+    return storages['job_files']
+
+
+def enqueue_job(kind, payload=None, user=None):
+    return Job.objects.create(kind=kind, payload=payload or {}, created_by=user)
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running; safe with several workers."""
+    candidates = Job.objects.filter(status='queued').order_by('id').values_list('id', flat=True)[:20]
+    for job_id in candidates:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running',
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def requeue_stale_jobs(max_age):
+    """Jobs left running by a worker that died are retried, up to MAX_ATTEMPTS.
+
+    A job counts as dead once it has gone ``max_age`` without a heartbeat,
+    however long ago it started.
+    """
+    cutoff = timezone.now() - max_age
+    stale = Job.objects.alias(last_seen=Coalesce('heartbeat_at', 'started_at')).filter(
+        status='running', last_seen__lt=cutoff,
+    )
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='failed',
+        error='Worker stopped before the job finished.',
+        finished_at=timezone.now(),
+    )
+    requeued = stale.update(status='queued', started_at=None, heartbeat_at=None)
+    return requeued, failed
+
+
+def purge_job_files(max_age=None):
+    """Delete export files older than ``max_age`` (JOB_FILES_TTL). Returns how many were removed."""
+    cutoff = timezone.now() - (max_age or timedelta(seconds=settings.JOB_FILES_TTL))
+    expired = Job.objects.filter(kind='export', finished_at__lt=cutoff, result__has_key='path').only('pk', 'result')
+    purged = 0
+    for job in expired.iterator():
+        job_storage().delete(job.result['path'])
+        result = {key: value for key, value in job.result.items() if key != 'path'}
+        Job.objects.filter(pk=job.pk).update(result=result)
+        purged += 1
+    return purged
+
+
+def _progress_reporter(job_id):
+    """``report(progress, total=None, checkpoint=None)`` for a handler.
+
+    A ``checkpoint`` is saved as the job's result so a retried job can pick
+    up where the last attempt stopped.
+    """
+    def report(progress, total=None, checkpoint=None):
+        fields = {'progress': progress, 'heartbeat_at': timezone.now()}
+        if total is not None:
+            fields['total'] = total
+        if checkpoint is not None:
+            fields['result'] = checkpoint
+        Job.objects.filter(pk=job_id).update(**fields)
+    return report
+
+
+def _import_products(job, report):
+    path = job.payload['path']
+    try:
+        with job_storage().open(path, 'rb') as upload:
+            result = import_products_csv(upload, progress=report)
+    finally:
+        job_storage().delete(path)
+    return result.as_dict()
+
+
+def _export(job, report):
+    from .views import render_export
+
+    filename, content_type, chunks = render_export(job.payload['section'], job.payload['format'], progress=report)
+    with tempfile.TemporaryFile() as spool:
+        for chunk in chunks:
+            spool.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        spool.seek(0)
+        path = job_storage().save(f'exports/{job.id}/{filename}', File(spool, name=filename))
+    return {'path': path, 'filename': filename, 'content_type': content_type}
+
+
+def _send_campaign(job, report):
+    if not settings.CAMPAIGN_EMAILS_ENABLED:
+        raise RuntimeError('Campaign emails are disabled (CAMPAIGN_EMAILS_ENABLED).')
+    campaign = Campaign.objects.get(pk=job.payload['campaign_id'])
+    recipients = Customer.objects.exclude(email='').order_by('email').values_list('email', flat=True).distinct()
+    total = recipients.count()
+
+    # Recipients go out in email order and each batch is checkpointed, so a
+    # retry after a worker died resumes after the last batch it delivered.
+    checkpoint = job.result or {}
+    sent = checkpoint.get('sent', 0)
+    if checkpoint.get('last_email'):
+        recipients = recipients.filter(email__gt=checkpoint['last_email'])
+    report(sent, total)
+
+    batch = []
+    with get_connection() as connection:
+        for email in recipients.iterator(chunk_size=CAMPAIGN_BATCH_SIZE * 10):
+            batch.append(EmailMessage(campaign.subject, campaign.content, to=[email], connection=connection))
+            if len(batch) >= CAMPAIGN_BATCH_SIZE:
+                sent += connection.send_messages(batch) or 0
+                report(sent, checkpoint={'sent': sent, 'last_email': email})
+                batch = []
+        if batch:
+            sent += connection.send_messages(batch) or 0
+    report(sent)
+
+    campaign.status = 'Sent'
+    campaign.sent_date = timezone.now()
+    campaign.save(update_fields=['status', 'sent_date'])
+    return {'sent': sent, 'recipients': total}
+
+
+JOB_HANDLERS = {
+    'import_products': _import_products,
+    'export': _export,
+    'campaign_send': _send_campaign,
+}
+
+
+def run_job(job_id):
+    """Run a claimed job and record its outcome. Returns the final status."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        result = JOB_HANDLERS[job.kind](job, _progress_reporter(job.pk))
+    except Exception as exc:
+        logger.exception('Background job %s failed', job_id)
+        Job.objects.filter(pk=job_id).update(
+            status='failed',
+            error=str(exc)[:2000] or exc.__class__.__name__,
+            finished_at=timezone.now(),
+        )
+        return 'failed'
+
+    Job.objects.filter(pk=job_id).update(status='done', result=result or {}, finished_at=timezone.now())
+    return 'done'
+
+
+def init_worker_process():
+    """ProcessPoolExecutor initializer: make sure Django is set up without inherited DB connections."""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+    for connection in connections.all(initialized_only=True):
+        # The socket belongs to the parent; drop it instead of closing it.
+        connection.connection = None
@@ -0,0 +1,80 @@
+import logging
+import time
+
+from django.core.cache import cache
+
+from .idempotency import purge_expired_keys
+from .jobs import purge_job_files
+from .orderfeed import prune_order_changes
+from .stock import release_expired_reservations, resync_reserved_counts
+from .webhooks import process_payment_events
+
+
+logger = logging.getLogger(__name__)
+
+
+def _release_expired_reservations():
+    released = release_expired_reservations()
+    fixed = resync_reserved_counts()
+    if released or fixed:
+        return f'Released {released} expired reservation(s); corrected {fixed} product counter(s).'
+    return ''
+
+
+def _process_payment_events():
+    outcomes = process_payment_events()
+    if not outcomes:
+        return ''
+    summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items()))
+    return f'Processed {sum(outcomes.values())} payment event(s): {summary}.'
+
+
+def _prune_order_changes():
+    deleted = prune_order_changes()
+    return f'Pruned {deleted} order change(s).' if deleted else ''
+
+
+def _purge_idempotency_keys():
+    deleted = purge_expired_keys()
+    return f'Purged {deleted} expired idempotency key(s).' if deleted else ''
+
+
+def _purge_job_files():
+    purged = purge_job_files()
+    return f'Deleted {purged} expired export file(s).' if purged else ''
+
+
+# name -> (interval in seconds, task). A task returns a line for the worker log, or ''.
+PERIODIC_TASKS = {
+    'release_expired_reservations': (60, _release_expired_reservations),
+    'process_payment_events': (10, _process_payment_events),
+    'prune_order_changes': (60 * 60, _prune_order_changes),
+    'purge_idempotency_keys': (60 * 60, _purge_idempotency_keys),
+    'purge_job_files': (60 * 60, _purge_job_files),
+}
+
+
+def run_periodic_tasks(last_run, clock=time.monotonic):
+    """Run the periodic tasks that are due and return their log lines.
+
+    ``last_run`` is the caller's {name: clock()} of tasks it already ran.
+    Workers sharing the cache take turns: a task runs at most once per
+    interval across all of them. A failing task is logged and retried on
+    its next turn.
+    """
+    lines = []
+    now = clock()
+    for name, (interval, task) in PERIODIC_TASKS.items():
+        if name in last_run and now - last_run[name] < interval:
+            continue
+        last_run[name] = now
+        if not cache.add(f'core:periodic:{name}', True, interval):
+            continue
+        try:
+            line = task()
+        except Exception:
+            logger.exception('Periodic task %s failed', name)
+            continue
+        if line:
+            lines.append(line)
+    return lines
@@ -0,0 +1,161 @@
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from core.exports import format_export_value, iter_table_pdf, pdf_escape, wrap_pdf_line
+
+
+HEADERS = ['ID', 'Product', 'SKU', 'Category', 'Stock', 'Status', 'Available', 'Last Updated']
+
+
+def legacy_build_simple_pdf(title, headers, rows):
+    """The pre-streaming exporter, kept verbatim as the benchmark baseline."""
+    pdf_lines = [title, '', ' | '.join(headers), '-' * min(110, max(20, len(' | '.join(headers))))]
+
+    for row in rows:
+        row_text = ' | '.join(format_export_value(value) for value in row)
+        pdf_lines.extend(wrap_pdf_line(row_text))
+
+    page_chunks = [pdf_lines[index:index + 42] for index in range(0, len(pdf_lines), 42)] or [['No data available']]
+    page_objects = []
+    content_objects = []
+
+    for page_index, page_lines in enumerate(page_chunks):
+        operations = ['BT', '/F1 10 Tf', '40 780 Td', '14 TL']
+        for line_index, line in enumerate(page_lines):
+            safe_line = pdf_escape(line)
+            if line_index == 0:
+                operations.append(f'({safe_line}) Tj')
+            else:
+                operations.append(f'T* ({safe_line}) Tj')
+        operations.append('ET')
+        content_stream = '\n'.join(operations)
+
+        page_object_number = 3 + (page_index * 2)
+        content_object_number = page_object_number + 1
+
+        page_objects.append(
+            f"{page_object_number} 0 obj\n"
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {3 + len(page_chunks) * 2} 0 R >> >> "
+            f"/Contents {content_object_number} 0 R >>\n"
+            "endobj\n"
+        )
+        content_objects.append(
+            f"{content_object_number} 0 obj\n"
+            f"<< /Length {len(content_stream.encode('latin-1', errors='replace'))} >>\n"
+            "stream\n"
+            f"{content_stream}\n"
+            "endstream\n"
+            "endobj\n"
+        )
+
+    font_object_number = 3 + len(page_chunks) * 2
+    objects = [
+        "1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
+        (
+            "2 0 obj\n"
+            f"<< /Type /Pages /Kids [{' '.join(f'{3 + (idx * 2)} 0 R' for idx in range(len(page_chunks)))}] "
+            f"/Count {len(page_chunks)} >>\n"
+            "endobj\n"
+        ),
+    ]
+
+    for page_object, content_object in zip(page_objects, content_objects):
+        objects.append(page_object)
+        objects.append(content_object)
+
+    objects.append(
+        f"{font_object_number} 0 obj\n"
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>\n"
+        "endobj\n"
+    )
+
+    pdf = b'%PDF-1.4\n'
+    offsets = [0]
+
+    for obj in objects:
+        offsets.append(len(pdf))
+        pdf += obj.encode('latin-1', errors='replace')
+
+    xref_start = len(pdf)
+    pdf += f"xref\n0 {len(offsets)}\n".encode('latin-1')
+    pdf += b"0000000000 65535 f \n"
+
+    for offset in offsets[1:]:
+        pdf += f"{offset:010} 00000 n \n".encode('latin-1')
+
+    pdf += (
+        f"trailer\n<< /Size {len(offsets)} /Root 1 0 R >>\n"
+        f"startxref\n{xref_start}\n%%EOF"
+    ).encode('latin-1')
+    return pdf
+
+
+def synthetic_rows(count):
+    updated = datetime(2026, 1, 1, 10, 30)
+    for index in range(count):
+        stock = index % 25
+        yield [
+            index,
+            f'Handcrafted Piece {index}',
+            f'SKU-{index}00X',
+            'Woodwork',
+            stock,
+            'In Stock' if stock > 10 else 'Low Stock' if stock else 'Out of Stock',
+            'Yes',
+            updated,
+        ]
+
+
+def run_legacy(count):
+    return len(legacy_build_simple_pdf('Inventory Export', HEADERS, list(synthetic_rows(count))))
+
+
+def run_streaming(count, compress):
+    size = 0
+    for chunk in iter_table_pdf('Inventory Export', HEADERS, synthetic_rows(count), compress=compress):
+        size += len(chunk)
+    return size
+
+
+class Command(BaseCommand):
+    help = 'Compare the legacy in-memory PDF exporter with the streaming writer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--memory', action='store_true', help='Also record peak Python allocations (slower).')
+
+    def _measure(self, func, *args, memory=False):
+        if memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        size = func(*args)
+        elapsed = time.perf_counter() - started
+        peak = None
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return elapsed, size, peak
+
+    def handle(self, *args, **options):
+        memory = options['memory']
+        header = f"{'rows':>8}  {'writer':<18}{'seconds':>10}{'bytes':>14}"
+        if memory:
+            header += f"{'peak MiB':>10}"
+        self.stdout.write(header)
+
+        for count in options['rows']:
+            runs = [
+                ('legacy', run_legacy, (count,)),
+                ('streaming', run_streaming, (count, False)),
+                ('streaming+flate', run_streaming, (count, True)),
+            ]
+            for label, func, func_args in runs:
+                elapsed, size, peak = self._measure(func, *func_args, memory=memory)
+                line = f'{count:>8}  {label:<18}{elapsed:>10.3f}{size:>14,}'
+                if memory:
+                    line += f'{peak / (1024 * 1024):>10.1f}'
+                self.stdout.write(line)
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.webhooks import EVENT_BATCH_SIZE, process_payment_events
+
+
+class Command(BaseCommand):
+    help = 'Apply received Razorpay webhook events, finalizing paid orders in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=EVENT_BATCH_SIZE)
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep running and process new events every N seconds instead of exiting.')
+
+    def process(self, batch_size):
+        outcomes = process_payment_events(batch_size=batch_size)
+        if outcomes:
+            summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items()))
+            self.stdout.write(f'Processed {sum(outcomes.values())} payment event(s): {summary}.')
+
+    def handle(self, *args, **options):
+        self.process(options['batch_size'])
+        while options['every'] > 0:
+            time.sleep(options['every'])
+            self.process(options['batch_size'])
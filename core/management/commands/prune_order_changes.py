@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.orderfeed import prune_order_changes
+
+
+class Command(BaseCommand):
+    help = 'Delete order feed changes older than ORDER_FEED_RETENTION_SECONDS (run daily).'
+
+    def handle(self, *args, **options):
+        deleted = prune_order_changes()
+        self.stdout.write(f'Pruned {deleted} order change(s).')
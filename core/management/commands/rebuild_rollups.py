@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import REBUILD_BATCH_SIZE, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups behind the admin dashboard and analytics from completed orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        created = rebuild_rollups(batch_size=options['batch_size'])
+        self.stdout.write(f'Rebuilt {created} daily sales rollup row(s).')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.search import fts_available, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite FTS5 catalog search index from products, categories and gallery items.'
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING('Full-text index is only used on SQLite; nothing to rebuild.'))
+            return
+
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt with {count} documents.'))
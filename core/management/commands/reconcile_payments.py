@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.reconcile import RECONCILE_PAGE_SIZE, RECONCILE_WORKERS, reconcile_payments
+
+
+class Command(BaseCommand):
+    help = 'Finalize paid and expire abandoned online orders by checking them against the payment gateway.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=RECONCILE_PAGE_SIZE)
+        parser.add_argument('--workers', type=int, default=RECONCILE_WORKERS,
+                            help='Concurrent gateway lookups.')
+        parser.add_argument('--min-age', type=float, default=15,
+                            help='Skip orders placed less than N minutes ago.')
+        parser.add_argument('--expire-after', type=float, default=24 * 60,
+                            help='Cancel unpaid orders older than N minutes.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing anything.')
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"  ...{stats['checked']} checked")
+
+        stats = reconcile_payments(
+            page_size=options['page_size'],
+            workers=options['workers'],
+            min_age=timedelta(minutes=options['min_age']),
+            expire_after=timedelta(minutes=options['expire_after']),
+            dry_run=options['dry_run'],
+            progress=progress,
+        )
+        prefix = '[dry run] ' if options['dry_run'] else ''
+        self.stdout.write(
+            f"{prefix}Checked {stats['checked']} order(s) in {stats['seconds']:.2f}s "
+            f"({stats['per_second']:.1f}/s): {stats['paid']} paid, {stats['expired']} expired, "
+            f"{stats['unpaid']} still unpaid, {stats['errors']} gateway error(s)."
+        )
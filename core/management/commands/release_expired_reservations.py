@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.stock import release_expired_reservations, resync_reserved_counts
+
+
+class Command(BaseCommand):
+    help = 'Release stock held by abandoned online checkouts (run every minute or so).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep running and sweep every N seconds instead of exiting.')
+
+    def sweep(self):
+        released = release_expired_reservations()
+        fixed = resync_reserved_counts()
+        if released or fixed:
+            self.stdout.write(f'Released {released} expired reservation(s); corrected {fixed} product counter(s).')
+
+    def handle(self, *args, **options):
+        self.sweep()
+        while options['every'] > 0:
+            time.sleep(options['every'])
+            self.sweep()
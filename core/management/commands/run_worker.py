@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from core.jobs import PROCESS_POOL_KINDS, claim_next_job, init_worker_process, requeue_stale_jobs, run_job
+from core.maintenance import run_periodic_tasks
+from core.models import Job
+
+
+class Command(BaseCommand):
+    help = ('Process queued background jobs (product imports, exports, campaign sends) '
+            'and run periodic maintenance such as releasing expired stock holds.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2,
+                            help='Size of the process pool used for exports; 0 runs everything in this process.')
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+        parser.add_argument('--stale-after', type=int, default=3600,
+                            help='Seconds after which a running job is assumed orphaned and requeued.')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit.')
+        parser.add_argument('--no-periodic', action='store_true',
+                            help="Don't run periodic maintenance tasks (when they are scheduled elsewhere).")
+
+    def _new_pool(self, processes):
+        if processes <= 0:
+            return None
+        return ProcessPoolExecutor(max_workers=processes, initializer=init_worker_process)
+
+    def _collect(self, in_flight):
+        broken = False
+        for future in [future for future in in_flight if future.done()]:
+            job_id = in_flight.pop(future)
+            try:
+                status = future.result()
+            except BrokenProcessPool as exc:
+                Job.objects.filter(pk=job_id, status='running').update(
+                    status='failed', error=f'Worker process died: {exc}', finished_at=timezone.now()
+                )
+                status = 'failed'
+                broken = True
+            self.stdout.write(f'Job #{job_id}: {status}')
+        return broken
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        requeued, failed = requeue_stale_jobs(timedelta(seconds=options['stale_after']))
+        if requeued or failed:
+            self.stdout.write(f'Requeued {requeued} stale job(s), failed {failed}.')
+
+        pool = self._new_pool(processes)
+        in_flight = {}
+        last_run = {}
+        try:
+            while True:
+                if not options['once'] and not options['no_periodic']:
+                    for line in run_periodic_tasks(last_run):
+                        self.stdout.write(line)
+                if self._collect(in_flight) and pool:
+                    pool.shutdown(wait=False)
+                    pool = self._new_pool(processes)
+
+                job = claim_next_job() if len(in_flight) < max(processes, 1) else None
+                if job is None:
+                    if options['once'] and not in_flight:
+                        break
+                    if in_flight:
+                        wait(list(in_flight), timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    else:
+                        time.sleep(options['poll_interval'])
+                    continue
+
+                if pool and job.kind in PROCESS_POOL_KINDS:
+                    # Forked children must not share this process's DB connections.
+                    connections.close_all()
+                    in_flight[pool.submit(run_job, job.id)] = job.id
+                else:
+                    self.stdout.write(f'Job #{job.id}: {run_job(job.id)}')
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping; waiting for running jobs to finish.')
+        finally:
+            if pool:
+                pool.shutdown(wait=True)
+            self._collect(in_flight)
@@ -0,0 +1,147 @@
+from django.db import migrations
+
+
+# Rows are keyed by rowid = object_id * 4 + kind code (1 product, 2 category,
+# 3 gallery item) so triggers can update a single document by rowid instead
+# of scanning the UNINDEXED columns.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS core_search_index USING fts5(
+        kind UNINDEXED,
+        object_id UNINDEXED,
+        title,
+        body,
+        category,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_product_ai AFTER INSERT ON core_product
+    WHEN NEW.available
+    BEGIN
+        INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+        VALUES (
+            NEW.id * 4 + 1, 'product', NEW.id, NEW.name, NEW.description,
+            (SELECT name FROM core_category WHERE id = NEW.category_id)
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_product_au
+    AFTER UPDATE OF name, description, category_id, available ON core_product
+    BEGIN
+        DELETE FROM core_search_index WHERE rowid = OLD.id * 4 + 1;
+        INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+        SELECT
+            NEW.id * 4 + 1, 'product', NEW.id, NEW.name, NEW.description,
+            (SELECT name FROM core_category WHERE id = NEW.category_id)
+        WHERE NEW.available;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_product_ad AFTER DELETE ON core_product
+    BEGIN
+        DELETE FROM core_search_index WHERE rowid = OLD.id * 4 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_category_ai AFTER INSERT ON core_category
+    BEGIN
+        INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+        VALUES (NEW.id * 4 + 2, 'category', NEW.id, NEW.name, '', NEW.name);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_category_au AFTER UPDATE OF name ON core_category
+    BEGIN
+        DELETE FROM core_search_index WHERE rowid = OLD.id * 4 + 2;
+        INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+        VALUES (NEW.id * 4 + 2, 'category', NEW.id, NEW.name, '', NEW.name);
+        UPDATE core_search_index SET category = NEW.name
+        WHERE rowid IN (SELECT id * 4 + 1 FROM core_product WHERE category_id = NEW.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_category_ad AFTER DELETE ON core_category
+    BEGIN
+        DELETE FROM core_search_index WHERE rowid = OLD.id * 4 + 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_gallery_ai AFTER INSERT ON core_galleryitem
+    BEGIN
+        INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+        VALUES (NEW.id * 4 + 3, 'gallery', NEW.id, NEW.title, '', NEW.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_gallery_au AFTER UPDATE OF title, category ON core_galleryitem
+    BEGIN
+        DELETE FROM core_search_index WHERE rowid = OLD.id * 4 + 3;
+        INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+        VALUES (NEW.id * 4 + 3, 'gallery', NEW.id, NEW.title, '', NEW.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS core_search_gallery_ad AFTER DELETE ON core_galleryitem
+    BEGIN
+        DELETE FROM core_search_index WHERE rowid = OLD.id * 4 + 3;
+    END
+    """,
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS core_search_product_ai',
+    'DROP TRIGGER IF EXISTS core_search_product_au',
+    'DROP TRIGGER IF EXISTS core_search_product_ad',
+    'DROP TRIGGER IF EXISTS core_search_category_ai',
+    'DROP TRIGGER IF EXISTS core_search_category_au',
+    'DROP TRIGGER IF EXISTS core_search_category_ad',
+    'DROP TRIGGER IF EXISTS core_search_gallery_ai',
+    'DROP TRIGGER IF EXISTS core_search_gallery_au',
+    'DROP TRIGGER IF EXISTS core_search_gallery_ad',
+    'DROP TABLE IF EXISTS core_search_index',
+]
+
+POPULATE_SQL = [
+    """
+    INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+    SELECT p.id * 4 + 1, 'product', p.id, p.name, p.description, c.name
+    FROM core_product p LEFT JOIN core_category c ON c.id = p.category_id
+    WHERE p.available
+    """,
+    """
+    INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+    SELECT id * 4 + 2, 'category', id, name, '', name FROM core_category
+    """,
+    """
+    INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+    SELECT id * 4 + 3, 'gallery', id, title, '', category FROM core_galleryitem
+    """,
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SQL + POPULATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:46
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+search_index = import_module('core.migrations.0015_catalog_search_index')
+SEARCH_TRIGGERS_CREATE = search_index.CREATE_SQL[1:]
+SEARCH_TRIGGERS_DROP = [sql for sql in search_index.DROP_SQL if sql.startswith('DROP TRIGGER')]
+
+
+# SQLite rebuilds core_product to add a column, and the rename at the end of
+# that rebuild fails while the search index triggers reference the table.
+def drop_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SEARCH_TRIGGERS_DROP:
+        schema_editor.execute(statement)
+
+
+def create_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SEARCH_TRIGGERS_CREATE:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_background_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='product',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='reservation_expires_idx')],
+            },
+        ),
+    ]
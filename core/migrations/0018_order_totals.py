@@ -0,0 +1,82 @@
+# Generated by Django 6.0.1 on 2026-10-17 17:48
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum
+
+
+BATCH_SIZE = 500
+
+
+def backfill_order_totals(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    Product = apps.get_model('core', 'Product')
+
+    # Historic lines only know the product's current price.
+    OrderItem.objects.filter(product__isnull=False).update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('price')[:1])
+    )
+
+    # Tax and shipping were never stored, so historic totals are the line
+    # subtotal, which is what the order pages showed until now.
+    line_totals = (
+        OrderItem.objects.filter(order__isnull=False)
+        .values('order_id')
+        .annotate(subtotal=Sum(F('quantity') * F('unit_price')), item_count=Sum('quantity'))
+        .order_by('order_id')
+    )
+    batch = []
+    for row in line_totals.iterator(chunk_size=BATCH_SIZE):
+        subtotal = row['subtotal'] or 0
+        batch.append(Order(
+            pk=row['order_id'],
+            subtotal=subtotal,
+            total=subtotal,
+            item_count=max(row['item_count'] or 0, 0),
+        ))
+        if len(batch) >= BATCH_SIZE:
+            Order.objects.bulk_update(batch, ['subtotal', 'total', 'item_count'])
+            batch = []
+    if batch:
+        Order.objects.bulk_update(batch, ['subtotal', 'total', 'item_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='shipping',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tax',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_order_totals, migrations.RunPython.noop),
+    ]
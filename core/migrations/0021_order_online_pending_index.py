@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_payment_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('complete', False), ('payment_method', 'ONLINE')), fields=['id'], name='order_online_pending_idx'),
+        ),
+    ]
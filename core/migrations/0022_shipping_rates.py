@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+def seed_distance_bands(apps, schema_editor):
+    # The rule checkout used to hard-code: up to 10 km is Rs.30, beyond is Rs.5 per km.
+    ShippingDistanceBand = apps.get_model('core', 'ShippingDistanceBand')
+    ShippingDistanceBand.objects.bulk_create([
+        ShippingDistanceBand(up_to_km=10, base_rate=30, per_km_rate=0),
+        ShippingDistanceBand(up_to_km=None, base_rate=0, per_km_rate=5),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_order_online_pending_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShippingDistanceBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('up_to_km', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True, unique=True)),
+                ('base_rate', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('per_km_rate', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': [models.OrderBy(models.F('up_to_km'), nulls_last=True)],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShippingZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('pincode_prefix', models.CharField(max_length=6, unique=True)),
+                ('rate', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['pincode_prefix'],
+            },
+        ),
+        migrations.RunPython(seed_distance_bands, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-17 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_shipping_rates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-date_ordered', '-id'], name='order_customer_date_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-17 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    DailySalesRollup = apps.get_model('core', 'DailySalesRollup')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    rows = (
+        OrderItem.objects.filter(order__complete=True)
+        .annotate(day=TruncDate('order__date_ordered'))
+        .values('day', 'product_id', 'product__category_id', 'order__payment_method')
+        .annotate(quantity_total=Sum('quantity'), revenue_total=Sum(F('quantity') * F('unit_price')))
+        .order_by()
+    )
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(
+            date=row['day'],
+            product_id=row['product_id'],
+            category_id=row['product__category_id'],
+            payment_method=row['order__payment_method'],
+            quantity=row['quantity_total'] or 0,
+            revenue=row['revenue_total'] or 0,
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_order_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('payment_method', models.CharField(max_length=20)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.category')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'product', 'category', 'payment_method'], name='sales_rollup_key_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -22,6 +22,8 @@ class Product(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
+    # Units held by unpaid online checkouts; kept in step with StockReservation.
+    reserved = models.PositiveIntegerField(default=0)
     available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -29,6 +31,18 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def available_stock(self):
+        return max(self.stock - self.reserved, 0)
+
+    class Meta:
+        indexes = [
+            # Shop listing: keyset pagination over (created_at, id) per category.
+            models.Index(fields=['available', 'category', 'created_at'], name='product_avail_cat_created_idx'),
+            models.Index(fields=['available', 'created_at'], name='product_avail_created_idx'),
+            models.Index(fields=['available', 'price'], name='product_avail_price_idx'),
+        ]
+
 # --- 3. CUSTOMER MODEL (Extends User) ---
 class Customer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
@@ -65,32 +79,52 @@ class Order(models.Model):
     razorpay_order_id = models.CharField(max_length=120, blank=True, null=True)
     razorpay_payment_id = models.CharField(max_length=120, blank=True, null=True)
 
+    # Snapshot of build_checkout_totals taken when the order is placed.
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    shipping = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return str(self.id)
 
     @property
     def get_cart_total(self):
-        orderitems = self.orderitem_set.all()
-        total = sum([item.get_total for item in orderitems])
-        return total
+        return self.subtotal
 
     @property
     def get_cart_items(self):
-        orderitems = self.orderitem_set.all()
-        total = sum([item.quantity for item in orderitems])
-        return total
+        return self.item_count
+
+    class Meta:
+        indexes = [
+            # reconcile_payments pages through unpaid online orders by id.
+            models.Index(
+                fields=['id'],
+                condition=models.Q(payment_method='ONLINE', complete=False),
+                name='order_online_pending_idx',
+            ),
+            # my_orders pages through a customer's history newest first.
+            models.Index(fields=['customer', '-date_ordered', '-id'], name='order_customer_date_idx'),
+            # The admin order list filters by status or confirmation, newest first.
+            models.Index(fields=['status', '-date_ordered', '-id'], name='order_status_date_idx'),
+            models.Index(fields=['complete', '-date_ordered', '-id'], name='order_complete_date_idx'),
+            # Payment verification, webhooks and admin search look orders up by gateway id.
+            models.Index(fields=['razorpay_order_id'], name='order_razorpay_id_idx'),
+        ]
 
 # --- 5. ORDER ITEM MODEL ---
 class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True)
     quantity = models.IntegerField(default=0, null=True, blank=True)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     date_added = models.DateTimeField(auto_now_add=True)
 
     @property
     def get_total(self):
-        total = self.product.price * self.quantity
-        return total
+        return self.unit_price * (self.quantity or 0)
 
 # --- 6. SHIPPING ADDRESS MODEL ---
 class ShippingAddress(models.Model):
@@ -280,3 +314,176 @@ class AboutPage(models.Model):
 
     class Meta:
         verbose_name_plural = "About Page Settings"
+
+
+# --- 12. BACKGROUND JOB MODEL ---
+class Job(models.Model):
+    KIND_CHOICES = (
+        ('import_products', 'Product Import'),
+        ('export', 'Export'),
+        ('campaign_send', 'Campaign Send'),
+    )
+
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched on every progress report so long jobs aren't mistaken for dead ones.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Workers poll for the oldest queued job.
+            models.Index(fields=['status', 'id'], name='job_status_id_idx'),
+        ]
+
+
+# --- 13. STOCK RESERVATION MODEL ---
+class StockReservation(models.Model):
+    order = models.ForeignKey(Order, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order #{self.order_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+
+# --- 14. IDEMPOTENCY KEY MODEL ---
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, related_name='idempotency_keys', on_delete=models.CASCADE)
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    # Empty until the first request finishes; a retry arriving meanwhile gets a 409
+    # until locked_until, after which the claim is considered abandoned.
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} for user #{self.user_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+
+# --- 15. PAYMENT EVENT MODEL ---
+class PaymentEvent(models.Model):
+    """Raw gateway webhook deliveries, stored as received.
+
+    The webhook only ever inserts; process_payment_events stamps
+    ``processed_at``/``outcome`` once an event has been applied.
+    """
+    event_id = models.CharField(max_length=100, db_index=True)
+    body = models.TextField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, blank=True)
+
+    def __str__(self):
+        return f"Payment event {self.event_id}"
+
+    class Meta:
+        indexes = [
+            # The processor walks unprocessed events in arrival order.
+            models.Index(fields=['processed_at', 'id'], name='payment_event_pending_idx'),
+        ]
+
+
+# --- 16. SHIPPING RATE MODELS ---
+class ShippingZone(models.Model):
+    """Flat shipping rate for deliveries whose pincode starts with ``pincode_prefix``.
+
+    The longest matching prefix wins, so '3020' can override '30'.
+    """
+    name = models.CharField(max_length=100)
+    pincode_prefix = models.CharField(max_length=6, unique=True)
+    rate = models.DecimalField(max_digits=8, decimal_places=2)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.pincode_prefix}*)"
+
+    class Meta:
+        ordering = ['pincode_prefix']
+
+
+class ShippingDistanceBand(models.Model):
+    """Rate for deliveries up to ``up_to_km`` (no limit when empty): base_rate + per_km_rate * km."""
+    up_to_km = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True, unique=True)
+    base_rate = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    per_km_rate = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    active = models.BooleanField(default=True)
+
+    def __str__(self):
+        limit = f"up to {self.up_to_km} km" if self.up_to_km is not None else "beyond"
+        return f"{limit}: {self.base_rate} + {self.per_km_rate}/km"
+
+    class Meta:
+        ordering = [models.F('up_to_km').asc(nulls_last=True)]
+
+
+# --- 17. SALES ROLLUP MODEL ---
+class DailySalesRollup(models.Model):
+    """Completed-order sales summed per day, product, category and payment method.
+
+    Kept current by finalize_order/restock_order; rebuild_rollups recomputes it
+    from scratch. Readers always Sum() over it, so the occasional duplicate key
+    row from two concurrent first sales of a product is harmless.
+    """
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    payment_method = models.CharField(max_length=20)
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.date} product #{self.product_id}: {self.quantity} for {self.revenue}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'product', 'category', 'payment_method'], name='sales_rollup_key_idx'),
+        ]
+
+
+# --- 18. ORDER CHANGE MODEL ---
+class OrderChange(models.Model):
+    """Append-only log of order writes; the id is the live order feed's cursor."""
+    order = models.ForeignKey(Order, related_name='changes', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Change #{self.id} to order #{self.order_id}"
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Order, OrderChange
+
+
+ORDER_FEED_PAGE_SIZE = 25
+ORDER_FEED_BATCH_SIZE = 100
+HEARTBEAT_SECONDS = 15
+RECONNECT_MILLISECONDS = 3000
+
+
+def record_order_changes(order_ids):
+    """Log writes made with QuerySet.update(); Order.save() is logged by a signal."""
+    OrderChange.objects.bulk_create([OrderChange(order_id=order_id) for order_id in order_ids])
+
+
+def latest_change_cursor():
+    return OrderChange.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def prune_order_changes(max_age=None):
+    """Delete changes older than ``max_age`` (ORDER_FEED_RETENTION_SECONDS). Returns the count.
+
+    The window never drops below twice ORDER_FEED_MAX_SECONDS, so a connected
+    stream always reconnects to rows it hasn't seen yet. The latest change is
+    kept so ids, and therefore cursors, keep increasing.
+    """
+    max_age = max_age or timedelta(seconds=settings.ORDER_FEED_RETENTION_SECONDS)
+    max_age = max(max_age, timedelta(seconds=2 * settings.ORDER_FEED_MAX_SECONDS))
+    last_old = (
+        OrderChange.objects.filter(created_at__lt=timezone.now() - max_age, pk__lt=latest_change_cursor())
+        .order_by('-pk').values_list('pk', flat=True).first()
+    )
+    if last_old is None:
+        return 0
+    deleted, _ = OrderChange.objects.filter(pk__lte=last_old).delete()
+    return deleted
+
+
+def cursor_was_pruned(cursor):
+    """True when changes after ``cursor`` may already have been pruned.
+
+    Ids can have gaps, so this can fire spuriously; the page then just
+    reloads, which is always safe.
+    """
+    oldest = OrderChange.objects.order_by('pk').values_list('pk', flat=True).first()
+    return oldest is not None and cursor < oldest - 1
+
+
+def serialize_order(order):
+    shipping = next(iter(order.shippingaddress_set.all()), None)
+    customer = order.customer
+    return {
+        'id': order.id,
+        'status': order.status,
+        'complete': order.complete,
+        'payment_method': order.get_payment_method_display(),
+        'transaction_id': order.transaction_id or '',
+        'total': str(order.total),
+        'item_count': order.item_count,
+        'date_ordered': order.date_ordered,
+        'status_url': reverse('admin_update_order_status', args=[order.id]),
+        'customer': {
+            'name': customer.full_name if customer and customer.full_name else 'Guest Customer',
+            'email': customer.email if customer and customer.email else '',
+            'phone': customer.phone if customer and customer.phone else '',
+        },
+        'shipping': {
+            'address': shipping.address,
+            'city': shipping.city,
+            'state': shipping.state,
+            'zipcode': shipping.zipcode,
+        } if shipping else None,
+        'items': [{
+            'name': item.product.name if item.product else 'Removed product',
+            'quantity': item.quantity,
+            'line_total': str(item.get_total),
+        } for item in order.orderitem_set.all()],
+    }
+
+
+def order_changes_since(cursor, limit=ORDER_FEED_BATCH_SIZE):
+    """Return (new_cursor, deltas) for up to ``limit`` changes after ``cursor``.
+
+    Each changed order appears once, in its current state, in the order of
+    its latest change. Orders deleted since are skipped.
+    """
+    rows = list(OrderChange.objects.filter(pk__gt=cursor).order_by('pk').values_list('pk', 'order_id')[:limit])
+    if not rows:
+        return cursor, []
+
+    latest = {order_id: pk for pk, order_id in rows}
+    orders = (
+        Order.objects.filter(pk__in=latest)
+        .select_related('customer')
+        .prefetch_related('orderitem_set__product', 'shippingaddress_set')
+    )
+    by_id = {order.pk: order for order in orders}
+    changed = sorted((order_id for order_id in latest if order_id in by_id), key=latest.get)
+    return rows[-1][0], [serialize_order(by_id[order_id]) for order_id in changed]
+
+
+def format_event(cursor, deltas):
+    data = json.dumps({'cursor': cursor, 'orders': deltas}, cls=DjangoJSONEncoder)
+    return f'id: {cursor}\nevent: orders\ndata: {data}\n\n'
+
+
+def format_reset(cursor):
+    # The page has missed pruned changes and has to reload its order list.
+    return f'id: {cursor}\nevent: reset\ndata: {{}}\n\n'
+
+
+def iter_order_changes_once(cursor):
+    """One-shot response for WSGI workers, which can't hold a stream open.
+
+    The ``retry`` field makes EventSource reconnect with Last-Event-ID, so
+    the page ends up polling the change log instead.
+    """
+    yield f'retry: {RECONNECT_MILLISECONDS}\n\n'
+    if cursor_was_pruned(cursor):
+        yield format_reset(latest_change_cursor())
+        return
+    new_cursor, deltas = order_changes_since(cursor)
+    if new_cursor != cursor:
+        yield format_event(new_cursor, deltas)
+
+
+async def stream_order_changes(cursor, poll_seconds=None, max_seconds=None):
+    """Yield SSE messages as orders change, until ``max_seconds`` have passed."""
+    poll_seconds = settings.ORDER_FEED_POLL_SECONDS if poll_seconds is None else poll_seconds
+    max_seconds = settings.ORDER_FEED_MAX_SECONDS if max_seconds is None else max_seconds
+    changes_since = sync_to_async(order_changes_since)
+    started = last_sent = time.monotonic()
+
+    yield f'retry: {RECONNECT_MILLISECONDS}\n\n'
+    if await sync_to_async(cursor_was_pruned)(cursor):
+        yield format_reset(await sync_to_async(latest_change_cursor)())
+        return
+    while time.monotonic() - started < max_seconds:
+        new_cursor, deltas = await changes_since(cursor)
+        if new_cursor != cursor:
+            cursor = new_cursor
+            yield format_event(cursor, deltas)
+            last_sent = time.monotonic()
+            # Drain a backlog straight away rather than one batch per poll.
+            continue
+        if time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+            yield ': keep-alive\n\n'
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll_seconds)
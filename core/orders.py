@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+
+from .models import Order
+from .orderfeed import record_order_changes
+from .rollups import record_order_sales
+from .stock import (
+    decrement_stock, increment_stock, order_quantities, quantities_for_orders, release_order_reservations,
+    release_reservations_for_orders,
+)
+
+
+def finalize_order(order, payment_id='', strict=False):
+    """Mark ``order`` complete and take its items off stock.
+
+    ``strict`` refuses the order (InsufficientStock, nothing written) when a
+    product no longer has enough free stock. Paid orders are finalized
+    non-strictly because the payment has already been captured; any stock held
+    for them is released as it is taken.
+    """
+    if order.complete:
+        return order
+
+    fields = {'complete': True, 'status': 'Processing'}
+    if payment_id:
+        fields['razorpay_payment_id'] = payment_id
+        fields['transaction_id'] = payment_id
+    elif order.payment_method == 'COD':
+        fields['transaction_id'] = f'COD-{order.id}'
+
+    with transaction.atomic():
+        # The conditional UPDATE claims the order, so a repeated or concurrent
+        # finalize (double-submitted COD, replayed verify_payment) is a no-op.
+        if not Order.objects.filter(pk=order.pk, complete=False).update(**fields):
+            order.refresh_from_db()
+            return order
+        release_order_reservations(order)
+        decrement_stock(order_quantities(order), strict=strict)
+        record_order_sales([order.pk])
+        record_order_changes([order.pk])
+
+    for name, value in fields.items():
+        setattr(order, name, value)
+    return order
+
+
+def finalize_paid_orders(payments):
+    """Bulk finalize_order for captured online payments.
+
+    ``payments`` maps razorpay_order_id to the payment id. Orders that are
+    unknown or already complete are skipped; the razorpay_order_ids completed
+    here are returned.
+    """
+    if not payments:
+        return []
+
+    with transaction.atomic():
+        pending = dict(
+            Order.objects.select_for_update()
+            .filter(razorpay_order_id__in=payments, complete=False)
+            .values_list('pk', 'razorpay_order_id')
+        )
+        if not pending:
+            return []
+
+        payment_id = Case(
+            *[When(pk=pk, then=Value(payments[razorpay_order_id])) for pk, razorpay_order_id in pending.items()],
+            output_field=CharField(),
+        )
+        Order.objects.filter(pk__in=pending, complete=False).update(
+            complete=True, status='Processing', razorpay_payment_id=payment_id, transaction_id=payment_id,
+        )
+        release_reservations_for_orders(list(pending))
+        decrement_stock(quantities_for_orders(list(pending)))
+        record_order_sales(list(pending))
+        record_order_changes(list(pending))
+
+    return list(pending.values())
+
+
+def restock_order(order):
+    if not order.complete:
+        return order
+
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, complete=True).update(complete=False):
+            order.refresh_from_db()
+            return order
+        increment_stock(order_quantities(order))
+        record_order_sales([order.pk], sign=-1)
+        record_order_changes([order.pk])
+
+    order.complete = False
+    return order
@@ -0,0 +1,361 @@
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from itertools import count
+
+import razorpay
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from razorpay.errors import BadRequestError, GatewayError, ServerError
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger('core.payments')
+
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, GatewayError, ServerError)
+
+
+class PaymentGatewayError(Exception):
+    pass
+
+
+class GatewayUnavailable(PaymentGatewayError):
+    """The gateway kept failing or the circuit breaker is open; try again later."""
+
+
+def _sign(secret, message):
+    if isinstance(message, str):
+        message = message.encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class CircuitBreaker:
+    """Fail fast after ``failure_threshold`` consecutive failed calls.
+
+    Once open, calls are refused until ``reset_timeout`` seconds pass; then a
+    single probe call is let through and its outcome closes or re-opens the
+    circuit. State is per process.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+
+
+class TimeoutSession(requests.Session):
+    """Keep-alive session with a connection pool and a default timeout on every request."""
+
+    def __init__(self, timeout, pool_size=10):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
+
+
+class Gateway:
+    """Retry, backoff and circuit breaking shared by every gateway backend.
+
+    Transient failures (connection errors, timeouts, 5xx) are retried up to
+    ``retries`` times with full-jitter exponential backoff, but never past
+    ``max_call_seconds`` in total: a retry is skipped when its backoff plus
+    a full ``attempt_timeout`` would overrun that budget. Retrying an order
+    create can leave an extra Razorpay order behind; it is never paid and
+    simply expires. Bad requests are raised straight away and don't count
+    against the breaker, since the gateway itself answered. Anything else
+    (e.g. an unreadable response) counts as a failure.
+    """
+
+    name = ''
+    # Longest a single attempt can block for; backends with network timeouts set it.
+    attempt_timeout = 0
+
+    def __init__(self, key_id, key_secret, webhook_secret='', retries=2, backoff=0.25, max_backoff=2.0, breaker=None,
+                 max_call_seconds=None, sleep=time.sleep, clock=time.monotonic):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.webhook_secret = webhook_secret
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.max_call_seconds = max_call_seconds
+        self.sleep = sleep
+        self.clock = clock
+
+    @property
+    def configured(self):
+        return True
+
+    def _delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def _within_budget(self, started, delay):
+        if self.max_call_seconds is None:
+            return True
+        return self.clock() - started + delay + self.attempt_timeout <= self.max_call_seconds
+
+    def _call(self, operation, func, *args):
+        if not self.breaker.allow():
+            raise GatewayUnavailable('Payment gateway is temporarily unavailable. Please try again shortly.')
+
+        started = self.clock()
+        attempt = 0
+        while True:
+            try:
+                result = func(*args)
+            except BadRequestError as exc:
+                self.breaker.record_success()
+                raise PaymentGatewayError(str(exc)) from exc
+            except TRANSIENT_ERRORS as exc:
+                if attempt < self.retries:
+                    delay = self._delay(attempt + 1)
+                    if self._within_budget(started, delay):
+                        attempt += 1
+                        logger.warning('%s %s failed (%s); retry %s of %s', self.name, operation, exc, attempt,
+                                       self.retries)
+                        self.sleep(delay)
+                        continue
+                self.breaker.record_failure()
+                raise GatewayUnavailable(f'Payment gateway {operation} failed: {exc}') from exc
+            except Exception as exc:
+                # Also releases a half-open probe, which would otherwise hold the breaker shut.
+                self.breaker.record_failure()
+                logger.exception('%s %s failed unexpectedly', self.name, operation)
+                raise PaymentGatewayError(f'Payment gateway {operation} failed: {exc}') from exc
+            self.breaker.record_success()
+            return result
+
+    def create_order(self, amount, currency='INR', receipt=''):
+        data = {'amount': amount, 'currency': currency, 'payment_capture': '1'}
+        if receipt:
+            data['receipt'] = receipt
+        return self._call('create_order', self._create_order, data)
+
+    def fetch_payment(self, payment_id):
+        return self._call('fetch_payment', self._fetch_payment, payment_id)
+
+    def fetch_order_payments(self, order_id):
+        return self._call('fetch_order_payments', self._fetch_order_payments, order_id)
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        # Checked locally against the key secret, exactly as Razorpay's SDK does.
+        expected = _sign(self.key_secret, f'{order_id}|{payment_id}')
+        return hmac.compare_digest(expected, signature or '')
+
+    def verify_webhook_signature(self, body, signature):
+        # Webhooks are signed over the raw body with the separate webhook secret.
+        if not self.webhook_secret:
+            return False
+        return hmac.compare_digest(_sign(self.webhook_secret, body), signature or '')
+
+
+class RazorpayGateway(Gateway):
+    name = 'razorpay'
+
+    def __init__(self, key_id, key_secret, timeout=(3.05, 10), pool_size=10, **options):
+        super().__init__(key_id, key_secret, **options)
+        self.attempt_timeout = sum(timeout) if isinstance(timeout, tuple) else timeout
+        self.session = TimeoutSession(timeout, pool_size)
+        # The SDK's own retry loop sleeps for up to a minute and prints; ours replaces it.
+        self.client = razorpay.Client(session=self.session, auth=(key_id, key_secret))
+
+    @property
+    def configured(self):
+        invalid_markers = {'rzp_test_YOUR_KEY_HERE', 'YOUR_SECRET_HERE', ''}
+        return self.key_id not in invalid_markers and self.key_secret not in invalid_markers
+
+    def _create_order(self, data):
+        return self.client.order.create(data)
+
+    def _fetch_payment(self, payment_id):
+        return self.client.payment.fetch(payment_id)
+
+    def _fetch_order_payments(self, order_id):
+        return self.client.order.payments(order_id)
+
+
+class FakeGateway(Gateway):
+    """In-process stand-in for Razorpay, for tests and local load runs.
+
+    ``latency`` adds a delay to every call and ``fail_next(n)`` makes the next
+    ``n`` calls raise a connection error, so timeouts, retries and the breaker
+    can be exercised without the network. ``pay(order_id)`` plays the customer
+    completing checkout and returns the fields the checkout widget posts back;
+    ``webhook(payment_id)`` builds the signed delivery Razorpay would send.
+    """
+
+    name = 'fake'
+
+    def __init__(self, key_id='rzp_test_fake', key_secret='fake_secret', webhook_secret='fake_webhook_secret', latency=0,
+                 **options):
+        super().__init__(key_id, key_secret, webhook_secret, **options)
+        self.latency = latency
+        self.orders = {}
+        self.payments = {}
+        self._ids = count(1)
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def fail_next(self, calls=1):
+        with self._lock:
+            self._failures += calls
+
+    def _tick(self):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._failures:
+                self._failures -= 1
+                raise requests.ConnectionError('Simulated gateway failure.')
+            return next(self._ids)
+
+    def _create_order(self, data):
+        order = {
+            'id': f'order_fake{self._tick():010d}',
+            'entity': 'order',
+            'amount': data['amount'],
+            'amount_paid': 0,
+            'currency': data['currency'],
+            'receipt': data.get('receipt'),
+            'status': 'created',
+            'created_at': int(time.time()),
+        }
+        self.orders[order['id']] = order
+        return dict(order)
+
+    def _fetch_payment(self, payment_id):
+        self._tick()
+        if payment_id not in self.payments:
+            raise BadRequestError('The id provided does not exist')
+        return dict(self.payments[payment_id])
+
+    def _fetch_order_payments(self, order_id):
+        self._tick()
+        items = [dict(payment) for payment in self.payments.values() if payment['order_id'] == order_id]
+        return {'entity': 'collection', 'count': len(items), 'items': items}
+
+    def pay(self, order_id, status='captured'):
+        order = self.orders[order_id]
+        payment_id = f'pay_fake{next(self._ids):010d}'
+        self.payments[payment_id] = {
+            'id': payment_id,
+            'entity': 'payment',
+            'amount': order['amount'],
+            'currency': order['currency'],
+            'status': status,
+            'order_id': order_id,
+            'created_at': int(time.time()),
+        }
+        if status == 'captured':
+            order.update(status='paid', amount_paid=order['amount'])
+        return {
+            'razorpay_order_id': order_id,
+            'razorpay_payment_id': payment_id,
+            'razorpay_signature': _sign(self.key_secret, f'{order_id}|{payment_id}'),
+        }
+
+    def webhook(self, payment_id, event='payment.captured'):
+        """Return (event_id, body, signature) for a webhook about ``payment_id``."""
+        event_id = f'evt_fake{next(self._ids):010d}'
+        body = json.dumps({
+            'entity': 'event',
+            'event': event,
+            'payload': {'payment': {'entity': self.payments[payment_id]}},
+            'created_at': int(time.time()),
+        }).encode()
+        return event_id, body, _sign(self.webhook_secret, body)
+
+
+_gateway_local = {'gateway': None}
+_gateway_lock = threading.Lock()
+
+
+def build_gateway():
+    options = {
+        'retries': settings.PAYMENT_GATEWAY_RETRIES,
+        'max_call_seconds': settings.PAYMENT_GATEWAY_MAX_CALL_SECONDS,
+        'breaker': CircuitBreaker(settings.PAYMENT_GATEWAY_BREAKER_THRESHOLD, settings.PAYMENT_GATEWAY_BREAKER_RESET),
+    }
+    if settings.PAYMENT_GATEWAY == 'fake':
+        return FakeGateway(**options)
+    return RazorpayGateway(
+        settings.RAZORPAY_KEY_ID,
+        settings.RAZORPAY_KEY_SECRET,
+        webhook_secret=settings.RAZORPAY_WEBHOOK_SECRET,
+        timeout=(settings.PAYMENT_GATEWAY_CONNECT_TIMEOUT, settings.PAYMENT_GATEWAY_READ_TIMEOUT),
+        pool_size=settings.PAYMENT_GATEWAY_POOL_SIZE,
+        **options,
+    )
+
+
+def get_gateway():
+    """Return this process's gateway, so the session pool and breaker are shared."""
+    gateway = _gateway_local['gateway']
+    if gateway is None:
+        with _gateway_lock:
+            gateway = _gateway_local['gateway']
+            if gateway is None:
+                gateway = _gateway_local['gateway'] = build_gateway()
+    return gateway
+
+
+def reset_gateway():
+    _gateway_local['gateway'] = None
+
+
+@receiver(setting_changed)
+def payment_settings_changed(setting, **kwargs):
+    if setting.startswith('PAYMENT_GATEWAY') or setting.startswith('RAZORPAY_'):
+        reset_gateway()
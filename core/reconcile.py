@@ -0,0 +1,105 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order
+from .orderfeed import record_order_changes
+from .orders import finalize_paid_orders
+from .payments import PaymentGatewayError, get_gateway
+from .stock import release_reservations_for_orders
+
+
+logger = logging.getLogger('core.reconcile')
+
+RECONCILE_PAGE_SIZE = 200
+RECONCILE_WORKERS = 8
+
+
+def pending_online_orders():
+    return Order.objects.filter(payment_method='ONLINE', complete=False, razorpay_order_id__gt='').exclude(
+        status='Cancelled'
+    )
+
+
+def _captured_payment(gateway, razorpay_order_id):
+    """Return the captured payment id for a gateway order, '' if unpaid, or None on error."""
+    try:
+        payments = gateway.fetch_order_payments(razorpay_order_id)
+    except PaymentGatewayError as exc:
+        logger.warning('Could not fetch payments for %s: %s', razorpay_order_id, exc)
+        return None
+    for payment in payments.get('items', []):
+        if payment.get('status') == 'captured':
+            return payment['id']
+    return ''
+
+
+def expire_orders(order_ids):
+    """Cancel unpaid online orders and give back the stock they were holding."""
+    with transaction.atomic():
+        expired = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, complete=False)
+            .exclude(status='Cancelled')
+            .values_list('pk', flat=True)
+        )
+        Order.objects.filter(pk__in=expired).update(status='Cancelled')
+        record_order_changes(expired)
+        release_reservations_for_orders(expired)
+    return expired
+
+
+def reconcile_payments(page_size=RECONCILE_PAGE_SIZE, workers=RECONCILE_WORKERS, min_age=timedelta(minutes=15),
+                       expire_after=timedelta(hours=24), dry_run=False, gateway=None, now=None, progress=None):
+    """Sync unpaid online orders with the gateway.
+
+    Orders are read in primary-key pages; each page is looked up on the
+    gateway by a bounded thread pool, then paid orders are finalized and
+    long-abandoned ones expired, each as one transaction per page. Orders
+    younger than ``min_age`` are left to the browser callback and webhooks.
+    ``progress(stats)`` is called after every page.
+    """
+    gateway = gateway or get_gateway()
+    now = now or timezone.now()
+    started = time.monotonic()
+    stats = {'checked': 0, 'paid': 0, 'expired': 0, 'unpaid': 0, 'errors': 0}
+
+    orders = pending_online_orders().filter(date_ordered__lte=now - min_age).order_by('pk')
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            page = list(orders.filter(pk__gt=last_pk).values_list('pk', 'razorpay_order_id', 'date_ordered')[:page_size])
+            if not page:
+                break
+            last_pk = page[-1][0]
+
+            captured = pool.map(lambda row: _captured_payment(gateway, row[1]), page)
+            paid = {}
+            stale = []
+            for (pk, razorpay_order_id, date_ordered), payment_id in zip(page, captured):
+                if payment_id is None:
+                    stats['errors'] += 1
+                elif payment_id:
+                    paid[razorpay_order_id] = payment_id
+                elif date_ordered <= now - expire_after:
+                    stale.append(pk)
+                else:
+                    stats['unpaid'] += 1
+
+            stats['checked'] += len(page)
+            if dry_run:
+                stats['paid'] += len(paid)
+                stats['expired'] += len(stale)
+            else:
+                stats['paid'] += len(finalize_paid_orders(paid))
+                stats['expired'] += len(expire_orders(stale))
+            if progress:
+                progress(stats)
+
+    stats['seconds'] = time.monotonic() - started
+    stats['per_second'] = stats['checked'] / stats['seconds'] if stats['seconds'] else 0
+    return stats
@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySalesRollup, OrderItem
+
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def _rollup_key(rollup):
+    return (rollup.date, rollup.product_id, rollup.category_id, rollup.payment_method)
+
+
+def record_order_sales(order_ids, sign=1):
+    """Add the items of ``order_ids`` to the daily rollups (``sign=-1`` takes them back out).
+
+    Call it inside the transaction that completes or reopens the orders. Sales
+    count on the day the order was placed, so a restock nets out the same row.
+    """
+    deltas = {}
+    rows = OrderItem.objects.filter(order_id__in=order_ids).values_list(
+        'order__date_ordered', 'order__payment_method', 'product_id', 'product__category_id', 'quantity', 'unit_price',
+    )
+    for placed, payment_method, product_id, category_id, quantity, unit_price in rows:
+        key = (timezone.localdate(placed), product_id, category_id, payment_method)
+        quantity = sign * (quantity or 0)
+        current_quantity, current_revenue = deltas.get(key, (0, Decimal('0')))
+        deltas[key] = (current_quantity + quantity, current_revenue + quantity * unit_price)
+    if not deltas:
+        return
+
+    existing = {}
+    candidates = DailySalesRollup.objects.select_for_update().filter(
+        date__in={key[0] for key in deltas},
+        payment_method__in={key[3] for key in deltas},
+    )
+    for rollup in candidates:
+        existing.setdefault(_rollup_key(rollup), rollup)
+
+    changed = []
+    created = []
+    for key, (quantity, revenue) in deltas.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            date, product_id, category_id, payment_method = key
+            created.append(DailySalesRollup(
+                date=date, product_id=product_id, category_id=category_id, payment_method=payment_method,
+                quantity=quantity, revenue=revenue,
+            ))
+        else:
+            rollup.quantity += quantity
+            rollup.revenue += revenue
+            changed.append(rollup)
+
+    if changed:
+        DailySalesRollup.objects.bulk_update(changed, ['quantity', 'revenue'])
+    if created:
+        DailySalesRollup.objects.bulk_create(created)
+
+
+def rebuild_rollups(batch_size=REBUILD_BATCH_SIZE):
+    """Recompute every rollup row from the completed orders."""
+    rows = (
+        OrderItem.objects.filter(order__complete=True)
+        .annotate(day=TruncDate('order__date_ordered'))
+        .values('day', 'product_id', 'product__category_id', 'order__payment_method')
+        .annotate(quantity_total=Sum('quantity'), revenue_total=Sum(F('quantity') * F('unit_price')))
+        .order_by()
+    )
+    rollups = [
+        DailySalesRollup(
+            date=row['day'],
+            product_id=row['product_id'],
+            category_id=row['product__category_id'],
+            payment_method=row['order__payment_method'],
+            quantity=row['quantity_total'] or 0,
+            revenue=row['revenue_total'] or 0,
+        )
+        for row in rows.iterator()
+    ]
+    with transaction.atomic():
+        DailySalesRollup.objects.all().delete()
+        DailySalesRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(rollups)
@@ -0,0 +1,159 @@
+import re
+
+from django.db import connection, transaction
+from django.urls import reverse
+
+from .models import Category, GalleryItem, Product
+
+
+SEARCH_KINDS = ('product', 'category', 'gallery')
+SEARCH_MAX_RESULTS = 50
+
+# bm25 weights follow the column order: kind, object_id, title, body, category.
+_RANK_EXPRESSION = 'bm25(core_search_index, 0.0, 0.0, 10.0, 1.0, 4.0)'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Same rowid scheme as the sync triggers: object_id * 4 + kind code.
+REBUILD_SQL = [
+    """
+    INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+    SELECT p.id * 4 + 1, 'product', p.id, p.name, p.description, c.name
+    FROM core_product p LEFT JOIN core_category c ON c.id = p.category_id
+    WHERE p.available
+    """,
+    """
+    INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+    SELECT id * 4 + 2, 'category', id, name, '', name FROM core_category
+    """,
+    """
+    INSERT INTO core_search_index (rowid, kind, object_id, title, body, category)
+    SELECT id * 4 + 3, 'gallery', id, title, '', category FROM core_galleryitem
+    """,
+]
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 MATCH expression with prefix matching on every term."""
+    tokens = _TOKEN_RE.findall(text or '')
+    return ' '.join(f'"{token}"*' for token in tokens[:8])
+
+
+def _ranked_hits(text, kinds, limit):
+    match = build_match_query(text)
+    if not match:
+        return []
+
+    placeholders = ', '.join(['%s'] * len(kinds))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT kind, object_id FROM core_search_index "
+            f"WHERE core_search_index MATCH %s AND kind IN ({placeholders}) "
+            f"ORDER BY {_RANK_EXPRESSION} LIMIT %s",
+            [match, *kinds, limit],
+        )
+        return [(kind, int(object_id)) for kind, object_id in cursor.fetchall()]
+
+
+def _fallback_hits(text, kinds, limit):
+    text = (text or '').strip()
+    if not text:
+        return []
+
+    querysets = {
+        'product': Product.objects.filter(available=True, name__icontains=text),
+        'category': Category.objects.filter(name__icontains=text),
+        'gallery': GalleryItem.objects.filter(title__icontains=text),
+    }
+    hits = []
+    for kind in kinds:
+        hits += [(kind, pk) for pk in querysets[kind].values_list('id', flat=True)[:limit]]
+    return hits[:limit]
+
+
+def _image_url(field):
+    try:
+        return field.url if field else ''
+    except ValueError:
+        return ''
+
+
+def _price(value):
+    return str(value) if value is not None else None
+
+
+def _serialize_hit(kind, obj):
+    if kind == 'product':
+        return {
+            'kind': 'product',
+            'id': obj.id,
+            'name': obj.name,
+            'slug': obj.slug,
+            'price': _price(obj.price),
+            'category': obj.category.name if obj.category else 'Other',
+            'image_url': _image_url(obj.image),
+            'url': reverse('product_detail', args=[obj.id]),
+        }
+    if kind == 'category':
+        return {
+            'kind': 'category',
+            'id': obj.id,
+            'name': obj.name,
+            'slug': obj.slug,
+            'image_url': _image_url(obj.image),
+            'url': f"{reverse('shop')}?category={obj.slug}",
+        }
+    return {
+        'kind': 'gallery',
+        'id': obj.id,
+        'name': obj.title,
+        'price': _price(obj.price),
+        'category': obj.category,
+        'image_url': _image_url(obj.image),
+        'url': reverse('gallery_detail', args=[obj.id]),
+    }
+
+
+def search_catalog(text, kinds=SEARCH_KINDS, limit=20):
+    """Return ranked catalog matches for ``text`` as JSON-ready dicts."""
+    kinds = [kind for kind in kinds if kind in SEARCH_KINDS] or list(SEARCH_KINDS)
+    limit = max(1, min(int(limit), SEARCH_MAX_RESULTS))
+
+    hits = _ranked_hits(text, kinds, limit) if fts_available() else _fallback_hits(text, kinds, limit)
+    if not hits:
+        return []
+
+    ids_by_kind = {}
+    for kind, object_id in hits:
+        ids_by_kind.setdefault(kind, []).append(object_id)
+
+    # One query per kind to hydrate the ranked ids.
+    objects = {}
+    if ids_by_kind.get('product'):
+        for product in Product.objects.filter(id__in=ids_by_kind['product'], available=True).select_related('category'):
+            objects[('product', product.id)] = product
+    if ids_by_kind.get('category'):
+        for category in Category.objects.filter(id__in=ids_by_kind['category']):
+            objects[('category', category.id)] = category
+    if ids_by_kind.get('gallery'):
+        for item in GalleryItem.objects.filter(id__in=ids_by_kind['gallery']):
+            objects[('gallery', item.id)] = item
+
+    return [_serialize_hit(kind, objects[(kind, object_id)]) for kind, object_id in hits if (kind, object_id) in objects]
+
+
+def rebuild_search_index():
+    """Drop every indexed document and repopulate from the catalog tables."""
+    if not fts_available():
+        return 0
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM core_search_index')
+        for statement in REBUILD_SQL:
+            cursor.execute(statement)
+        cursor.execute("INSERT INTO core_search_index (core_search_index) VALUES ('optimize')")
+        cursor.execute('SELECT COUNT(*) FROM core_search_index')
+        return cursor.fetchone()[0]
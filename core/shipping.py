@@ -0,0 +1,85 @@
+import time
+from bisect import bisect_left
+from decimal import Decimal, InvalidOperation
+
+from .caching import local_copy_is_current, shipping_rates_version
+from .models import ShippingDistanceBand, ShippingZone
+
+
+INFINITE_KM = Decimal('Infinity')
+
+
+class ShippingRateIndex:
+    """Immutable lookup tables built from the active zones and distance bands.
+
+    Pincodes resolve by longest prefix (at most six dict probes); distances by
+    binary search over the sorted band limits.
+    """
+
+    def __init__(self, zones, bands):
+        self.zones = {zone.pincode_prefix: zone.rate for zone in zones}
+        self.prefix_lengths = sorted({len(prefix) for prefix in self.zones}, reverse=True)
+        bands = sorted(bands, key=lambda band: INFINITE_KM if band.up_to_km is None else band.up_to_km)
+        self.band_limits = [INFINITE_KM if band.up_to_km is None else band.up_to_km for band in bands]
+        self.band_rates = [(band.base_rate, band.per_km_rate) for band in bands]
+
+    @classmethod
+    def load(cls):
+        return cls(ShippingZone.objects.filter(active=True), ShippingDistanceBand.objects.filter(active=True))
+
+    def zone_rate(self, pincode):
+        pincode = ''.join(ch for ch in str(pincode or '') if ch.isdigit())
+        for length in self.prefix_lengths:
+            rate = self.zones.get(pincode[:length]) if len(pincode) >= length else None
+            if rate is not None:
+                return rate
+        return None
+
+    def distance_rate(self, km):
+        if km <= 0:
+            return None
+        position = bisect_left(self.band_limits, km)
+        if position == len(self.band_limits):
+            return None
+        base_rate, per_km_rate = self.band_rates[position]
+        return base_rate + per_km_rate * km
+
+    def quote(self, pincode='', delivery_km=0):
+        """Shipping for a delivery, or None to fall back to the site's flat rate.
+
+        A configured pincode zone takes precedence over the distance bands.
+        """
+        rate = self.zone_rate(pincode)
+        if rate is None:
+            rate = self.distance_rate(_parse_km(delivery_km))
+        return rate
+
+
+def _parse_km(value):
+    try:
+        km = Decimal(str(value or 0))
+    except (InvalidOperation, ValueError):
+        return Decimal('0')
+    return km if km.is_finite() else Decimal('0')
+
+
+# Per-process index, tagged with the shared version stamp it was built under
+# and rebuilt after LOCAL_COPY_MAX_AGE regardless.
+_shipping_local = {'version': None, 'index': None, 'loaded_at': 0}
+
+
+def get_shipping_index():
+    version = shipping_rates_version()
+    index = _shipping_local['index']
+    if index is not None and local_copy_is_current(_shipping_local, version):
+        return index
+
+    index = ShippingRateIndex.load()
+    _shipping_local['version'] = version
+    _shipping_local['index'] = index
+    _shipping_local['loaded_at'] = time.monotonic()
+    return index
+
+
+def quote_shipping(pincode='', delivery_km=0):
+    return get_shipping_index().quote(pincode, delivery_km)
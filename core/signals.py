@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import (
+    invalidate_home_sections, invalidate_price_snapshots, invalidate_shipping_rates, invalidate_site_settings,
+)
+from .models import Category, Order, Product, Review, ShippingDistanceBand, ShippingZone, SiteSetting
+from .orderfeed import record_order_changes
+
+
+@receiver(post_save, sender=SiteSetting)
+@receiver(post_delete, sender=SiteSetting)
+def site_settings_changed(sender, **kwargs):
+    invalidate_site_settings()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def home_content_changed(sender, **kwargs):
+    invalidate_home_sections()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_price_changed(sender, instance, **kwargs):
+    invalidate_price_snapshots([instance.pk])
+
+
+@receiver(post_save, sender=ShippingZone)
+@receiver(post_delete, sender=ShippingZone)
+@receiver(post_save, sender=ShippingDistanceBand)
+@receiver(post_delete, sender=ShippingDistanceBand)
+def shipping_rates_changed(sender, **kwargs):
+    invalidate_shipping_rates()
+
+
+@receiver(post_save, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    record_order_changes([instance.pk])
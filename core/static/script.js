@@ -53,6 +53,8 @@ if (currentUser !== 'guest') {
 let cart = parseStorage(cartKey);
 let wishlist = parseStorage(wishlistKey);
 let toastSequence = 0;
+let cartQuote = null;
+let cartQuoteTimer = null;
 
 const toastPalette = [
     ['#0f766e', '#14b8a6'],
@@ -220,10 +222,12 @@ function renderCartPage() {
 
     const taxRate = parseFloat(page.dataset.taxRate || '0');
     const shippingRate = parseFloat(page.dataset.shippingRate || '0');
-    const { subtotal, itemCount } = getCartMetrics();
-    const shipping = itemCount ? shippingRate : 0;
-    const tax = subtotal * (taxRate / 100);
-    const grandTotal = subtotal + shipping + tax;
+    const quote = currentCartQuote();
+    const { itemCount, subtotal: cartSubtotal } = getCartMetrics();
+    const subtotal = quote ? parseFloat(quote.subtotal) : cartSubtotal;
+    const shipping = quote ? parseFloat(quote.shipping) : (itemCount ? shippingRate : 0);
+    const tax = quote ? parseFloat(quote.tax) : subtotal * (taxRate / 100);
+    const grandTotal = quote ? parseFloat(quote.total) : subtotal + shipping + tax;
 
     const itemsMarkup = cart.length ? cart.map((item) => {
         const safeName = sanitizeName(item.name);
@@ -319,6 +323,68 @@ function persistCart() {
     renderCartSidebar();
     renderCartPage();
     renderCheckoutPage();
+    refreshCartQuote();
+}
+
+function cartQuoteUrl() {
+    const root = document.getElementById('cart-page-root') || document.querySelector('[data-checkout-root]');
+    return root ? root.dataset.quoteUrl : '';
+}
+
+function cartQuoteParams() {
+    const params = new URLSearchParams();
+    params.set('items', cart.filter((item) => item.id).map((item) => `${item.id}:${item.quantity}`).join(','));
+    const kmInput = document.getElementById('delivery_km');
+    const km = kmInput ? parseFloat(kmInput.value) || 0 : 0;
+    if (km > 0) params.set('delivery_km', km);
+    const pincodeInput = document.querySelector('[data-checkout-root] #zipcode');
+    const pincode = pincodeInput ? pincodeInput.value.trim() : '';
+    if (pincode) params.set('pincode', pincode);
+    return params.toString();
+}
+
+// Returns the server quote only while it still describes the current cart.
+function currentCartQuote() {
+    return cartQuote && cartQuote.params === cartQuoteParams() ? cartQuote.data : null;
+}
+
+function refreshCartQuote() {
+    const url = cartQuoteUrl();
+    if (!url || !cart.length) return;
+
+    clearTimeout(cartQuoteTimer);
+    cartQuoteTimer = setTimeout(() => {
+        const params = cartQuoteParams();
+        fetch(`${url}?${params}`, { credentials: 'same-origin' })
+            .then((response) => (response.ok ? response.json() : null))
+            .then((data) => {
+                if (data) applyCartQuote(params, data);
+            })
+            .catch((error) => console.error('Unable to refresh cart prices', error));
+    }, 250);
+}
+
+function applyCartQuote(params, data) {
+    cartQuote = { params, data };
+
+    // Keep stored prices current so the sidebar and later visits agree with the server.
+    let pricesChanged = false;
+    data.items.forEach((line) => {
+        const item = cart.find((entry) => String(entry.id) === String(line.id));
+        const price = parseFloat(line.unit_price);
+        if (item && parseFloat(item.price) !== price) {
+            item.price = price;
+            pricesChanged = true;
+        }
+    });
+    if (pricesChanged) {
+        writeStorage(cartKey, cart);
+        renderCartSidebar();
+        cartQuote.params = cartQuoteParams();
+    }
+
+    renderCartPage();
+    renderCheckoutPage();
 }
 
 function addToWishlist(id, name, price, img) {
@@ -677,6 +743,17 @@ function calcDistanceShipping(km) {
 }
 
 function getCheckoutTotals(root) {
+    const quote = currentCartQuote();
+    if (quote) {
+        return {
+            subtotal: parseFloat(quote.subtotal),
+            shipping: parseFloat(quote.shipping),
+            tax: parseFloat(quote.tax),
+            total: parseFloat(quote.total),
+            itemCount: getCartMetrics().itemCount,
+        };
+    }
+
     const taxRate = parseFloat(root.dataset.taxRate || '0');
     const shippingRate = parseFloat(root.dataset.shippingRate || '0');
     const { subtotal, itemCount } = getCartMetrics();
@@ -805,6 +882,13 @@ function handleRazorpayPayment(root, data) {
     razorpay.open();
 }
 
+let checkoutAttempt = null;
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 function initCheckoutSubmit() {
     const root = document.querySelector('[data-checkout-root]');
     const form = document.getElementById('checkoutForm');
@@ -819,7 +903,11 @@ function initCheckoutSubmit() {
 
         if (!form.reportValidity()) return;
 
-        const payload = buildCheckoutPayload(form);
+        const body = JSON.stringify(buildCheckoutPayload(form));
+        // Resubmitting the same checkout reuses its key, so the server replays the first order.
+        if (!checkoutAttempt || checkoutAttempt.body !== body) {
+            checkoutAttempt = { body, key: newIdempotencyKey() };
+        }
         submitButton.disabled = true;
         submitButton.textContent = 'Processing...';
 
@@ -828,8 +916,9 @@ function initCheckoutSubmit() {
             headers: {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': getCsrfToken(),
+                'Idempotency-Key': checkoutAttempt.key,
             },
-            body: JSON.stringify(payload),
+            body,
         })
             .then((res) => res.json())
             .then((data) => {
@@ -838,6 +927,7 @@ function initCheckoutSubmit() {
                 }
 
                 if (data.mode === 'cod') {
+                    checkoutAttempt = null;
                     cart = [];
                     persistCart();
                     window.location.href = data.redirect_url || root.dataset.successUrl;
@@ -896,10 +986,21 @@ document.addEventListener('DOMContentLoaded', () => {
     renderWishlistPage();
     renderCheckoutPage();
     updateWishlistButtons();
+    refreshCartQuote();
 
     // Live shipping recalculation when km input changes
     const kmInput = document.getElementById('delivery_km');
     if (kmInput) {
-        kmInput.addEventListener('input', renderCheckoutPage);
+        kmInput.addEventListener('input', () => {
+            renderCheckoutPage();
+            refreshCartQuote();
+        });
+    }
+    const pincodeInput = document.querySelector('[data-checkout-root] #zipcode');
+    if (pincodeInput) {
+        pincodeInput.addEventListener('input', () => {
+            renderCheckoutPage();
+            refreshCartQuote();
+        });
     }
 });
@@ -0,0 +1,31 @@
+from django.db.models import Count, Q
+
+
+def count_breakdown(queryset, conditions=None, choices=None, **aggregates):
+    """Count the rows of ``queryset`` several ways in a single query.
+
+    ``conditions`` maps a result name to a Q filter (None counts every row);
+    ``choices`` maps a field to its model choices and yields {value: count}
+    under the field name, with zeros for values that have no rows. Any extra
+    ``aggregates`` (e.g. ``total_stock=Sum('stock')``) are computed alongside.
+    """
+    conditions = conditions or {}
+    expressions = dict(aggregates)
+    for name, condition in conditions.items():
+        expressions[name] = Count('pk', filter=condition) if condition else Count('pk')
+
+    # Choice values can contain spaces, which are not valid aggregate aliases.
+    aliases = {}
+    for field, field_choices in (choices or {}).items():
+        for index, (value, _) in enumerate(field_choices):
+            alias = f'_{field}_{index}'
+            expressions[alias] = Count('pk', filter=Q(**{field: value}))
+            aliases[alias] = (field, value)
+
+    counts = queryset.aggregate(**expressions) if expressions else {}
+    result = {name: counts[name] for name in [*aggregates, *conditions]}
+    for field in choices or {}:
+        result[field] = {}
+    for alias, (field, value) in aliases.items():
+        result[field][value] = counts[alias]
+    return result
@@ -0,0 +1,187 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, PositiveIntegerField, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .caching import invalidate_home_sections, invalidate_price_snapshots
+from .models import OrderItem, Product, StockReservation
+
+
+RELEASE_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Not enough stock for product(s): {', '.join(map(str, self.product_ids))}")
+
+
+def _refresh_price_snapshots(product_ids):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: invalidate_price_snapshots(product_ids))
+
+
+def order_quantities(order):
+    return quantities_for_orders([order.pk])
+
+
+def quantities_for_orders(order_ids):
+    """Return {product_id: total quantity} across the items of the given orders."""
+    quantities = {}
+    rows = OrderItem.objects.filter(order_id__in=order_ids, product__isnull=False).values_list('product_id', 'quantity')
+    for product_id, quantity in rows:
+        quantities[product_id] = quantities.get(product_id, 0) + (quantity or 0)
+    return {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+
+
+def _per_product(field, quantities, expression):
+    return Case(
+        *[When(pk=product_id, then=expression(quantity)) for product_id, quantity in quantities.items()],
+        default=F(field),
+        output_field=PositiveIntegerField(),
+    )
+
+
+def _lock_free_stock(quantities):
+    """Lock the product rows and return {product_id: stock not held by reservations}."""
+    rows = Product.objects.select_for_update().filter(pk__in=quantities).order_by('pk')
+    return {pk: stock - reserved for pk, stock, reserved in rows.values_list('pk', 'stock', 'reserved')}
+
+
+def _require_free_stock(quantities):
+    free = _lock_free_stock(quantities)
+    short = [product_id for product_id, quantity in quantities.items() if free.get(product_id, 0) < quantity]
+    if short:
+        raise InsufficientStock(short)
+
+    condition = Q()
+    for product_id, quantity in quantities.items():
+        condition |= Q(pk=product_id, stock__gte=F('reserved') + quantity)
+    return condition
+
+
+def decrement_stock(quantities, strict=False):
+    """Take {product_id: quantity} off stock with a single UPDATE.
+
+    With ``strict`` only stock that is not reserved by other checkouts can be
+    taken and InsufficientStock is raised otherwise; without it stock is
+    clamped at zero. Must run inside a transaction.
+    """
+    if not quantities:
+        return
+
+    if strict:
+        condition = _require_free_stock(quantities)
+        new_stock = _per_product('stock', quantities, lambda quantity: F('stock') - quantity)
+    else:
+        condition = Q(pk__in=quantities)
+        new_stock = _per_product('stock', quantities, lambda quantity: Greatest(F('stock') - quantity, Value(0)))
+
+    now = timezone.now()
+    updated = Product.objects.filter(condition).update(stock=new_stock, updated_at=now)
+    if strict and updated != len(quantities):
+        raise InsufficientStock(quantities)
+    _refresh_price_snapshots(quantities)
+
+    # .update() bypasses post_save, so refresh the cached home sections ourselves.
+    if Product.objects.filter(pk__in=quantities, stock=0, available=True).update(available=False, updated_at=now):
+        transaction.on_commit(invalidate_home_sections)
+
+
+def increment_stock(quantities):
+    if not quantities:
+        return
+
+    now = timezone.now()
+    Product.objects.filter(pk__in=quantities).update(
+        stock=_per_product('stock', quantities, lambda quantity: F('stock') + quantity),
+        updated_at=now,
+    )
+    _refresh_price_snapshots(quantities)
+    if Product.objects.filter(pk__in=quantities, stock__gt=0, available=False).update(available=True, updated_at=now):
+        transaction.on_commit(invalidate_home_sections)
+
+
+def reserve_stock(order, quantities, ttl=None):
+    """Hold stock for an unpaid order until it is paid, released or expires.
+
+    Raises InsufficientStock when the free (stock - reserved) quantity is too
+    low. Must run inside a transaction.
+    """
+    if not quantities:
+        return
+
+    condition = _require_free_stock(quantities)
+    updated = Product.objects.filter(condition).update(
+        reserved=_per_product('reserved', quantities, lambda quantity: F('reserved') + quantity),
+    )
+    if updated != len(quantities):
+        raise InsufficientStock(quantities)
+    _refresh_price_snapshots(quantities)
+
+    ttl = ttl if ttl is not None else settings.STOCK_RESERVATION_TTL
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+        for product_id, quantity in quantities.items()
+    ])
+
+
+def _release(reservations):
+    rows = list(reservations.select_for_update().values_list('id', 'product_id', 'quantity'))
+    if not rows:
+        return 0
+
+    quantities = {}
+    for _, product_id, quantity in rows:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    StockReservation.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    Product.objects.filter(pk__in=quantities).update(
+        reserved=_per_product('reserved', quantities, lambda quantity: Greatest(F('reserved') - quantity, Value(0))),
+    )
+    _refresh_price_snapshots(quantities)
+    return len(rows)
+
+
+def release_order_reservations(order):
+    return release_reservations_for_orders([order.pk])
+
+
+def release_reservations_for_orders(order_ids):
+    with transaction.atomic():
+        return _release(StockReservation.objects.filter(order_id__in=order_ids))
+
+
+def release_expired_reservations(now=None, batch_size=RELEASE_BATCH_SIZE):
+    """Give back stock held by abandoned online checkouts, one batch per transaction."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                StockReservation.objects.filter(expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return released
+            released += _release(StockReservation.objects.filter(pk__in=ids))
+
+
+def resync_reserved_counts():
+    """Recompute Product.reserved from the reservation rows, fixing any drift."""
+    held = (
+        StockReservation.objects.filter(product=OuterRef('pk'))
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return Product.objects.filter(
+        Q(reserved__gt=0) | Q(pk__in=StockReservation.objects.values('product_id'))
+    ).exclude(
+        reserved=Coalesce(Subquery(held), 0)
+    ).update(reserved=Coalesce(Subquery(held), 0))
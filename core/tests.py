@@ -1,11 +1,80 @@
+import hashlib
 import json
+from base64 import urlsafe_b64encode
+from decimal import Decimal
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase, Client
+from django.core.management import call_command
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import Product, Category, Customer, Review, Order
+from django.utils import timezone
+from . import caching, jobs, shipping
+from .analytics import build_sales_series
+from .caching import (
+    get_cached_site_settings, get_price_snapshots, invalidate_home_sections, invalidate_site_settings,
+    site_settings_version,
+)
+from .exports import XLSX_CONTENT_TYPE, iter_table_pdf
+from .orderfeed import ORDER_FEED_PAGE_SIZE, prune_order_changes, stream_order_changes
+from .jobs import claim_next_job, enqueue_job, job_storage, purge_job_files, requeue_stale_jobs, run_job
+from .maintenance import run_periodic_tasks
+from .payments import CircuitBreaker, FakeGateway, GatewayUnavailable, PaymentGatewayError, _sign, get_gateway, reset_gateway
+from .reconcile import reconcile_payments
+from .search import _serialize_hit
+from .shipping import get_shipping_index, quote_shipping
+from .stock import InsufficientStock, reserve_stock
+from .models import (
+    Product, Category, Customer, Review, Order, SiteSetting, GalleryItem, Campaign, Job, StockReservation,
+    IdempotencyKey, PaymentEvent, ShippingZone, DailySalesRollup, ReturnRequest, ContactMessage, OrderChange,
+)
+from .orders import finalize_order, restock_order
 
 
-class ContactReviewTests(TestCase):
+def encode_cursor(values):
+    return urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'},
+})
+class CacheIsolatedTestCase(TestCase):
+    """Runs against a private in-memory cache, never the on-disk one, emptied for each test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cache.clear()
+
+
+def use_temp_media(test_case):
+    media_dir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(media_dir.cleanup)
+    job_files_dir = tempfile.TemporaryDirectory()
+    test_case.addCleanup(job_files_dir.cleanup)
+    storages = {**settings.STORAGES, 'job_files': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': job_files_dir.name},
+    }}
+    media_settings = override_settings(MEDIA_ROOT=media_dir.name, STORAGES=storages)
+    media_settings.enable()
+    test_case.addCleanup(media_settings.disable)
+
+
+class ContactReviewTests(CacheIsolatedTestCase):
     def setUp(self):
         # create dummy category & product for review tests
         self.category = Category.objects.create(name='TestCat', slug='testcat')
@@ -68,7 +137,7 @@ class ContactReviewTests(TestCase):
         self.assertContains(response, 'Beautiful craftsmanship and a calm buying experience.')
 
 
-class OrderWorkflowTests(TestCase):
+class OrderWorkflowTests(CacheIsolatedTestCase):
     def setUp(self):
         self.client = Client()
         self.client.defaults['wsgi.url_scheme'] = 'https'
@@ -129,6 +198,40 @@ class OrderWorkflowTests(TestCase):
         self.product.refresh_from_db()
         self.assertEqual(self.product.stock, 3)
 
+    def test_checkout_snapshots_totals_and_line_prices(self):
+        self.client.force_login(self.user)
+        payload = {
+            'items': [{'id': self.product.id, 'quantity': 2}],
+            'payment_method': 'COD',
+            'full_name': 'Buyer One',
+            'email': 'buyer@example.com',
+            'phone': '9999999999',
+            'address': 'Craft Street',
+            'city': 'Jaipur',
+            'state': 'Rajasthan',
+            'zipcode': '302001',
+        }
+        self.client.post(
+            reverse('create_checkout_order'),
+            data=json.dumps(payload),
+            content_type='application/json',
+            secure=True,
+        )
+
+        order = Order.objects.get(customer=self.customer)
+        self.assertEqual(order.subtotal, Decimal('2400.00'))
+        self.assertEqual(order.tax, Decimal('120.00'))
+        self.assertEqual(order.shipping, Decimal('15.00'))
+        self.assertEqual(order.total, Decimal('2535.00'))
+        self.assertEqual(order.item_count, 2)
+
+        Product.objects.filter(pk=self.product.pk).update(price=9999)
+        item = order.orderitem_set.get()
+        self.assertEqual(item.get_total, Decimal('2400.00'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual((order.get_cart_total, order.get_cart_items), (Decimal('2400.00'), 2))
+
     def test_admin_can_confirm_order_and_user_can_view_it(self):
         order = Order.objects.create(
             customer=self.customer,
@@ -159,8 +262,702 @@ class OrderWorkflowTests(TestCase):
         self.assertContains(response, f'Order #{order.id}')
         self.assertContains(response, 'Processing')
 
+    def test_cod_checkout_rejects_oversell_and_rolls_back(self):
+        self.client.force_login(self.user)
+        payload = {
+            'items': [{'id': self.product.id, 'quantity': 3}, {'id': self.product.id, 'quantity': 3}],
+            'payment_method': 'COD',
+            'full_name': 'Buyer One',
+            'email': 'buyer@example.com',
+            'phone': '9999999999',
+            'address': 'Craft Street',
+            'city': 'Jaipur',
+            'state': 'Rajasthan',
+            'zipcode': '302001',
+        }
+
+        response = self.client.post(
+            reverse('create_checkout_order'),
+            data=json.dumps(payload),
+            content_type='application/json',
+            secure=True,
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['unavailable'], [self.product.id])
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_finalize_and_restock_use_single_stock_update(self):
+        lamp = Product.objects.create(
+            category=self.category, name='Lamp', slug='lamp', price=800, image='products/lamp.jpg', stock=1,
+        )
+        order = Order.objects.create(customer=self.customer, payment_method='COD')
+        order.orderitem_set.create(product=self.product, quantity=2)
+        order.orderitem_set.create(product=lamp, quantity=1)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                finalize_order(order, strict=True)
+        stock_updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "core_product" SET "stock"')]
+        self.assertEqual(len(stock_updates), 1)
+        # Price snapshot refresh plus the home section refresh for the sold-out lamp.
+        self.assertEqual(len(callbacks), 2)
+
+        lamp.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, lamp.stock, lamp.available), (3, 0, False))
+
+        finalize_order(Order.objects.get(pk=order.pk))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+        restock_order(Order.objects.get(pk=order.pk))
+        lamp.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, lamp.stock, lamp.available), (5, 1, True))
+        self.assertFalse(Order.objects.get(pk=order.pk).complete)
+
+    def test_strict_finalize_leaves_order_untouched_when_short(self):
+        order = Order.objects.create(customer=self.customer, payment_method='COD')
+        order.orderitem_set.create(product=self.product, quantity=6)
+
+        with self.assertRaises(InsufficientStock):
+            finalize_order(order, strict=True)
+
+        order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertFalse(order.complete)
+        self.assertEqual(self.product.stock, 5)
+
+        finalize_order(order, 'pay_123')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.available), (0, False))
+
+
+class AdminQueryBudgetTests(CacheIsolatedTestCase):
+    # Queries per page once the analytics series are cached, including the
+    # session and user lookups. These must not grow with the number of orders,
+    # products or returns on the page.
+    BUDGETS = {
+        'admin_dashboard': 7,
+        'admin_analytics': 5,
+        'admin_returns': 4,
+        'admin_contact_messages': 5,
+        'admin_orders': 7,
+    }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.admin_user = User.objects.create_user(
+            username='budget-admin@example.com', email='budget-admin@example.com', password='adminpass123',
+            is_staff=True, is_superuser=True,
+        )
+        self.customer = Customer.objects.create(full_name='Budget Buyer', email='budget@example.com')
+        self.category = Category.objects.create(name='Pottery', slug='pottery')
+        self.client.force_login(self.admin_user)
+        get_cached_site_settings()
+        cache.clear()
+
+    def _add_data(self, count):
+        offset = Product.objects.count()
+        for index in range(offset, offset + count):
+            product = Product.objects.create(
+                category=self.category, name=f'Bowl {index}', slug=f'bowl-{index}', price=100 + index,
+                image='products/bowl.jpg', stock=index % 12,
+            )
+            status = Order.STATUS_CHOICES[index % len(Order.STATUS_CHOICES)][0]
+            order = Order.objects.create(
+                customer=self.customer, status=status, complete=index % 2 == 0,
+                payment_method='COD' if index % 3 else 'ONLINE',
+            )
+            item = order.orderitem_set.create(product=product, quantity=1, unit_price=product.price)
+            order.shippingaddress_set.create(customer=self.customer, address='1 Clay St', city='Jaipur', state='RJ',
+                                             zipcode='302001')
+            ReturnRequest.objects.create(
+                order=order, order_item=item, customer=self.customer, product=product, reason='Chipped',
+                status=ReturnRequest.STATUS_CHOICES[index % len(ReturnRequest.STATUS_CHOICES)][0],
+            )
+            ContactMessage.objects.create(name='Visitor', email='v@example.com', message='Hi', is_read=index % 2 == 0)
+
+    def test_admin_pages_stay_within_query_budget(self):
+        for count in (2, 12):
+            self._add_data(count)
+            for name, budget in self.BUDGETS.items():
+                self.client.get(reverse(name), secure=True)
+                with self.subTest(page=name, rows=count), CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(name), secure=True)
+                    self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(queries), budget, '\n'.join(query['sql'] for query in queries))
+
+    def test_analytics_breakdowns_match_per_value_counts(self):
+        self._add_data(7)
+        response = self.client.get(reverse('admin_analytics'), secure=True)
+
+        statuses = [value for value, _ in Order.STATUS_CHOICES]
+        self.assertEqual(
+            json.loads(response.context['status_data_json']),
+            [Order.objects.filter(status=status).count() for status in statuses],
+        )
+        self.assertEqual(
+            json.loads(response.context['payment_data_json']),
+            [Order.objects.filter(payment_method=value).count() for value, _ in Order.PAYMENT_METHOD_CHOICES],
+        )
+        self.assertEqual(response.context['total_orders'], 7)
+        self.assertEqual(response.context['completed_orders_count'], 4)
+
+        returns = self.client.get(reverse('admin_returns'), secure=True)
+        self.assertEqual(returns.context['return_count'], 7)
+        self.assertEqual(returns.context['pending_count'], 2)
+        self.assertEqual(returns.context['approved_count'], 2)
+        self.assertEqual(returns.context['completed_count'], 2)
+
+
+@override_settings(ANALYTICS_BACKGROUND_REFRESH=False)
+class AnalyticsApiTests(CacheIsolatedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.admin_user = User.objects.create_user(
+            username='analytics-admin@example.com', email='analytics-admin@example.com', password='adminpass123',
+            is_staff=True,
+        )
+        self.customer = Customer.objects.create(full_name='Chart Buyer', email='chart@example.com')
+        category = Category.objects.create(name='Pottery', slug='pottery')
+        self.product = Product.objects.create(
+            category=category, name='Jug', slug='jug', price=500, image='products/jug.jpg', stock=50,
+        )
+        self._sell(2)
+        self.client.force_login(self.admin_user)
+        self.url = reverse('admin_analytics_api')
+
+    def _sell(self, quantity):
+        order = Order.objects.create(customer=self.customer, payment_method='COD')
+        order.orderitem_set.create(product=self.product, quantity=quantity, unit_price=self.product.price)
+        finalize_order(order)
+
+    def _get(self, **params):
+        return self.client.get(self.url, {'range': '7d', 'granularity': 'day', **params}, secure=True)
+
+    def test_fresh_series_is_served_from_cache(self):
+        first = self._get()
+        self.assertEqual(first['X-Analytics-Cache'], 'miss')
+        payload = first.json()
+        self.assertEqual(len(payload['buckets']), 7)
+        self.assertEqual(payload['buckets'][-1]['start'], timezone.localdate().isoformat())
+        self.assertEqual(payload['totals'], {'revenue': 1000.0, 'units': 2, 'orders': 1})
+
+        # Only the session and user lookups; no aggregate query.
+        with self.assertNumQueries(2):
+            second = self._get()
+        self.assertEqual(second['X-Analytics-Cache'], 'fresh')
+        self.assertEqual(second.json(), payload)
+
+    @override_settings(ANALYTICS_FRESH_SECONDS=0)
+    def test_stale_series_is_served_while_it_is_recomputed(self):
+        self._get()
+        self._sell(3)
+
+        stale = self._get()
+        self.assertEqual(stale['X-Analytics-Cache'], 'stale')
+        self.assertEqual(stale.json()['totals']['units'], 2)
+        self.assertEqual(self._get().json()['totals']['units'], 5)
+
+    @override_settings(ANALYTICS_FRESH_SECONDS=0)
+    def test_only_one_request_recomputes_a_stale_series(self):
+        self._get()
+        cache.add(f"core:analytics:sales:7d:day:{timezone.localdate().isoformat()}:refreshing", True)
+
+        with self.assertNumQueries(2):
+            response = self._get()
+        self.assertEqual(response['X-Analytics-Cache'], 'stale')
+
+    def test_rejects_unknown_range_and_granularity(self):
+        self.assertEqual(self._get(range='2y').status_code, 400)
+        self.assertEqual(self._get(granularity='hour').status_code, 400)
+
+    def test_requires_admin(self):
+        self.client.logout()
+        self.assertEqual(self._get().status_code, 302)
+
+    def test_weekly_and_monthly_buckets_are_zero_filled(self):
+        end = timezone.localdate()
+        weekly = build_sales_series('90d', 'week', end)
+        starts = [date.fromisoformat(bucket['start']) for bucket in weekly['buckets']]
+        self.assertTrue(all(start.weekday() == 0 for start in starts))
+        self.assertEqual(starts, sorted(starts))
+        self.assertEqual(weekly['totals']['units'], 2)
+
+        monthly = build_sales_series('365d', 'month', end)
+        self.assertIn(len(monthly['buckets']), (12, 13))
+        self.assertTrue(all(bucket['start'].endswith('-01') for bucket in monthly['buckets']))
+        self.assertEqual(sum(bucket['orders'] for bucket in monthly['buckets']), 1)
+
+
+    def test_order_counts_use_a_plain_date_range(self):
+        end = timezone.localdate()
+        start = end - timedelta(days=6)
+        first_day = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+        self._sell(1)
+        Order.objects.filter(pk=Order.objects.latest('pk').pk).update(date_ordered=first_day)
+        self._sell(1)
+        Order.objects.filter(pk=Order.objects.latest('pk').pk).update(date_ordered=first_day - timedelta(seconds=1))
+
+        with CaptureQueriesContext(connection) as queries:
+            series = build_sales_series('7d', 'day', end)
+        self.assertEqual(series['totals']['orders'], 2)
+        order_sql = next(q['sql'] for q in queries if 'FROM "core_order"' in q['sql'])
+        # Filtering on the raw column keeps the date_ordered index usable.
+        self.assertIn('"core_order"."date_ordered" >=', order_sql)
+
+class OrderFeedTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.admin_user = User.objects.create_user(
+            username='feed-admin@example.com', email='feed-admin@example.com', password='adminpass123', is_staff=True,
+        )
+        self.customer = Customer.objects.create(full_name='Feed Buyer', email='feed@example.com', phone='9999999999')
+        category = Category.objects.create(name='Pottery', slug='pottery')
+        self.product = Product.objects.create(
+            category=category, name='Cup', slug='cup', price=250, image='products/cup.jpg', stock=100,
+        )
+        self.client.force_login(self.admin_user)
+
+    def _order(self):
+        order = Order.objects.create(customer=self.customer, payment_method='COD', total=250, item_count=1)
+        order.orderitem_set.create(product=self.product, quantity=1, unit_price=self.product.price)
+        return order
+
+    def _events(self, response):
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        return [
+            (int(block.split('\n')[0][len('id: '):]), json.loads(block.split('data: ', 1)[1]))
+            for block in body.split('\n\n') if block.startswith('id: ')
+        ]
+
+    def test_orders_page_renders_first_page_and_change_cursor(self):
+        orders = [self._order() for _ in range(ORDER_FEED_PAGE_SIZE + 2)]
+        response = self.client.get(reverse('admin_orders'), secure=True)
+
+        self.assertEqual(len(response.context['orders']), ORDER_FEED_PAGE_SIZE)
+        self.assertEqual(response.context['orders'][0], orders[-1])
+        self.assertEqual(response.context['change_cursor'], OrderChange.objects.latest('pk').pk)
+        self.assertContains(response, f"?cursor={response.context['change_cursor']}")
+
+        older = self.client.get(reverse('admin_orders'), {'cursor': response.context['next_cursor']}, secure=True)
+        self.assertEqual(list(older.context['orders']), orders[1::-1])
+        self.assertEqual(older.context['next_cursor'], '')
+
+    def test_every_order_write_is_logged(self):
+        order = self._order()
+        self.assertEqual(OrderChange.objects.filter(order=order).count(), 1)
+
+        finalize_order(order)
+        self.assertEqual(OrderChange.objects.filter(order=order).count(), 2)
+
+        self.client.post(reverse('admin_update_order_status', args=[order.id]), {'status': 'Cancelled'}, secure=True)
+        self.assertEqual(OrderChange.objects.filter(order=order).count(), 4)
+
+    def test_stream_sends_changes_after_cursor(self):
+        seen = self._order()
+        cursor = OrderChange.objects.latest('pk').pk
+        new = self._order()
+        finalize_order(seen)
+        finalize_order(new)
+
+        response = self.client.get(reverse('admin_orders_stream'), {'cursor': cursor}, secure=True)
+        events = self._events(response)
+        self.assertEqual(len(events), 1)
+        event_id, data = events[0]
+        self.assertEqual(event_id, OrderChange.objects.latest('pk').pk)
+        self.assertEqual(data['cursor'], event_id)
+        # One delta per order, in the order of its latest change.
+        self.assertEqual([delta['id'] for delta in data['orders']], [seen.id, new.id])
+        delta = data['orders'][1]
+        self.assertEqual(delta['status'], 'Processing')
+        self.assertTrue(delta['complete'])
+        self.assertEqual(delta['customer']['name'], 'Feed Buyer')
+        self.assertEqual(delta['items'], [{'name': 'Cup', 'quantity': 1, 'line_total': '250.00'}])
+        # Streamed cards post their status form straight to this order.
+        self.assertEqual(delta['status_url'], reverse('admin_update_order_status', args=[new.id]))
 
-class AdminExportTests(TestCase):
+        # EventSource reconnects with Last-Event-ID, which wins over the page cursor.
+        resumed = self.client.get(
+            reverse('admin_orders_stream'), {'cursor': cursor}, headers={'Last-Event-ID': str(event_id)}, secure=True,
+        )
+        self.assertEqual(self._events(resumed), [])
+
+    def test_reconnect_after_pruning_resumes_from_last_event_id(self):
+        orders = [self._order() for _ in range(4)]
+        seen = OrderChange.objects.latest('pk').pk
+        OrderChange.objects.update(created_at=timezone.now() - timedelta(days=2))
+        finalize_order(orders[0])
+
+        out = StringIO()
+        call_command('prune_order_changes', stdout=out)
+        self.assertIn('Pruned 4 order change(s).', out.getvalue())
+
+        resumed = self.client.get(reverse('admin_orders_stream'), headers={'Last-Event-ID': str(seen)}, secure=True)
+        events = self._events(resumed)
+        self.assertEqual([[delta['id'] for delta in data['orders']] for _, data in events], [[orders[0].id]])
+
+        # A page that fell behind the pruned rows is told to reload instead.
+        behind = self.client.get(reverse('admin_orders_stream'), headers={'Last-Event-ID': str(seen - 2)}, secure=True)
+        body = b''.join(behind.streaming_content).decode()
+        self.assertIn(f'id: {OrderChange.objects.latest("pk").pk}\nevent: reset\n', body)
+        self.assertNotIn('event: orders', body)
+
+    def test_worker_prunes_the_change_log(self):
+        cache.clear()
+        self._order()
+        self._order()
+        OrderChange.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        self.assertIn('Pruned 1 order change(s).', run_periodic_tasks({}))
+        self.assertEqual(OrderChange.objects.count(), 1)
+
+    def test_pruning_keeps_the_latest_change(self):
+        self._order()
+        OrderChange.objects.update(created_at=timezone.now() - timedelta(days=2))
+        latest = OrderChange.objects.latest('pk').pk
+
+        self.assertEqual(prune_order_changes(), 0)
+        self.assertEqual(list(OrderChange.objects.values_list('pk', flat=True)), [latest])
+
+    def test_stream_requires_admin(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('admin_orders_stream'), secure=True).status_code, 302)
+
+    @override_settings(ORDER_FEED_POLL_SECONDS=0.01, ORDER_FEED_MAX_SECONDS=0.1)
+    async def test_asgi_stream_pushes_changes_until_it_times_out(self):
+        await self.async_client.aforce_login(self.admin_user)
+        order = await sync_to_async(self._order)()
+
+        response = await self.async_client.get(reverse('admin_orders_stream'), {'cursor': 0})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+
+        self.assertTrue(body.startswith('retry: '))
+        self.assertEqual(body.count('event: orders'), 1)
+        self.assertIn(f'"id": {order.id}', body)
+
+    async def test_stream_sends_a_backlog_as_one_event(self):
+        await sync_to_async(lambda: [self._order() for _ in range(3)])()
+        chunks = [chunk async for chunk in stream_order_changes(0, poll_seconds=0, max_seconds=0.05)]
+        self.assertEqual(sum(chunk.count('event: orders') for chunk in chunks), 1)
+
+
+class AdminOrderListTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.admin_user = User.objects.create_user(
+            username='list-admin@example.com', email='list-admin@example.com', password='adminpass123', is_staff=True,
+        )
+        self.asha = Customer.objects.create(full_name='Asha', email='asha@example.com')
+        self.ravi = Customer.objects.create(full_name='Ravi', email='ravi@example.org')
+        self.client.force_login(self.admin_user)
+
+    def _order(self, customer, days_ago=0, **fields):
+        order = Order.objects.create(customer=customer, **fields)
+        Order.objects.filter(pk=order.pk).update(date_ordered=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def _ids(self, **params):
+        response = self.client.get(reverse('admin_orders'), params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return [order.id for order in response.context['orders']]
+
+    def test_filters_and_search(self):
+        pending = self._order(self.asha, days_ago=1)
+        shipped = self._order(self.ravi, days_ago=3, status='Shipped', complete=True, payment_method='ONLINE',
+                              razorpay_order_id='order_abc123')
+        old = self._order(self.asha, days_ago=40, status='Delivered', complete=True)
+
+        self.assertEqual(self._ids(), [pending.id, shipped.id, old.id])
+        self.assertEqual(self._ids(status='Shipped'), [shipped.id])
+        self.assertEqual(self._ids(payment='COD'), [pending.id, old.id])
+        self.assertEqual(self._ids(confirmed='no'), [pending.id])
+        self.assertEqual(self._ids(confirmed='yes', status='Delivered'), [old.id])
+
+        today = timezone.localdate()
+        self.assertEqual(self._ids(**{'from': (today - timedelta(days=7)).isoformat()}), [pending.id, shipped.id])
+        self.assertEqual(self._ids(to=(today - timedelta(days=2)).isoformat()), [shipped.id, old.id])
+
+        self.assertEqual(self._ids(q=f'#{old.id}'), [old.id])
+        self.assertEqual(self._ids(q='ASHA@'), [pending.id, old.id])
+        self.assertEqual(self._ids(q='order_abc123'), [shipped.id])
+
+        # Unknown values are ignored rather than matching nothing.
+        self.assertEqual(self._ids(status='Lost', payment='CASH', confirmed='maybe', to='2026-02-30'),
+                         [pending.id, shipped.id, old.id])
+
+    def test_older_pages_keep_the_filters(self):
+        orders = [self._order(self.asha, status='Shipped') for _ in range(ORDER_FEED_PAGE_SIZE + 1)]
+        self._order(self.ravi, status='Pending')
+
+        response = self.client.get(reverse('admin_orders'), {'status': 'Shipped'}, secure=True)
+        self.assertEqual(len(response.context['orders']), ORDER_FEED_PAGE_SIZE)
+        older_url = f"?status=Shipped&amp;cursor={response.context['next_cursor']}"
+        self.assertContains(response, older_url)
+        # New orders are only inserted live into the unfiltered first page.
+        self.assertContains(response, 'data-prepend="false"')
+
+        older = self.client.get(
+            reverse('admin_orders'), {'status': 'Shipped', 'cursor': response.context['next_cursor']}, secure=True,
+        )
+        self.assertEqual([order.id for order in older.context['orders']], [orders[0].id])
+
+    def test_tampered_cursor_shows_the_first_page(self):
+        pending = self._order(self.asha)
+        for values in (['2024-01-01T00:00:00', 'x'], [123, 1], ['2024-13-45T00:00:00', 1]):
+            with self.subTest(cursor=values):
+                self.assertEqual(self._ids(status='Pending', cursor=encode_cursor(values)), [pending.id])
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is SQLite syntax')
+    def test_status_filter_uses_the_status_index(self):
+        query = Order.objects.filter(status='Shipped').order_by('-date_ordered', '-id')[:26]
+        with connection.cursor() as cursor:
+            sql, params = query.query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('order_status_date_idx', plan)
+
+
+class SalesRollupTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.admin_user = User.objects.create_user(
+            username='rollup-admin@example.com', email='rollup-admin@example.com', password='adminpass123', is_staff=True,
+        )
+        self.customer = Customer.objects.create(full_name='Rollup Buyer', email='rollup@example.com')
+        self.pottery = Category.objects.create(name='Pottery', slug='pottery')
+        self.textiles = Category.objects.create(name='Textiles', slug='textiles')
+        self.vase = Product.objects.create(
+            category=self.pottery, name='Vase', slug='vase', price=1000, image='products/vase.jpg', stock=20,
+        )
+        self.rug = Product.objects.create(
+            category=self.textiles, name='Rug', slug='rug', price=2500, image='products/rug.jpg', stock=20,
+        )
+
+    def _order(self, payment_method, *lines):
+        order = Order.objects.create(customer=self.customer, payment_method=payment_method)
+        for product, quantity in lines:
+            order.orderitem_set.create(product=product, quantity=quantity, unit_price=product.price)
+        return order
+
+    def _totals(self):
+        return {
+            (row['product_id'], row['payment_method']): (row['quantity'], row['revenue'])
+            for row in DailySalesRollup.objects.values('product_id', 'payment_method')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        }
+
+    def test_finalize_and_restock_keep_rollups_in_step_with_rebuild(self):
+        finalize_order(self._order('COD', (self.vase, 2), (self.rug, 1)))
+        finalize_order(self._order('ONLINE', (self.vase, 1)), 'pay_1')
+        cancelled = finalize_order(self._order('COD', (self.rug, 3)))
+        restock_order(cancelled)
+
+        expected = {
+            (self.vase.id, 'COD'): (2, Decimal('2000.00')),
+            (self.rug.id, 'COD'): (1, Decimal('2500.00')),
+            (self.vase.id, 'ONLINE'): (1, Decimal('1000.00')),
+        }
+        incremental = {key: value for key, value in self._totals().items() if value[0]}
+        self.assertEqual(incremental, expected)
+
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+        self.assertIn('Rebuilt 3 daily sales rollup row(s).', out.getvalue())
+        self.assertEqual(self._totals(), expected)
+
+    def test_dashboards_read_revenue_from_rollups(self):
+        finalize_order(self._order('COD', (self.vase, 2), (self.rug, 1)))
+        self.client.force_login(self.admin_user)
+
+        for name in ('admin_dashboard', 'admin_analytics'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name), secure=True)
+            self.assertEqual(response.context['total_revenue'], Decimal('4500.00'))
+            self.assertFalse([q['sql'] for q in queries if 'core_orderitem' in q['sql']], name)
+
+        dashboard = self.client.get(reverse('admin_dashboard'), secure=True)
+        self.assertEqual(json.loads(dashboard.context['category_labels_json']), ['Textiles', 'Pottery'])
+        analytics = self.client.get(reverse('admin_analytics'), secure=True)
+        self.assertEqual([row['product__name'] for row in analytics.context['top_products']], ['Rug', 'Vase'])
+
+
+class OrderHistoryTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.user = User.objects.create_user(username='history@example.com', email='history@example.com', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user, full_name='history', email='history@example.com')
+        category = Category.objects.create(name='Craft', slug='craft')
+        self.product = Product.objects.create(
+            category=category, name='Wool Shawl', slug='wool-shawl', price=700, image='products/shawl.jpg', stock=50,
+        )
+        placed = timezone.now() - timedelta(days=1)
+        self.orders = []
+        for index in range(25):
+            order = Order.objects.create(customer=self.customer, total=Decimal('700.00'), item_count=1)
+            order.orderitem_set.create(product=self.product, quantity=1, unit_price=self.product.price)
+            self.orders.append(order)
+        # Several orders share a timestamp so the id tie-breaker matters.
+        Order.objects.filter(pk__in=[order.pk for order in self.orders[:10]]).update(date_ordered=placed)
+        self.client.force_login(self.user)
+
+    def test_history_pages_with_cursor_and_constant_queries(self):
+        seen = []
+        url = reverse('my_orders')
+        first = self.client.get(url, secure=True)
+        self.assertEqual(first.context['order_count'], 25)
+        seen += [order.id for order in first.context['orders']]
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url, {'cursor': first.context['next_cursor']}, secure=True)
+        seen += [order.id for order in second.context['orders']]
+
+        self.assertEqual(second.context['next_cursor'], '')
+        self.assertEqual(sorted(seen), sorted(order.id for order in self.orders))
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertFalse([q['sql'] for q in queries if 'core_orderitem' in q['sql']])
+
+    def test_tampered_cursor_shows_the_first_page(self):
+        first = self.client.get(reverse('my_orders'), secure=True)
+        for values in (['2024-01-01T00:00:00', 'x'], [123, 1], ['2024-13-45T00:00:00', 1]):
+            with self.subTest(cursor=values):
+                response = self.client.get(reverse('my_orders'), {'cursor': encode_cursor(values)}, secure=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['is_first_page'])
+                self.assertEqual(list(response.context['orders']), list(first.context['orders']))
+
+    def test_detail_endpoint_loads_items_for_owner_only(self):
+        order = self.orders[0]
+        data = self.client.get(reverse('my_order_detail_api', args=[order.id]), secure=True).json()
+        self.assertEqual(data['items'], [{
+            'name': 'Wool Shawl',
+            'url': reverse('product_detail', args=[self.product.id]),
+            'quantity': 1,
+            'unit_price': '700.00',
+            'line_total': '700.00',
+        }])
+        self.assertEqual(data['return_status'], '')
+
+        other = User.objects.create_user(username='other@example.com', email='other@example.com', password='pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('my_order_detail_api', args=[order.id]), secure=True).status_code, 404)
+
+
+@override_settings(PAYMENT_GATEWAY='fake')
+class StockReservationTests(CacheIsolatedTestCase):
+    def setUp(self):
+        # Each test gets its own FakeGateway; otherwise its orders and breaker leak between tests.
+        reset_gateway()
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.category = Category.objects.create(name='Craft', slug='craft')
+        self.product = Product.objects.create(
+            category=self.category,
+            name='Last Vase',
+            slug='last-vase',
+            price=1200,
+            image='products/vase.jpg',
+            stock=1,
+            available=True,
+        )
+        self.payload = {
+            'items': [{'id': self.product.id, 'quantity': 1}],
+            'full_name': 'Buyer',
+            'email': 'buyer@example.com',
+            'phone': '9999999999',
+            'address': 'Craft Street',
+            'city': 'Jaipur',
+            'state': 'Rajasthan',
+            'zipcode': '302001',
+        }
+
+    def _shopper(self, name):
+        user = User.objects.create_user(username=f'{name}@example.com', email=f'{name}@example.com', password='pass12345')
+        client = Client()
+        client.defaults['wsgi.url_scheme'] = 'https'
+        client.force_login(user)
+        return client
+
+    def _checkout(self, client, payment_method):
+        return client.post(
+            reverse('create_checkout_order'),
+            data=json.dumps({**self.payload, 'payment_method': payment_method}),
+            content_type='application/json',
+            secure=True,
+        )
+
+    def _start_online_checkout(self, client):
+        return self._checkout(client, 'ONLINE')
+
+    def test_online_checkout_holds_last_unit(self):
+        first = self._start_online_checkout(self._shopper('first'))
+        self.assertEqual(first.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved, self.product.available_stock), (1, 1, 0))
+
+        second = self._start_online_checkout(self._shopper('second'))
+        self.assertEqual(second.status_code, 409)
+        cod = self._checkout(self._shopper('third'), 'COD')
+        self.assertEqual(cod.status_code, 409)
+
+        listing = self.client.get(reverse('shop_products_api'), secure=True).json()
+        self.assertEqual(listing['products'][0]['available_stock'], 0)
+
+        order = Order.objects.get(razorpay_order_id=first.json()['razorpay']['order_id'])
+        finalize_order(order, 'pay_1')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (0, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_sweeper_releases_abandoned_holds(self):
+        self._start_online_checkout(self._shopper('first'))
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        out = StringIO()
+        call_command('release_expired_reservations', stdout=out)
+
+        self.assertIn('Released 1 expired reservation(s)', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (1, 0))
+        self.assertEqual(self._checkout(self._shopper('second'), 'COD').status_code, 200)
+
+    def test_worker_sweeps_abandoned_holds_once_per_interval(self):
+        cache.clear()
+        self._start_online_checkout(self._shopper('first'))
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+
+        now = [0]
+        lines = run_periodic_tasks({}, clock=lambda: now[0])
+        self.assertIn('Released 1 expired reservation(s); corrected 0 product counter(s).', lines)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+        # Another worker (its own last_run) within the interval skips the sweep.
+        Product.objects.filter(pk=self.product.pk).update(reserved=1)
+        self.assertEqual(run_periodic_tasks({}, clock=lambda: now[0]), [])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 1)
+
+    def test_sweeper_corrects_drifted_counters(self):
+        Product.objects.filter(pk=self.product.pk).update(reserved=1)
+        call_command('release_expired_reservations', stdout=StringIO())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+class AdminExportTests(CacheIsolatedTestCase):
     def setUp(self):
         self.client = Client()
         self.client.defaults['wsgi.url_scheme'] = 'https'
@@ -189,7 +986,55 @@ class AdminExportTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
         self.assertIn('products_export.csv', response['Content-Disposition'])
-        self.assertIn('Lantern', response.content.decode('utf-8'))
+        self.assertTrue(response.streaming)
+        self.assertIn('Lantern', b''.join(response.streaming_content).decode('utf-8'))
+
+    def test_csv_export_streams_rows_in_bounded_chunks(self):
+        for index in range(1200):
+            Product.objects.create(
+                category=self.category,
+                name=f'Bulk Lamp {index}',
+                slug=f'bulk-lamp-{index}',
+                price=10,
+                image='products/lamp.jpg',
+                stock=index % 15,
+            )
+
+        response = self.client.get(reverse('admin_export_inventory'), {'format': 'csv'}, follow=True, secure=True)
+
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        lines = b''.join(chunks).decode('utf-8').splitlines()
+        self.assertEqual(lines[0], 'ID,Product,SKU,Category,Stock,Status,Available,Last Updated')
+        self.assertEqual(len(lines), 1 + 1201)
+        self.assertIn('Low Stock', lines[1])
+
+    def test_streamed_pdf_xref_offsets_point_at_objects(self):
+        rows = ([index, f'Row {index}', 'Craft'] for index in range(200))
+        pdf = b''.join(iter_table_pdf('Offsets', ['ID', 'Name', 'Category'], rows))
+
+        xref_start = int(pdf.rsplit(b'startxref\n', 1)[1].split(b'\n', 1)[0])
+        xref_lines = pdf[xref_start:].split(b'\n')
+        size = int(xref_lines[1].split()[1])
+        for number in range(1, size):
+            offset = int(xref_lines[2 + number].split()[0])
+            self.assertTrue(pdf[offset:].startswith(f'{number} 0 obj'.encode('latin-1')))
+        self.assertIn(b'/Count 5', pdf)
+
+    def test_products_excel_export_is_native_xlsx(self):
+        response = self.client.get(reverse('admin_export_products_section'), {'format': 'excel'}, follow=True, secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        self.assertIn('products_export.xlsx', response['Content-Disposition'])
+
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        shared = archive.read('xl/sharedStrings.xml').decode('utf-8')
+        self.assertIn('<c r="E2"><v>499.50</v></c>', sheet)
+        self.assertIn('<c r="F2"><v>4</v></c>', sheet)
+        self.assertIn('<t xml:space="preserve">Lantern</t>', shared)
 
     def test_categories_word_export(self):
         response = self.client.get(reverse('admin_export_categories'), {'format': 'word'}, follow=True, secure=True)
@@ -205,4 +1050,1064 @@ class AdminExportTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'application/pdf')
         self.assertIn('inventory_export.pdf', response['Content-Disposition'])
-        self.assertTrue(response.content.startswith(b'%PDF-1.4'))
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        self.assertIn(b'/FlateDecode', content)
+        self.assertTrue(content.endswith(b'%%EOF'))
+
+
+
+@override_settings(PAYMENT_GATEWAY='fake')
+class PaymentGatewayTests(CacheIsolatedTestCase):
+    def setUp(self):
+        reset_gateway()
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.gateway = get_gateway()
+        self.gateway.sleep = lambda seconds: None
+        self.category = Category.objects.create(name='Craft', slug='craft')
+        self.product = Product.objects.create(
+            category=self.category, name='Tea Set', slug='tea-set', price=900,
+            image='products/tea.jpg', stock=2, available=True,
+        )
+        self.user = User.objects.create_user(username='payer@example.com', email='payer@example.com', password='pass12345')
+        self.client.force_login(self.user)
+
+    def _checkout(self):
+        return self.client.post(
+            reverse('create_checkout_order'),
+            data=json.dumps({
+                'items': [{'id': self.product.id, 'quantity': 1}],
+                'payment_method': 'ONLINE',
+                'full_name': 'Payer',
+                'email': 'payer@example.com',
+                'phone': '9999999999',
+                'address': 'Lake Road',
+                'city': 'Udaipur',
+                'state': 'Rajasthan',
+                'zipcode': '313001',
+            }),
+            content_type='application/json',
+            secure=True,
+        )
+
+    def test_online_checkout_and_verification_through_fake_gateway(self):
+        response = self._checkout()
+        self.assertEqual(response.status_code, 200)
+        gateway_order_id = response.json()['razorpay']['order_id']
+        self.assertEqual(self.gateway.orders[gateway_order_id]['amount'], response.json()['razorpay']['amount'])
+
+        callback = self.gateway.pay(gateway_order_id)
+        tampered = self.client.post(
+            reverse('verify_payment'), {**callback, 'razorpay_signature': 'bad'}, secure=True,
+        )
+        self.assertEqual(tampered.status_code, 400)
+
+        verified = self.client.post(reverse('verify_payment'), callback, secure=True)
+        self.assertEqual(verified.status_code, 200)
+        order = Order.objects.get(razorpay_order_id=gateway_order_id)
+        self.assertTrue(order.complete)
+        self.assertEqual(order.razorpay_payment_id, callback['razorpay_payment_id'])
+
+    def test_transient_failures_are_retried(self):
+        self.gateway.fail_next(2)
+        with self.assertLogs('core.payments', 'WARNING'):
+            order = self.gateway.create_order(5000)
+        self.assertIn(order['id'], self.gateway.orders)
+        self.assertEqual(self.gateway.breaker.state, 'closed')
+
+    def test_gateway_outage_releases_held_stock(self):
+        self.gateway.fail_next(3)
+        with self.assertLogs('core.payments', 'WARNING'):
+            response = self._checkout()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+    def test_breaker_fails_fast_then_probes(self):
+        now = [0]
+        gateway = FakeGateway(retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: now[0]))
+        gateway.fail_next(2)
+        for _ in range(2):
+            with self.assertRaises(GatewayUnavailable):
+                gateway.create_order(100)
+        self.assertEqual(gateway.breaker.state, 'open')
+
+        with self.assertRaises(GatewayUnavailable):
+            gateway.create_order(100)
+        self.assertEqual(gateway.orders, {})
+
+        now[0] = 31
+        self.assertEqual(gateway.breaker.state, 'half-open')
+        gateway.create_order(100)
+        self.assertEqual(gateway.breaker.state, 'closed')
+
+    def test_unexpected_error_during_probe_reopens_the_breaker(self):
+        now = [0]
+        gateway = FakeGateway(retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: now[0]))
+        gateway.fail_next(1)
+        with self.assertRaises(GatewayUnavailable):
+            gateway.create_order(100)
+
+        now[0] = 31
+        garbled = requests.JSONDecodeError('Expecting value', '<html>', 0)
+        with patch.object(gateway, '_create_order', side_effect=garbled), self.assertLogs('core.payments', 'ERROR'):
+            with self.assertRaises(PaymentGatewayError):
+                gateway.create_order(100)
+        self.assertEqual(gateway.breaker.state, 'open')
+
+        # The failed probe must not leave the breaker waiting on it forever.
+        now[0] = 62
+        gateway.create_order(100)
+        self.assertEqual(gateway.breaker.state, 'closed')
+
+    def test_unexpected_gateway_error_releases_held_stock(self):
+        garbled = requests.JSONDecodeError('Expecting value', '<html>', 0)
+        with patch.object(self.gateway, '_create_order', side_effect=garbled), self.assertLogs('core.payments', 'ERROR'):
+            response = self._checkout()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Order.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+    def test_retries_stop_at_the_call_time_budget(self):
+        now = [0]
+
+        def slow_sleep(seconds):
+            now[0] += seconds
+
+        gateway = FakeGateway(retries=2, max_call_seconds=20, sleep=slow_sleep, clock=lambda: now[0])
+        gateway.attempt_timeout = 13
+
+        def timeout(data):
+            now[0] += 13
+            raise requests.Timeout('read timed out')
+
+        with patch.object(gateway, '_create_order', side_effect=timeout) as create:
+            with self.assertRaises(GatewayUnavailable):
+                gateway.create_order(100)
+        self.assertEqual(create.call_count, 1)
+        self.assertLessEqual(now[0], 20)
+
+
+@override_settings(PAYMENT_GATEWAY='fake')
+class IdempotencyTests(CacheIsolatedTestCase):
+    def setUp(self):
+        reset_gateway()
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.category = Category.objects.create(name='Craft', slug='craft')
+        self.product = Product.objects.create(
+            category=self.category, name='Clay Lamp', slug='clay-lamp', price=400,
+            image='products/clay.jpg', stock=5, available=True,
+        )
+        self.user = User.objects.create_user(username='retry@example.com', email='retry@example.com', password='pass12345')
+        self.client.force_login(self.user)
+        self.payload = {
+            'items': [{'id': self.product.id, 'quantity': 1}],
+            'full_name': 'Retry Buyer',
+            'email': 'retry@example.com',
+            'phone': '9999999999',
+            'address': 'Hill Road',
+            'city': 'Shimla',
+            'state': 'Himachal Pradesh',
+            'zipcode': '171001',
+        }
+
+    def _checkout(self, key, **overrides):
+        return self.client.post(
+            reverse('create_checkout_order'),
+            data=json.dumps({**self.payload, **overrides}),
+            content_type='application/json',
+            headers={'Idempotency-Key': key},
+            secure=True,
+        )
+
+    def test_retried_cod_checkout_replays_first_order(self):
+        first = self._checkout('attempt-1', payment_method='COD')
+        with CaptureQueriesContext(connection) as queries:
+            second = self._checkout('attempt-1', payment_method='COD')
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 4)
+
+        key_queries = [q['sql'] for q in queries if 'core_idempotencykey' in q['sql']]
+        self.assertEqual(len(key_queries), 1)
+        self.assertFalse([q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE'))])
+
+    def test_retried_online_checkout_reuses_gateway_order(self):
+        first = self._checkout('attempt-2', payment_method='ONLINE')
+        second = self._checkout('attempt-2', payment_method='ONLINE')
+
+        self.assertEqual(second.json()['razorpay']['order_id'], first.json()['razorpay']['order_id'])
+        self.assertEqual(len(get_gateway().orders), 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_for_different_request_is_rejected(self):
+        self._checkout('attempt-3', payment_method='COD')
+        response = self._checkout('attempt-3', payment_method='COD', city='Manali')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_request_frees_key(self):
+        failed = self._checkout('attempt-4', payment_method='COD', items=[])
+        self.assertEqual(failed.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.assertEqual(self._checkout('attempt-4', payment_method='COD').status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_abandoned_claim_is_taken_over_after_its_lease(self):
+        # A worker killed mid-request leaves its in-flight claim behind.
+        now = timezone.now()
+        abandoned = IdempotencyKey.objects.create(
+            user=self.user, scope='checkout', key='attempt-7', request_hash='',
+            locked_until=now + timedelta(seconds=30), expires_at=now + timedelta(days=1),
+        )
+        self.payload['payment_method'] = 'COD'
+        abandoned.request_hash = hashlib.sha256(json.dumps(self.payload).encode()).hexdigest()
+        abandoned.save()
+        self.assertEqual(self._checkout('attempt-7').status_code, 409)
+
+        IdempotencyKey.objects.update(locked_until=now - timedelta(seconds=1))
+        response = self._checkout('attempt-7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 200)
+
+    def test_verify_payment_retries_dedupe_on_payment_id(self):
+        order_id = self._checkout('attempt-5', payment_method='ONLINE').json()['razorpay']['order_id']
+        callback = get_gateway().pay(order_id)
+
+        first = self.client.post(reverse('verify_payment'), callback, secure=True)
+        second = self.client.post(reverse('verify_payment'), callback, secure=True)
+
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertTrue(Order.objects.get(razorpay_order_id=order_id).complete)
+
+    def test_expired_keys_are_purged(self):
+        self._checkout('attempt-6', payment_method='COD')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Purged 1 expired idempotency key(s).', out.getvalue())
+
+    def test_worker_purges_expired_keys(self):
+        cache.clear()
+        self._checkout('attempt-8', payment_method='COD')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIn('Purged 1 expired idempotency key(s).', run_periodic_tasks({}))
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@override_settings(PAYMENT_GATEWAY='fake')
+class PaymentWebhookTests(CacheIsolatedTestCase):
+    def setUp(self):
+        reset_gateway()
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.gateway = get_gateway()
+        self.category = Category.objects.create(name='Craft', slug='craft')
+        self.product = Product.objects.create(
+            category=self.category, name='Copper Jug', slug='copper-jug', price=500,
+            image='products/jug.jpg', stock=4, available=True,
+        )
+
+    def _online_order(self, name):
+        user = User.objects.create_user(username=f'{name}@example.com', email=f'{name}@example.com', password='pass12345')
+        shopper = Client()
+        shopper.defaults['wsgi.url_scheme'] = 'https'
+        shopper.force_login(user)
+        response = shopper.post(
+            reverse('create_checkout_order'),
+            data=json.dumps({
+                'items': [{'id': self.product.id, 'quantity': 1}],
+                'payment_method': 'ONLINE',
+                'full_name': name,
+                'email': f'{name}@example.com',
+                'phone': '9999999999',
+                'address': 'River Lane',
+                'city': 'Pune',
+                'state': 'Maharashtra',
+                'zipcode': '411001',
+            }),
+            content_type='application/json',
+            secure=True,
+        )
+        return response.json()['razorpay']['order_id']
+
+    def _deliver(self, event_id, body, signature):
+        return self.client.post(
+            reverse('razorpay_webhook'),
+            data=body,
+            content_type='application/json',
+            headers={'X-Razorpay-Signature': signature, 'X-Razorpay-Event-Id': event_id},
+            secure=True,
+        )
+
+    def test_webhook_stores_verified_events_only(self):
+        order_id = self._online_order('hook')
+        payment_id = self.gateway.pay(order_id)['razorpay_payment_id']
+        event_id, body, signature = self.gateway.webhook(payment_id)
+
+        self.assertEqual(self._deliver(event_id, body, 'forged').status_code, 400)
+        with self.assertNumQueries(1):
+            response = self._deliver(event_id, body, signature)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentEvent.objects.get().event_id, event_id)
+        self.assertFalse(Order.objects.get(razorpay_order_id=order_id).complete)
+
+    def test_processor_dedupes_and_finalizes_in_bulk(self):
+        first = self._online_order('first')
+        second = self._online_order('second')
+        first_payment = self.gateway.pay(first)['razorpay_payment_id']
+        second_payment = self.gateway.pay(second)['razorpay_payment_id']
+
+        delivery = self.gateway.webhook(first_payment)
+        self._deliver(*delivery)
+        self._deliver(*delivery)
+        self._deliver(*self.gateway.webhook(first_payment, event='order.paid'))
+        self._deliver(*self.gateway.webhook(second_payment))
+        self._deliver(*self.gateway.webhook(second_payment, event='payment.failed'))
+
+        with CaptureQueriesContext(connection) as queries:
+            out = StringIO()
+            call_command('process_payment_events', stdout=out)
+        stock_updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "core_product" SET "stock"')]
+        self.assertEqual(len(stock_updates), 1)
+        self.assertIn('Processed 5 payment event(s): 1 duplicate, 2 finalized, 1 ignored, 1 skipped.', out.getvalue())
+
+        orders = {order.razorpay_order_id: order for order in Order.objects.all()}
+        self.assertTrue(orders[first].complete and orders[second].complete)
+        self.assertEqual(orders[first].razorpay_payment_id, first_payment)
+        self.assertEqual(orders[second].status, 'Processing')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (2, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+        self._deliver(*delivery)
+        out = StringIO()
+        call_command('process_payment_events', stdout=out)
+        self.assertIn('1 duplicate', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+
+    def test_worker_applies_stored_events(self):
+        cache.clear()
+        order_id = self._online_order('worker')
+        self._deliver(*self.gateway.webhook(self.gateway.pay(order_id)['razorpay_payment_id']))
+
+        lines = run_periodic_tasks({})
+        self.assertIn('Processed 1 payment event(s): 1 finalized.', lines)
+        self.assertTrue(Order.objects.get(razorpay_order_id=order_id).complete)
+
+
+    def test_malformed_events_are_marked_invalid_without_blocking_the_batch(self):
+        order_id = self._online_order('after-garbage')
+        payment_id = self.gateway.pay(order_id)['razorpay_payment_id']
+        for index, body in enumerate([
+            b'[]',
+            b'{"event": "payment.captured", "payload": []}',
+            b'{"event": "payment.captured", "payload": {"payment": {"entity": "pay_x"}}}',
+        ]):
+            self._deliver(f'evt_bad{index}', body, _sign(self.gateway.webhook_secret, body))
+        self._deliver(*self.gateway.webhook(payment_id))
+
+        out = StringIO()
+        with self.assertLogs('core.webhooks', 'WARNING'):
+            call_command('process_payment_events', stdout=out)
+        self.assertIn('Processed 4 payment event(s): 1 finalized, 3 invalid.', out.getvalue())
+        self.assertTrue(Order.objects.get(razorpay_order_id=order_id).complete)
+
+@override_settings(PAYMENT_GATEWAY='fake')
+class ReconcilePaymentsTests(CacheIsolatedTestCase):
+    def setUp(self):
+        reset_gateway()
+        self.gateway = get_gateway()
+        self.category = Category.objects.create(name='Craft', slug='craft')
+        self.product = Product.objects.create(
+            category=self.category, name='Cane Basket', slug='cane-basket', price=300,
+            image='products/basket.jpg', stock=10, available=True,
+        )
+        self.customer = Customer.objects.create(full_name='Reconcile', email='reconcile@example.com')
+
+    def _online_order(self, age):
+        order = Order.objects.create(customer=self.customer, payment_method='ONLINE', total=Decimal('300.00'))
+        order.orderitem_set.create(product=self.product, quantity=1, unit_price=self.product.price)
+        with transaction.atomic():
+            reserve_stock(order, {self.product.id: 1})
+        order.razorpay_order_id = self.gateway.create_order(30000)['id']
+        order.save(update_fields=['razorpay_order_id'])
+        Order.objects.filter(pk=order.pk).update(date_ordered=timezone.now() - age)
+        return order
+
+    def test_reconcile_finalizes_paid_and_expires_abandoned(self):
+        paid = self._online_order(timedelta(hours=1))
+        abandoned = self._online_order(timedelta(days=2))
+        waiting = self._online_order(timedelta(hours=2))
+        fresh = self._online_order(timedelta(minutes=1))
+        self.gateway.pay(paid.razorpay_order_id)
+
+        out = StringIO()
+        call_command('reconcile_payments', '--dry-run', '--page-size', '2', stdout=out)
+        self.assertIn('[dry run] Checked 3 order(s)', out.getvalue())
+        self.assertFalse(Order.objects.get(pk=paid.pk).complete)
+
+        out = StringIO()
+        call_command('reconcile_payments', '--page-size', '2', '--workers', '3', stdout=out)
+        self.assertIn('1 paid, 1 expired, 1 still unpaid, 0 gateway error(s)', out.getvalue())
+
+        orders = Order.objects.in_bulk([paid.pk, abandoned.pk, waiting.pk, fresh.pk])
+        self.assertTrue(orders[paid.pk].complete)
+        self.assertEqual(orders[abandoned.pk].status, 'Cancelled')
+        self.assertEqual(orders[waiting.pk].status, 'Pending')
+        self.assertEqual(orders[fresh.pk].status, 'Pending')
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (9, 2))
+
+    def test_gateway_errors_leave_orders_pending(self):
+        order = self._online_order(timedelta(days=2))
+        self.gateway.sleep = lambda seconds: None
+        self.gateway.fail_next(3)
+
+        with self.assertLogs('core.reconcile', 'WARNING'), self.assertLogs('core.payments', 'WARNING'):
+            stats = reconcile_payments()
+
+        self.assertEqual((stats['checked'], stats['errors']), (1, 1))
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'Pending')
+
+
+class CartQuoteTests(CacheIsolatedTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.category = Category.objects.create(name='Craft', slug='craft')
+        self.lamp = Product.objects.create(
+            category=self.category, name='Brass Lamp', slug='brass-lamp', price=100,
+            image='products/lamp.jpg', stock=5, available=True,
+        )
+        self.mat = Product.objects.create(
+            category=self.category, name='Jute Mat', slug='jute-mat', price=50,
+            image='products/mat.jpg', stock=3, reserved=1, available=True,
+        )
+        get_cached_site_settings()
+        get_shipping_index()
+
+    def _quote(self, items, headers=None, **params):
+        return self.client.get(reverse('cart_quote'), {'items': items, **params}, headers=headers, secure=True)
+
+    def test_quote_prices_cart_and_clamps_to_free_stock(self):
+        response = self._quote(f'{self.lamp.id}:2,{self.mat.id}:5,999999:1')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['unavailable'], [999999])
+        self.assertEqual([(line['id'], line['quantity'], line['line_total']) for line in data['items']], [
+            (self.lamp.id, 2, '200.00'),
+            (self.mat.id, 2, '100.00'),
+        ])
+        self.assertEqual(data['items'][1]['requested_quantity'], 5)
+        self.assertEqual(
+            (data['subtotal'], data['shipping'], data['tax'], data['total']),
+            ('300.00', '15.00', '15.00', '330.00'),
+        )
+        self.assertEqual(data['item_count'], 4)
+        self.assertTrue(data['meets_min_order'])
+
+        far = self._quote(f'{self.lamp.id}:1', delivery_km='20').json()
+        self.assertEqual(far['shipping'], '100.00')
+
+    def test_quote_reads_snapshots_from_cache(self):
+        items = f'{self.lamp.id}:1,{self.mat.id}:1'
+        with self.assertNumQueries(1):
+            first = self._quote(items)
+        with self.assertNumQueries(0):
+            second = self._quote(items, headers={'If-None-Match': first['ETag']})
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(first['Cache-Control'], 'private, no-cache')
+
+    def test_price_change_invalidates_snapshot(self):
+        get_price_snapshots([self.lamp.id])
+        self.lamp.price = 120
+        self.lamp.save()
+
+        data = self._quote(f'{self.lamp.id}:1').json()
+        self.assertEqual(data['items'][0]['unit_price'], '120.00')
+
+        self.lamp.available = False
+        self.lamp.save()
+        self.assertEqual(self._quote(f'{self.lamp.id}:1').json()['unavailable'], [self.lamp.id])
+
+
+class ShippingRateTests(CacheIsolatedTestCase):
+    def setUp(self):
+        cache.clear()
+        ShippingZone.objects.create(name='Rajasthan', pincode_prefix='30', rate=60)
+        self.jaipur = ShippingZone.objects.create(name='Jaipur', pincode_prefix='3020', rate=45)
+
+    def test_quote_uses_longest_pincode_prefix_then_distance_bands(self):
+        self.assertEqual(quote_shipping('302 001'), Decimal('45'))
+        self.assertEqual(quote_shipping('305001', delivery_km=5), Decimal('60'))
+        self.assertEqual(quote_shipping('400001', delivery_km=5), Decimal('30'))
+        self.assertEqual(quote_shipping('400001', delivery_km='12.5'), Decimal('62.5'))
+        self.assertIsNone(quote_shipping('400001'))
+        self.assertIsNone(quote_shipping('', delivery_km='nonsense'))
+
+    def test_index_is_reused_until_rates_change(self):
+        quote_shipping('302001')
+        with self.assertNumQueries(0):
+            self.assertEqual(quote_shipping('302001'), Decimal('45'))
+
+        self.jaipur.rate = 40
+        self.jaipur.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(quote_shipping('302001'), Decimal('40'))
+
+    def test_index_is_rebuilt_after_max_age_without_a_version_bump(self):
+        quote_shipping('302001')
+        ShippingZone.objects.filter(pk=self.jaipur.pk).update(rate=55)
+        self.assertEqual(quote_shipping('302001'), Decimal('45'))
+
+        shipping._shipping_local['loaded_at'] -= caching.LOCAL_COPY_MAX_AGE
+        self.assertEqual(quote_shipping('302001'), Decimal('55'))
+
+    def test_empty_cart_is_not_charged_shipping(self):
+        response = self.client.get(
+            reverse('cart_quote'), {'items': '', 'pincode': '302001', 'delivery_km': 40}, secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['shipping'], response.json()['total']), ('0.00', '0.00'))
+
+    def test_checkout_charges_zone_rate(self):
+        category = Category.objects.create(name='Craft', slug='craft')
+        product = Product.objects.create(
+            category=category, name='Block Print', slug='block-print', price=250,
+            image='products/print.jpg', stock=3, available=True,
+        )
+        user = User.objects.create_user(username='zone@example.com', email='zone@example.com', password='pass12345')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('create_checkout_order'),
+            data=json.dumps({
+                'items': [{'id': product.id, 'quantity': 1}],
+                'payment_method': 'COD',
+                'full_name': 'Zone Buyer',
+                'email': 'zone@example.com',
+                'phone': '9999999999',
+                'address': 'Pink Street',
+                'city': 'Jaipur',
+                'state': 'Rajasthan',
+                'zipcode': '302004',
+                'delivery_km': 40,
+            }),
+            content_type='application/json',
+            secure=True,
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get().shipping, Decimal('45.00'))
+
+
+class SiteSettingsCacheTests(CacheIsolatedTestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_site_settings()
+        self.admin_user = User.objects.create_user(
+            username='settings@example.com',
+            email='settings@example.com',
+            password='adminpass123',
+            is_staff=True,
+        )
+
+    def test_cached_settings_skip_database_when_warm(self):
+        get_cached_site_settings()
+        with self.assertNumQueries(0):
+            settings_obj = get_cached_site_settings()
+        self.assertEqual(settings_obj.id, 1)
+
+    def test_local_copy_expires_without_a_version_bump(self):
+        get_cached_site_settings()
+        SiteSetting.objects.filter(id=1).update(store_name='Elsewhere Edited')
+        self.assertNotEqual(get_cached_site_settings().store_name, 'Elsewhere Edited')
+
+        # As if another worker on an unshared cache saved the row a minute ago.
+        caching._site_settings_local['loaded_at'] -= caching.LOCAL_COPY_MAX_AGE
+        with self.assertNumQueries(1):
+            self.assertEqual(get_cached_site_settings().store_name, 'Elsewhere Edited')
+
+    def test_admin_settings_save_bumps_version(self):
+        get_cached_site_settings()
+        version = site_settings_version()
+
+        self.client.force_login(self.admin_user)
+        response = self.client.post(reverse('admin_settings'), {'store_name': 'Quiet Kiln'}, secure=True)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(site_settings_version(), version)
+        self.assertEqual(get_cached_site_settings().store_name, 'Quiet Kiln')
+        self.assertEqual(SiteSetting.objects.get(id=1).store_name, 'Quiet Kiln')
+
+
+class HomePageCacheTests(CacheIsolatedTestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_home_sections()
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.category = Category.objects.create(name='Pottery', slug='pottery')
+        Product.objects.create(
+            category=self.category,
+            name='Glazed Bowl',
+            slug='glazed-bowl',
+            price=350,
+            image='products/bowl.jpg',
+            stock=3,
+            available=True,
+        )
+
+    def test_warm_home_page_skips_database(self):
+        self.client.get(reverse('home'), secure=True)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'), secure=True)
+        self.assertContains(response, 'Glazed Bowl')
+
+    def test_product_save_invalidates_home_sections(self):
+        self.client.get(reverse('home'), secure=True)
+        Product.objects.create(
+            category=self.category,
+            name='Terracotta Lamp',
+            slug='terracotta-lamp',
+            price=800,
+            image='products/lamp.jpg',
+            stock=2,
+            available=True,
+        )
+
+        response = self.client.get(reverse('home'), secure=True)
+        self.assertContains(response, 'Terracotta Lamp')
+
+    def _count_cold_home_queries(self):
+        get_cached_site_settings()
+        invalidate_home_sections()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def _add_categories(self, start, count):
+        for index in range(start, start + count):
+            category = Category.objects.create(name=f'Showcase {index}', slug=f'showcase-{index}')
+            for product_index in range(8):
+                Product.objects.create(
+                    category=category,
+                    name=f'Showcase {index} Piece {product_index}',
+                    slug=f'showcase-{index}-piece-{product_index}',
+                    price=100,
+                    image='products/piece.jpg',
+                    stock=1,
+                    available=True,
+                )
+
+    def test_home_query_count_is_constant_across_category_count(self):
+        self._add_categories(0, 6)
+        baseline = self._count_cold_home_queries()
+
+        self._add_categories(6, 6)
+        self.assertEqual(self._count_cold_home_queries(), baseline)
+
+        response = self.client.get(reverse('home'), secure=True)
+        self.assertContains(response, 'id="cat-showcase-11"')
+        showcase = {entry['category'].slug: entry['products'] for entry in response.context['extra_case_data']}
+        self.assertEqual(
+            [product.name for product in showcase['showcase-11']],
+            [f'Showcase 11 Piece {index}' for index in range(6)],
+        )
+
+
+class ShopListingTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.ceramics = Category.objects.create(name='Ceramics', slug='ceramics')
+        self.textiles = Category.objects.create(name='Textiles', slug='textiles')
+        for index in range(5):
+            Product.objects.create(
+                category=self.ceramics if index % 2 == 0 else self.textiles,
+                name=f'Listing Piece {index}',
+                slug=f'listing-piece-{index}',
+                price=100 * (index + 1),
+                image='products/piece.jpg',
+                stock=2,
+                available=True,
+            )
+        Product.objects.create(
+            category=self.ceramics,
+            name='Hidden Piece',
+            slug='hidden-piece',
+            price=50,
+            image='products/piece.jpg',
+            stock=0,
+            available=False,
+        )
+
+    def _fetch_all(self, params):
+        names = []
+        cursor = ''
+        while True:
+            response = self.client.get(reverse('shop_products_api'), {**params, 'cursor': cursor, 'limit': 2}, secure=True)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            names.extend(product['name'] for product in data['products'])
+            if not data['has_more']:
+                return names
+            cursor = data['next_cursor']
+
+    def test_keyset_pages_cover_every_available_product_once(self):
+        names = self._fetch_all({})
+        self.assertEqual(names, [f'Listing Piece {index}' for index in reversed(range(5))])
+
+    def test_category_and_price_filters(self):
+        names = self._fetch_all({'category': 'ceramics', 'min_price': '200', 'sort': 'price_asc'})
+        self.assertEqual(names, ['Listing Piece 2', 'Listing Piece 4'])
+
+    def test_malformed_cursors_fall_back_to_the_first_page(self):
+        first_page = self.client.get(reverse('shop_products_api'), {'limit': 2}, secure=True).json()['products']
+        cursors = [
+            ['2024-01-01T00:00:00', 'x'],
+            [123, 1],
+            ['2024-13-45T00:00:00', 1],
+            ['2024-01-01T00:00:00', True],
+            ['2024-01-01T00:00:00'],
+            {'a': 1},
+        ]
+        for values in cursors:
+            for sort in ('newest', 'price_asc'):
+                with self.subTest(cursor=values, sort=sort):
+                    response = self.client.get(
+                        reverse('shop_products_api'),
+                        {'cursor': encode_cursor(values), 'limit': 2, 'sort': sort},
+                        secure=True,
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    if sort == 'newest':
+                        self.assertEqual(response.json()['products'], first_page)
+        response = self.client.get(reverse('shop_products_api'), {'cursor': '!!not-base64', 'limit': 2}, secure=True)
+        self.assertEqual(response.json()['products'], first_page)
+
+    def test_shop_page_renders_first_page_with_cursor(self):
+        response = self.client.get(reverse('shop'), {'limit': 3}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['products']), 3)
+        self.assertTrue(response.context['next_cursor'])
+        self.assertNotContains(response, 'Hidden Piece')
+
+
+class CatalogSearchTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.category = Category.objects.create(name='Brassware', slug='brassware')
+        self.lamp = Product.objects.create(
+            category=self.category,
+            name='Brass Lantern',
+            slug='brass-lantern',
+            price=900,
+            image='products/lantern.jpg',
+            stock=3,
+            available=True,
+            description='Hand-beaten lantern for calm evenings',
+        )
+        self.bowl = Product.objects.create(
+            category=self.category,
+            name='Offering Bowl',
+            slug='offering-bowl',
+            price=400,
+            image='products/bowl.jpg',
+            stock=3,
+            available=True,
+            description='Pairs well with a lantern',
+        )
+        GalleryItem.objects.create(title='Lantern Festival Print', price=0, category='Other', image='gallery/print.jpg')
+
+    def test_hit_without_a_price_serializes_as_null(self):
+        item = GalleryItem(id=99, title='Unpriced Print', price=None, category='Other', image='gallery/print.jpg')
+        self.assertIsNone(_serialize_hit('gallery', item)['price'])
+        self.assertEqual(_serialize_hit('product', self.lamp)['price'], '900')
+
+    def _search(self, query, **params):
+        response = self.client.get(reverse('search_api'), {'q': query, **params}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_prefix_search_ranks_title_matches_first(self):
+        names = [hit['name'] for hit in self._search('lant')]
+        self.assertEqual(set(names[:2]), {'Brass Lantern', 'Lantern Festival Print'})
+        self.assertEqual(names[2:], ['Offering Bowl'])
+
+    def test_index_follows_product_and_category_changes(self):
+        self.lamp.name = 'Copper Lamp'
+        self.lamp.save()
+        self.category.name = 'Metalwork'
+        self.category.save()
+        self.bowl.available = False
+        self.bowl.save()
+
+        self.assertEqual([hit['name'] for hit in self._search('copper', kind='product')], ['Copper Lamp'])
+        self.assertEqual([hit['name'] for hit in self._search('metalwork', kind='product')], ['Copper Lamp'])
+        self.assertEqual(self._search('offering'), [])
+
+    def test_rebuild_command_repopulates_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM core_search_index')
+        self.assertEqual(self._search('lantern'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self._search('brass', kind='product')[0]['name'], 'Brass Lantern')
+
+
+class ProductImportTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.category = Category.objects.create(name='Decor', slug='decor')
+        self.product = Product.objects.create(
+            category=self.category,
+            name='Lantern',
+            slug='lantern',
+            price=499,
+            image='products/lantern.jpg',
+            stock=4,
+            available=True,
+            description='Brass lantern',
+        )
+        self.admin_user = User.objects.create_user(
+            username='imports@example.com',
+            email='imports@example.com',
+            password='adminpass123',
+            is_staff=True,
+        )
+        self.client.force_login(self.admin_user)
+        use_temp_media(self)
+
+    def _upload(self, text):
+        upload = BytesIO(text.encode('utf-8'))
+        upload.name = 'products.csv'
+        response = self.client.post(
+            reverse('admin_import_products'),
+            {'csv_file': upload},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            secure=True,
+        )
+        self.assertEqual(response.status_code, 202)
+        return Job.objects.get(pk=response.json()['id'])
+
+    def _job_status(self, job):
+        return self.client.get(reverse('admin_job_status', args=[job.id]), secure=True).json()
+
+    def test_import_creates_updates_and_reports_bad_rows(self):
+        job = self._upload(
+            'id,name,slug,category,price,stock,available,description\n'
+            f'{self.product.id},Brass Lantern,,Decor,650,9,yes,Updated\n'
+            ',Jute Rug,,Textiles,1200,3,yes,Handwoven\n'
+            ',Lantern,,Decor,300,2,yes,Second lantern\n'
+            ',Bad Price,,Decor,abc,1,yes,\n'
+            ',No Category,,,100,1,yes,\n'
+        )
+        self.assertEqual(self._job_status(job)['status'], 'queued')
+        self.assertEqual(Product.objects.count(), 1)
+
+        call_command('run_worker', '--once', '--processes', '0', stdout=StringIO())
+
+        status = self._job_status(job)
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['progress'], 5)
+        self.assertEqual((status['result']['created'], status['result']['updated']), (2, 1))
+        self.assertEqual([error['row'] for error in status['result']['errors']], [5, 6])
+        self.assertIn('Invalid price', status['result']['errors'][0]['error'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, 'Brass Lantern')
+        self.assertEqual(self.product.stock, 9)
+        self.assertEqual(Product.objects.get(name='Jute Rug').category.name, 'Textiles')
+        self.assertEqual(Product.objects.get(description='Second lantern').slug, 'lantern-1')
+        self.assertFalse(Product.objects.filter(name__in=['Bad Price', 'No Category']).exists())
+        self.assertFalse(job_storage().exists(job.payload['path']))
+
+    def test_import_refreshes_cached_prices(self):
+        self.assertEqual(get_price_snapshots([self.product.id])[self.product.id]['price'], '499.00')
+        job = self._upload(
+            'id,name,slug,category,price,stock,available,description\n'
+            f'{self.product.id},Lantern,lantern,Decor,550,4,yes,Brass lantern\n'
+        )
+        claim_next_job()
+        run_job(job.id)
+
+        self.assertEqual(get_price_snapshots([self.product.id])[self.product.id]['price'], '550.00')
+
+    def test_import_uses_batched_queries(self):
+        rows = ''.join(f',Piece {index},,Decor,100,1,yes,\n' for index in range(300))
+        csv_text = 'id,name,slug,category,price,stock,available,description\n' + rows
+
+        job = self._upload(csv_text)
+        claim_next_job()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(run_job(job.id), 'done')
+
+        self.assertEqual(Product.objects.filter(name__startswith='Piece ').count(), 300)
+        self.assertLess(len(queries), 25)
+
+
+class BackgroundJobTests(CacheIsolatedTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.defaults['wsgi.url_scheme'] = 'https'
+        self.category = Category.objects.create(name='Decor', slug='decor')
+        Product.objects.create(
+            category=self.category,
+            name='Lantern',
+            slug='lantern',
+            price=499,
+            image='products/lantern.jpg',
+            stock=4,
+            available=True,
+        )
+        self.admin_user = User.objects.create_user(
+            username='jobs@example.com',
+            email='jobs@example.com',
+            password='adminpass123',
+            is_staff=True,
+        )
+        self.client.force_login(self.admin_user)
+        use_temp_media(self)
+
+    def test_background_pdf_export_can_be_downloaded(self):
+        response = self.client.get(
+            reverse('admin_export_inventory'), {'format': 'pdf', 'background': '1'}, secure=True
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+
+        call_command('run_worker', '--once', '--processes', '0', stdout=StringIO())
+
+        status = self.client.get(reverse('admin_job_status', args=[job_id]), secure=True).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['progress'], 1)
+        self.assertNotIn('path', status['result'])
+
+        download = self.client.get(status['download_url'], secure=True)
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertIn('inventory_export.pdf', download['Content-Disposition'])
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF-1.4'))
+
+        # Exports hold customer data: never under MEDIA_ROOT, which is served publicly.
+        path = Job.objects.get(pk=job_id).result['path']
+        self.assertTrue(job_storage().exists(path))
+        self.assertFalse(default_storage.exists(path))
+
+    def test_old_export_files_are_deleted(self):
+        self.client.get(reverse('admin_export_inventory'), {'format': 'pdf', 'background': '1'}, secure=True)
+        call_command('run_worker', '--once', '--processes', '0', stdout=StringIO())
+        job = Job.objects.get(kind='export')
+        path = job.result['path']
+
+        self.assertEqual(purge_job_files(), 0)
+        Job.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(purge_job_files(), 1)
+
+        self.assertFalse(job_storage().exists(path))
+        self.assertNotIn('path', Job.objects.get(pk=job.pk).result)
+        download = self.client.get(reverse('admin_job_download', args=[job.pk]), secure=True)
+        self.assertEqual(download.status_code, 404)
+
+    def test_campaign_send_only_marks_sent_when_emails_are_disabled(self):
+        Customer.objects.create(full_name='A', email='a@example.com')
+        self.client.post(
+            reverse('admin_campaigns'),
+            {'subject': 'Quiet drop', 'content': 'New lanterns', 'action': 'send'},
+            secure=True,
+        )
+        campaign = Campaign.objects.get(subject='Quiet drop')
+        self.assertEqual(campaign.status, 'Sent')
+        self.assertFalse(Job.objects.filter(kind='campaign_send').exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(CAMPAIGN_EMAILS_ENABLED=True)
+    def test_campaign_send_runs_in_worker(self):
+        Customer.objects.create(full_name='A', email='a@example.com')
+        Customer.objects.create(full_name='B', email='b@example.com')
+        Customer.objects.create(full_name='B again', email='b@example.com')
+
+        self.client.post(
+            reverse('admin_campaigns'),
+            {'subject': 'Autumn drop', 'content': 'New lanterns', 'action': 'send'},
+            secure=True,
+        )
+        campaign = Campaign.objects.get(subject='Autumn drop')
+        self.assertEqual(campaign.status, 'Scheduled')
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('run_worker', '--once', '--processes', '0', stdout=StringIO())
+
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, 'Sent')
+        self.assertIsNotNone(campaign.sent_date)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['a@example.com', 'b@example.com'])
+        self.assertEqual(Job.objects.get(kind='campaign_send').result, {'sent': 2, 'recipients': 2})
+
+    def test_failed_job_records_error_and_stale_jobs_are_requeued(self):
+        job = enqueue_job('export', {'section': 'orders', 'format': 'pdf'})
+        self.assertEqual(claim_next_job().id, job.id)
+        self.assertIsNone(claim_next_job())
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertEqual(run_job(job.id), 'failed')
+        job.refresh_from_db()
+        self.assertIn('Unsupported export', job.error)
+
+        stale = enqueue_job('export', {'section': 'products', 'format': 'csv'})
+        claim_next_job()
+        two_hours_ago = timezone.now() - timedelta(hours=2)
+        Job.objects.filter(pk=stale.pk).update(started_at=two_hours_ago, heartbeat_at=two_hours_ago)
+        self.assertEqual(requeue_stale_jobs(timedelta(hours=1)), (1, 0))
+        self.assertEqual(Job.objects.get(pk=stale.pk).status, 'queued')
+
+    def test_long_job_with_a_recent_heartbeat_is_not_requeued(self):
+        job = enqueue_job('export', {'section': 'products', 'format': 'csv'})
+        claim_next_job()
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        jobs._progress_reporter(job.pk)(10, 100)
+
+        self.assertEqual(requeue_stale_jobs(timedelta(hours=1)), (0, 0))
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'running')
+
+    @override_settings(CAMPAIGN_EMAILS_ENABLED=True)
+    def test_retried_campaign_resumes_after_the_last_delivered_batch(self):
+        for index in range(5):
+            Customer.objects.create(full_name=f'C{index}', email=f'c{index}@example.com')
+        campaign = Campaign.objects.create(subject='Resume', content='Hi', status='Scheduled')
+        job = enqueue_job('campaign_send', {'campaign_id': campaign.pk})
+        claim_next_job()
+
+        # A previous attempt delivered the first batch, then its worker died.
+        Job.objects.filter(pk=job.pk).update(result={'sent': 2, 'last_email': 'c1@example.com'})
+        with patch.object(jobs, 'CAMPAIGN_BATCH_SIZE', 2):
+            self.assertEqual(run_job(job.pk), 'done')
+
+        self.assertEqual(
+            [message.to[0] for message in mail.outbox],
+            ['c2@example.com', 'c3@example.com', 'c4@example.com'],
+        )
+        self.assertEqual(Job.objects.get(pk=job.pk).result, {'sent': 5, 'recipients': 5})
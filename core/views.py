@@ -1,27 +1,52 @@
+import hashlib
 import json
-from urllib.parse import quote
-from datetime import timedelta
+import os
+from uuid import uuid4
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal, InvalidOperation
+from urllib.parse import quote, urlencode
+from datetime import date, datetime, time, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import get_conditional_response
 from django.utils.text import slugify
+from django.utils.dateparse import parse_date, parse_datetime
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
 from django.utils.html import escape
 from django.contrib import messages
-from django.db.models import Count, Sum, F
-from django.db.models.functions import TruncDate, TruncMonth
+from django.db import transaction
+from django.db.models import Count, Sum, F, Q, Window
+from django.db.models.functions import RowNumber
 from django.conf import settings
-import razorpay
 import csv
 import random
 
+from asgiref.sync import sync_to_async
+
 from .models import (
     Product, Customer, Category, GalleryItem, Order, OrderItem, ShippingAddress,
-    Offer, Review, Campaign, SiteSetting, ReturnRequest
+    Offer, Review, Campaign, SiteSetting, ReturnRequest, Job, PaymentEvent, DailySalesRollup
 )
+from .analytics import ANALYTICS_GRANULARITIES, ANALYTICS_RANGES, get_sales_series
+from .caching import get_cached_site_settings, get_home_section, get_price_snapshots
+from .exports import XLSX_CONTENT_TYPE, format_export_value, iter_table_pdf, iter_table_xlsx
+from .idempotency import idempotent
+from .jobs import enqueue_job, job_storage
+from .orderfeed import ORDER_FEED_PAGE_SIZE, iter_order_changes_once, latest_change_cursor, stream_order_changes
+from .orders import finalize_order, finalize_paid_orders, restock_order
+from .payments import PaymentGatewayError, get_gateway
+from .search import SEARCH_KINDS, search_catalog
+from .shipping import quote_shipping
+from .stats import count_breakdown
+from .stock import InsufficientStock, order_quantities, release_order_reservations, reserve_stock
 
 # ------------------ HELPER FUNCTIONS ------------------
 
@@ -83,133 +108,12 @@ def generate_unique_slug(model, name, slug_field='slug', instance_id=None):
         counter += 1
 
 
-def _format_export_value(value):
-    if value is None:
-        return ''
-    if hasattr(value, 'strftime'):
-        return value.strftime('%Y-%m-%d %H:%M:%S')
-    return str(value)
-
-
-def _chunk_lines(lines, chunk_size):
-    for index in range(0, len(lines), chunk_size):
-        yield lines[index:index + chunk_size]
-
-
-def _wrap_pdf_line(text, width=95):
-    text = text or ''
-    words = text.split()
-    if not words:
-        return ['']
-
-    lines = []
-    current = words[0]
-
-    for word in words[1:]:
-        candidate = f'{current} {word}'
-        if len(candidate) <= width:
-            current = candidate
-        else:
-            lines.append(current)
-            current = word
-
-    lines.append(current)
-    return lines
-
-
-def _pdf_escape(text):
-    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
-
-
-def _build_simple_pdf(title, headers, rows):
-    pdf_lines = [title, '', ' | '.join(headers), '-' * min(110, max(20, len(' | '.join(headers))))]
-
-    for row in rows:
-        row_text = ' | '.join(_format_export_value(value) for value in row)
-        pdf_lines.extend(_wrap_pdf_line(row_text))
-
-    page_chunks = list(_chunk_lines(pdf_lines, 42)) or [['No data available']]
-    page_objects = []
-    content_objects = []
-
-    for page_index, page_lines in enumerate(page_chunks):
-        operations = ['BT', '/F1 10 Tf', '40 780 Td', '14 TL']
-        for line_index, line in enumerate(page_lines):
-            safe_line = _pdf_escape(line)
-            if line_index == 0:
-                operations.append(f'({safe_line}) Tj')
-            else:
-                operations.append(f'T* ({safe_line}) Tj')
-        operations.append('ET')
-        content_stream = '\n'.join(operations)
-
-        page_object_number = 3 + (page_index * 2)
-        content_object_number = page_object_number + 1
-
-        page_objects.append(
-            f"{page_object_number} 0 obj\n"
-            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
-            f"/Resources << /Font << /F1 {3 + len(page_chunks) * 2} 0 R >> >> "
-            f"/Contents {content_object_number} 0 R >>\n"
-            "endobj\n"
-        )
-        content_objects.append(
-            f"{content_object_number} 0 obj\n"
-            f"<< /Length {len(content_stream.encode('latin-1', errors='replace'))} >>\n"
-            "stream\n"
-            f"{content_stream}\n"
-            "endstream\n"
-            "endobj\n"
-        )
-
-    font_object_number = 3 + len(page_chunks) * 2
-    objects = [
-        "1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
-        (
-            "2 0 obj\n"
-            f"<< /Type /Pages /Kids [{' '.join(f'{3 + (idx * 2)} 0 R' for idx in range(len(page_chunks)))}] "
-            f"/Count {len(page_chunks)} >>\n"
-            "endobj\n"
-        ),
-    ]
-
-    for page_object, content_object in zip(page_objects, content_objects):
-        objects.append(page_object)
-        objects.append(content_object)
-
-    objects.append(
-        f"{font_object_number} 0 obj\n"
-        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>\n"
-        "endobj\n"
-    )
-
-    pdf = b'%PDF-1.4\n'
-    offsets = [0]
-
-    for obj in objects:
-        offsets.append(len(pdf))
-        pdf += obj.encode('latin-1', errors='replace')
-
-    xref_start = len(pdf)
-    pdf += f"xref\n0 {len(offsets)}\n".encode('latin-1')
-    pdf += b"0000000000 65535 f \n"
-
-    for offset in offsets[1:]:
-        pdf += f"{offset:010} 00000 n \n".encode('latin-1')
-
-    pdf += (
-        f"trailer\n<< /Size {len(offsets)} /Root 1 0 R >>\n"
-        f"startxref\n{xref_start}\n%%EOF"
-    ).encode('latin-1')
-    return pdf
-
-
 def _render_table_document(title, headers, rows):
     header_html = ''.join(f'<th>{escape(header)}</th>' for header in headers)
     row_html = []
 
     for row in rows:
-        cells = ''.join(f'<td>{escape(_format_export_value(value))}</td>' for value in row)
+        cells = ''.join(f'<td>{escape(format_export_value(value))}</td>' for value in row)
         row_html.append(f'<tr>{cells}</tr>')
 
     if not row_html:
@@ -245,134 +149,214 @@ def _render_table_document(title, headers, rows):
 </html>"""
 
 
+EXPORT_CHUNK_SIZE = 2000
+# Columns written as typed numeric cells in spreadsheet exports.
+EXPORT_NUMERIC_HEADERS = {'ID', 'Price', 'Stock', 'Products'}
+CSV_ROWS_PER_CHUNK = 500
+
+
+def _media_url(name):
+    return default_storage.url(name) if name else ''
+
+
+def _inventory_status(stock):
+    if stock > 10:
+        return 'In Stock'
+    if stock > 0:
+        return 'Low Stock'
+    return 'Out of Stock'
+
+
 def _get_export_payload(section):
+    # Rows are generators over .values_list().iterator() so an export never
+    # holds the whole table (or any model instances) in memory.
     if section == 'products':
-        queryset = Product.objects.select_related('category').all()
+        queryset = Product.objects.order_by('id').values_list(
+            'id', 'name', 'slug', 'category__name', 'price', 'stock', 'available', 'description', 'image'
+        )
         headers = ['ID', 'Name', 'Slug', 'Category', 'Price', 'Stock', 'Available', 'Description', 'Image URL']
-        rows = [
+        rows = (
             [
-                product.id,
-                product.name,
-                product.slug,
-                product.category.name if product.category else '',
-                product.price,
-                product.stock,
-                'Yes' if product.available else 'No',
-                product.description or '',
-                product.image.url if product.image else '',
+                product_id,
+                name,
+                slug,
+                category_name or '',
+                price,
+                stock,
+                'Yes' if available else 'No',
+                description or '',
+                _media_url(image),
             ]
-            for product in queryset
-        ]
+            for product_id, name, slug, category_name, price, stock, available, description, image
+            in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
         return 'Products Export', 'products_export', headers, rows
 
     if section == 'categories':
-        queryset = Category.objects.annotate(product_count=Count('products')).all()
+        queryset = Category.objects.annotate(product_count=Count('products')).order_by('id').values_list(
+            'id', 'name', 'slug', 'product_count', 'image'
+        )
         headers = ['ID', 'Name', 'Slug', 'Products', 'Image URL']
-        rows = [
-            [
-                category.id,
-                category.name,
-                category.slug,
-                category.product_count,
-                category.image.url if category.image else '',
-            ]
-            for category in queryset
-        ]
+        rows = (
+            [category_id, name, slug, product_count, _media_url(image)]
+            for category_id, name, slug, product_count, image in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
         return 'Categories Export', 'categories_export', headers, rows
 
     if section == 'inventory':
-        queryset = Product.objects.select_related('category').all()
+        queryset = Product.objects.order_by('id').values_list(
+            'id', 'name', 'category__name', 'stock', 'available', 'updated_at'
+        )
         headers = ['ID', 'Product', 'SKU', 'Category', 'Stock', 'Status', 'Available', 'Last Updated']
-        rows = []
-        for product in queryset:
-            if product.stock > 10:
-                status = 'In Stock'
-            elif product.stock > 0:
-                status = 'Low Stock'
-            else:
-                status = 'Out of Stock'
-
-            rows.append([
-                product.id,
-                product.name,
-                f'SKU-{product.id}00X',
-                product.category.name if product.category else '',
-                product.stock,
-                status,
-                'Yes' if product.available else 'No',
-                product.updated_at,
-            ])
+        rows = (
+            [
+                product_id,
+                name,
+                f'SKU-{product_id}00X',
+                category_name or '',
+                stock,
+                _inventory_status(stock),
+                'Yes' if available else 'No',
+                updated_at,
+            ]
+            for product_id, name, category_name, stock, available, updated_at
+            in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
         return 'Inventory Export', 'inventory_export', headers, rows
 
     return None
 
 
-def _build_export_response(title, filename_base, headers, rows, export_format):
-    export_format = (export_format or 'csv').lower()
+class _Echo:
+    """File-like object whose write() hands the formatted line straight back."""
 
-    if export_format == 'csv':
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-        writer = csv.writer(response)
-        writer.writerow(headers)
-        for row in rows:
-            writer.writerow([_format_export_value(value) for value in row])
-        return response
+    def write(self, value):
+        return value
 
-    if export_format == 'word':
-        response = HttpResponse(
-            _render_table_document(title, headers, rows),
-            content_type='application/msword'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename_base}.doc"'
-        return response
 
+def _stream_csv(headers, rows):
+    writer = csv.writer(_Echo())
+    buffer = [writer.writerow(headers)]
+    for row in rows:
+        buffer.append(writer.writerow([format_export_value(value) for value in row]))
+        if len(buffer) >= CSV_ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+EXPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'word': ('doc', 'application/msword'),
+    'excel': ('xlsx', XLSX_CONTENT_TYPE),
+    'pdf': ('pdf', 'application/pdf'),
+}
+
+
+def _iter_export(title, headers, rows, export_format):
+    if export_format == 'csv':
+        return _stream_csv(headers, rows)
+    if export_format == 'word':
+        return [_render_table_document(title, headers, rows)]
     if export_format == 'excel':
-        response = HttpResponse(
-            _render_table_document(title, headers, rows),
-            content_type='application/vnd.ms-excel'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename_base}.xls"'
-        return response
+        return iter_table_xlsx(title, headers, rows, numeric_columns=EXPORT_NUMERIC_HEADERS)
+    return iter_table_pdf(title, headers, rows)
 
-    if export_format == 'pdf':
-        response = HttpResponse(
-            _build_simple_pdf(title, headers, rows),
-            content_type='application/pdf'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename_base}.pdf"'
-        return response
 
-    return HttpResponseBadRequest('Unsupported export format.')
+def _count_rows(rows, progress):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % EXPORT_CHUNK_SIZE == 0:
+            progress(count)
+    progress(count)
 
-# ------------------ PUBLIC PAGES ------------------
 
-def home(request):
-    gallery_slider = Product.objects.filter(available=True).order_by('-created_at')[:7]
-    wood_products = Product.objects.filter(category__name='Wood')[:5]
-    categories = Category.objects.all()[:4]
+def render_export(section, export_format, progress=None):
+    """Return (filename, content_type, chunks) for a background export job."""
+    payload = _get_export_payload(section)
+    export_format = (export_format or 'csv').lower()
+    if not payload or export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export: {section}/{export_format}')
 
-    # Identify categories already featured to avoid duplication
-    shown_cat_ids = [cat.id for cat in categories]
-    wood_cat = Category.objects.filter(name='Wood').first()
-    if wood_cat:
-        shown_cat_ids.append(wood_cat.id)
+    title, filename_base, headers, rows = payload
+    if progress:
+        rows = _count_rows(rows, progress)
+    extension, content_type = EXPORT_FORMATS[export_format]
+    return f'{filename_base}.{extension}', content_type, _iter_export(title, headers, rows, export_format)
+
+
+def _build_export_response(title, filename_base, headers, rows, export_format):
+    export_format = (export_format or 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest('Unsupported export format.')
+
+    extension, content_type = EXPORT_FORMATS[export_format]
+    content = _iter_export(title, headers, rows, export_format)
+    if export_format == 'word':
+        response = HttpResponse(content, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename_base}.{extension}"'
+    return response
+
+# ------------------ PUBLIC PAGES ------------------
+
+def _home_extra_case_data(shown_cat_ids, per_category=6):
+    # One windowed query returns the first few available products of every
+    # non-featured category, instead of a query (plus .exists()) per category.
+    products = (
+        Product.objects.filter(available=True)
+        .exclude(category_id__in=shown_cat_ids)
+        .select_related('category')
+        .annotate(category_rank=Window(
+            expression=RowNumber(),
+            partition_by=F('category_id'),
+            order_by=F('id').asc(),
+        ))
+        .filter(category_rank__lte=per_category)
+        .order_by('category_id', 'category_rank')
+    )
 
-    # Fetch extra categories and their products for dynamic showcases
-    extra_categories = Category.objects.exclude(id__in=shown_cat_ids)
     extra_case_data = []
-    for cat in extra_categories:
-        prods = Product.objects.filter(category=cat, available=True)[:6]
-        if prods.exists():
+    for product in products:
+        if not extra_case_data or extra_case_data[-1]['category'].id != product.category_id:
             extra_case_data.append({
-                'category': cat,
-                'products': prods
+                'category': product.category,
+                'products': [],
             })
+        extra_case_data[-1]['products'].append(product)
+    return extra_case_data
+
+
+def home(request):
+    gallery_slider = get_home_section(
+        'slider',
+        lambda: list(Product.objects.filter(available=True).order_by('-created_at')[:7])
+    )
+    wood_products = get_home_section(
+        'wood',
+        lambda: list(Product.objects.filter(category__name='Wood')[:5])
+    )
+    categories = get_home_section('categories', lambda: list(Category.objects.all()[:4]))
+
+    def build_showcase():
+        # Identify categories already featured to avoid duplication
+        shown_cat_ids = [cat.id for cat in categories]
+        wood_cat = Category.objects.filter(name='Wood').first()
+        if wood_cat:
+            shown_cat_ids.append(wood_cat.id)
+        return _home_extra_case_data(shown_cat_ids)
+
+    # Fetch extra categories and their products for dynamic showcases
+    extra_case_data = get_home_section('showcase', build_showcase)
 
     # load latest featured reviews
-    reviews = _prepare_reviews(
+    reviews = get_home_section('reviews', lambda: _prepare_reviews(
         Review.objects.select_related('customer', 'product').order_by('-is_liked', '-created_at')[:3]
-    )
+    ))
 
     return render(request, 'index.html', {
         'gallery_slider': gallery_slider,
@@ -383,15 +367,174 @@ def home(request):
     })
 
 
+SHOP_PAGE_SIZE = 24
+SHOP_MAX_PAGE_SIZE = 60
+
+# sort key -> (ordering field, descending)
+SHOP_SORTS = {
+    'newest': ('created_at', True),
+    'oldest': ('created_at', False),
+    'price_asc': ('price', False),
+    'price_desc': ('price', True),
+}
+
+
+def _encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor, parse_value=None):
+    """Return (value, id) from a keyset cursor, or None if it is missing or malformed.
+
+    Cursors come back from the client, so the id must be an int and the
+    value must survive ``parse_value``; a bad cursor means the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != 2:
+        return None
+    value, cursor_id = values
+    if not isinstance(cursor_id, int) or isinstance(cursor_id, bool):
+        return None
+    if parse_value is not None:
+        try:
+            value = parse_value(value)
+        except (ValueError, TypeError):
+            return None
+        if value is None:
+            return None
+    return value, cursor_id
+
+
+def _parse_cursor_datetime(value):
+    if not isinstance(value, str):
+        return None
+    parsed = parse_datetime(value)
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _keyset_after(queryset, field, descending, cursor):
+    """Rows after ``cursor`` in (field, id) order; ``cursor`` is from _decode_cursor."""
+    if not cursor:
+        return queryset
+    value, cursor_id = cursor
+    lookup = 'lt' if descending else 'gt'
+    return queryset.filter(
+        Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': cursor_id})
+    )
+
+
+def _parse_price(value):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float, Decimal)):
+        return None
+    try:
+        price = Decimal(str(value)) if value != '' else None
+    except InvalidOperation:
+        return None
+    return price if price is None or price.is_finite() else None
+
+
+def _shop_listing(params):
+    """Return one keyset page of available products for the shop filters in ``params``."""
+    sort = params.get('sort') or 'newest'
+    if sort not in SHOP_SORTS:
+        sort = 'newest'
+    sort_field, descending = SHOP_SORTS[sort]
+
+    try:
+        limit = int(params.get('limit') or SHOP_PAGE_SIZE)
+    except (TypeError, ValueError):
+        limit = SHOP_PAGE_SIZE
+    limit = max(1, min(limit, SHOP_MAX_PAGE_SIZE))
+
+    products = Product.objects.filter(available=True).select_related('category')
+
+    category_value = (params.get('category') or '').strip()
+    if category_value and category_value.lower() != 'all':
+        category = Category.objects.filter(Q(slug=category_value) | Q(name__iexact=category_value)).first()
+        if not category:
+            return [], None
+        products = products.filter(category_id=category.id)
+
+    min_price = _parse_price(params.get('min_price'))
+    if min_price is not None:
+        products = products.filter(price__gte=min_price)
+    max_price = _parse_price(params.get('max_price'))
+    if max_price is not None:
+        products = products.filter(price__lte=max_price)
+
+    parse_value = _parse_cursor_datetime if sort_field == 'created_at' else _parse_price
+    cursor = _decode_cursor(params.get('cursor'), parse_value)
+    products = _keyset_after(products, sort_field, descending, cursor)
+
+    prefix = '-' if descending else ''
+    page = list(products.order_by(f'{prefix}{sort_field}', f'{prefix}id')[:limit + 1])
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        last_value = getattr(last, sort_field)
+        last_value = last_value.isoformat() if sort_field == 'created_at' else str(last_value)
+        next_cursor = _encode_cursor([last_value, last.id])
+    return page, next_cursor
+
+
+def _serialize_shop_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'slug': product.slug,
+        'price': str(product.price),
+        'available_stock': product.available_stock,
+        'category': product.category.name if product.category else 'Other',
+        'image_url': product.image.url if product.image else '',
+        'url': reverse('product_detail', args=[product.id]),
+    }
+
+
 def shop(request):
-    products = Product.objects.filter(available=True)
+    products, next_cursor = _shop_listing(request.GET)
     categories = Category.objects.all()
     
     return render(request, 'shop.html', {
         'products': products,
-        'categories': categories
+        'categories': categories,
+        'next_cursor': next_cursor or '',
+        'selected_category': request.GET.get('category', 'all'),
     })
 
+
+@require_GET
+def shop_products_api(request):
+    products, next_cursor = _shop_listing(request.GET)
+    return JsonResponse({
+        'products': [_serialize_shop_product(product) for product in products],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
+
+@require_GET
+def search_api(request):
+    query = (request.GET.get('q') or '').strip()
+    kinds = [kind for kind in (request.GET.get('kind') or '').split(',') if kind] or SEARCH_KINDS
+    try:
+        limit = int(request.GET.get('limit') or 20)
+    except (TypeError, ValueError):
+        limit = 20
+
+    results = search_catalog(query, kinds=kinds, limit=limit) if query else []
+    return JsonResponse({'query': query, 'results': results})
+
+
 def product_detail(request, pk):
     return render(request, 'product_detail.html', {
         'product': get_object_or_404(Product, pk=pk)
@@ -526,52 +669,47 @@ def verify_otp_reset_api(request):
 @login_required(login_url='login')
 @user_passes_test(admin_only, login_url='login')
 def admin_dashboard(request):
-    orders = Order.objects.select_related('customer').prefetch_related('orderitem_set__product').order_by('-date_ordered')
-    total_orders = orders.count()
-    pending_count = Order.objects.filter(status='Pending').count()
-    processing_count = Order.objects.filter(status='Processing').count()
-    total_revenue = OrderItem.objects.filter(
-        order__complete=True
-    ).aggregate(total=Sum(F('quantity') * F('product__price')))['total'] or 0
+    orders = Order.objects.select_related('customer').order_by('-date_ordered')
+    order_counts = count_breakdown(Order.objects.all(), {
+        'total': None,
+        'pending': Q(status='Pending'),
+        'processing': Q(status='Processing'),
+    })
+    total_revenue = DailySalesRollup.objects.aggregate(total=Sum('revenue'))['total'] or 0
 
     recent_orders = orders[:5]
     
     # Stock Statistics
-    total_products = Product.objects.count()
-    low_stock_count = Product.objects.filter(stock__gt=0, stock__lte=10).count()
-    out_of_stock_count = Product.objects.filter(stock=0).count()
-    total_stock = Product.objects.aggregate(total=Sum('stock'))['total'] or 0
-
-    daily_revenue_rows = (
-        OrderItem.objects.filter(order__complete=True)
-        .annotate(day=TruncDate('order__date_ordered'))
-        .values('day')
-        .annotate(total=Sum(F('quantity') * F('product__price')))
-        .order_by('-day')[:7]
-    )
-    daily_revenue_rows = list(reversed(daily_revenue_rows))
-    revenue_labels = [row['day'].strftime('%d %b') if row['day'] else '' for row in daily_revenue_rows]
-    revenue_values = [float(row['total'] or 0) for row in daily_revenue_rows]
+    product_counts = count_breakdown(Product.objects.all(), {
+        'total': None,
+        'low_stock': Q(stock__gt=0, stock__lte=10),
+        'out_of_stock': Q(stock=0),
+    }, total_stock=Sum('stock'))
+
+    daily_revenue, _ = get_sales_series('7d', 'day')
+    revenue_labels = [date.fromisoformat(row['start']).strftime('%d %b') for row in daily_revenue['buckets']]
+    revenue_values = [row['revenue'] for row in daily_revenue['buckets']]
 
     category_rows = (
-        OrderItem.objects.filter(order__complete=True, product__category__isnull=False)
-        .values('product__category__name')
-        .annotate(total=Sum(F('quantity') * F('product__price')))
+        DailySalesRollup.objects.filter(category__isnull=False)
+        .values('category__name')
+        .annotate(total=Sum('revenue'))
+        .filter(total__gt=0)
         .order_by('-total')
     )
-    category_labels = [row['product__category__name'] or 'Uncategorized' for row in category_rows]
+    category_labels = [row['category__name'] or 'Uncategorized' for row in category_rows]
     category_values = [float(row['total'] or 0) for row in category_rows]
 
     return render(request, 'admin/dashboard.html', {
-        'total_orders': total_orders,
-        'pending_count': pending_count,
-        'processing_count': processing_count,
+        'total_orders': order_counts['total'],
+        'pending_count': order_counts['pending'],
+        'processing_count': order_counts['processing'],
         'total_revenue': total_revenue,
         'recent_orders': recent_orders,
-        'total_products': total_products,
-        'low_stock_count': low_stock_count,
-        'out_of_stock_count': out_of_stock_count,
-        'total_stock': total_stock,
+        'total_products': product_counts['total'],
+        'low_stock_count': product_counts['low_stock'],
+        'out_of_stock_count': product_counts['out_of_stock'],
+        'total_stock': product_counts['total_stock'] or 0,
         'revenue_labels_json': json.dumps(revenue_labels),
         'revenue_values_json': json.dumps(revenue_values),
         'category_labels_json': json.dumps(category_labels),
@@ -581,24 +719,23 @@ def admin_dashboard(request):
 @login_required(login_url='login')
 @user_passes_test(admin_only, login_url='login')
 def admin_analytics(request):
-    all_orders = Order.objects.all()
-    completed_orders = Order.objects.filter(complete=True)
-    total_revenue = OrderItem.objects.filter(
-        order__complete=True
-    ).aggregate(total=Sum(F('quantity') * F('product__price')))['total'] or 0
-
-    total_orders = all_orders.count()
-    completed_orders_count = completed_orders.count()
+    order_counts = count_breakdown(
+        Order.objects.all(),
+        {'total': None, 'completed': Q(complete=True)},
+        {'status': Order.STATUS_CHOICES, 'payment_method': Order.PAYMENT_METHOD_CHOICES},
+    )
+    total_revenue = DailySalesRollup.objects.aggregate(total=Sum('revenue'))['total'] or 0
+
+    total_orders = order_counts['total']
+    completed_orders_count = order_counts['completed']
     avg_order_value = round(float(total_revenue) / completed_orders_count, 2) if completed_orders_count else 0
     
-    top_products = OrderItem.objects.filter(
-        order__complete=True
-    ).values(
+    top_products = DailySalesRollup.objects.values(
         'product__name', 'product__image'
     ).annotate(
         sales_count=Sum('quantity'),
-        total_revenue=Sum(F('quantity') * F('product__price'))
-    ).order_by('-total_revenue')[:10]
+        total_revenue=Sum('revenue')
+    ).filter(total_revenue__gt=0).order_by('-total_revenue')[:10]
     
     if top_products:
         max_revenue = top_products[0]['total_revenue']
@@ -607,24 +744,16 @@ def admin_analytics(request):
             image_path = product.get('product__image') or ''
             product['image_url'] = f"{settings.MEDIA_URL}{quote(str(image_path))}" if image_path else ''
     
-    sales_by_month = OrderItem.objects.filter(
-        order__complete=True,
-        order__date_ordered__gte=timezone.now() - timedelta(days=365)
-    ).annotate(
-        month=TruncMonth('order__date_ordered')
-    ).values('month').annotate(
-        revenue=Sum(F('quantity') * F('product__price'))
-    ).order_by('month')
-    
-    sales_labels = [item['month'].strftime('%b') for item in sales_by_month]
-    sales_data = [float(item['revenue']) for item in sales_by_month]
+    sales_by_month, _ = get_sales_series('365d', 'month')
+    sales_labels = [date.fromisoformat(item['start']).strftime('%b') for item in sales_by_month['buckets']]
+    sales_data = [item['revenue'] for item in sales_by_month['buckets']]
 
     status_choices = [choice[0] for choice in Order.STATUS_CHOICES]
     status_labels = status_choices
-    status_data = [all_orders.filter(status=status).count() for status in status_choices]
+    status_data = [order_counts['status'][status] for status in status_choices]
 
     payment_labels = [label for _, label in Order.PAYMENT_METHOD_CHOICES]
-    payment_data = [all_orders.filter(payment_method=value).count() for value, _ in Order.PAYMENT_METHOD_CHOICES]
+    payment_data = [order_counts['payment_method'][value] for value, _ in Order.PAYMENT_METHOD_CHOICES]
     
     return render(request, 'admin/analytics.html', {
         'total_revenue': total_revenue,
@@ -638,8 +767,28 @@ def admin_analytics(request):
         'status_data_json': json.dumps(status_data),
         'payment_labels_json': json.dumps(payment_labels),
         'payment_data_json': json.dumps(payment_data),
+        'analytics_ranges': list(ANALYTICS_RANGES),
+        'analytics_granularities': ANALYTICS_GRANULARITIES,
     })
 
+
+@login_required(login_url='login')
+@user_passes_test(admin_only, login_url='login')
+@require_GET
+def admin_analytics_api(request):
+    range_key = request.GET.get('range', '30d')
+    granularity = request.GET.get('granularity', 'day')
+    if range_key not in ANALYTICS_RANGES:
+        return JsonResponse({'success': False, 'error': 'Unknown range.'}, status=400)
+    if granularity not in ANALYTICS_GRANULARITIES:
+        return JsonResponse({'success': False, 'error': 'Unknown granularity.'}, status=400)
+
+    payload, state = get_sales_series(range_key, granularity)
+    response = JsonResponse(payload)
+    response['Cache-Control'] = 'private, no-cache'
+    response['X-Analytics-Cache'] = state
+    return response
+
 # ------------------ ADMIN PRODUCTS ------------------
 
 @login_required(login_url='login')
@@ -812,8 +961,14 @@ def admin_export_section(request, section):
     if not payload:
         return HttpResponseBadRequest('Unsupported export section.')
 
+    export_format = request.GET.get('format', 'csv').lower()
+    if request.GET.get('background') == '1':
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest('Unsupported export format.')
+        job = enqueue_job('export', {'section': section, 'format': export_format}, user=request.user)
+        return JsonResponse(_serialize_job(job), status=202)
+
     title, filename_base, headers, rows = payload
-    export_format = request.GET.get('format', 'csv')
     return _build_export_response(title, filename_base, headers, rows, export_format)
 
 
@@ -829,66 +984,67 @@ def admin_import_products(request):
     """Import products from uploaded CSV. CSV headers: id,name,slug,category,price,stock,available,description"""
     if request.method == 'POST' and request.FILES.get('csv_file'):
         csvfile = request.FILES['csv_file']
-        decoded = csvfile.read().decode('utf-8').splitlines()
-        reader = csv.DictReader(decoded)
-        created = 0
-        updated = 0
-
-        for row in reader:
-            # Basic field extraction
-            pid = row.get('id') or row.get('ID')
-            name = row.get('name') or row.get('Name')
-            slug = row.get('slug') or row.get('Slug')
-            category_name = row.get('category') or row.get('Category')
-            price = row.get('price') or 0
-            try:
-                stock = int(row.get('stock') or 0)
-            except ValueError:
-                stock = 0
-            available = row.get('available') in ('1', 'True', 'true', 'yes', 'Yes')
-            description = row.get('description') or ''
-
-            # Resolve or create category
-            cat = None
-            if category_name:
-                cat, _ = Category.objects.get_or_create(name=category_name, defaults={'slug': slugify(category_name)})
-
-            if pid:
-                try:
-                    prod = Product.objects.get(pk=int(pid))
-                    prod.name = name or prod.name
-                    prod.slug = slug or prod.slug
-                    if cat:
-                        prod.category = cat
-                    prod.price = price or prod.price
-                    prod.stock = stock
-                    prod.available = available
-                    prod.description = description
-                    prod.save()
-                    updated += 1
-                    continue
-                except Product.DoesNotExist:
-                    pid = None
-
-            # Create new product
-            if name:
-                p = Product.objects.create(
-                    name=name,
-                    slug=slug or generate_unique_slug(Product, name),
-                    category=cat,
-                    price=price or 0,
-                    stock=stock,
-                    description=description,
-                    available=available
-                )
-                created += 1
-
-        messages.success(request, f"Import complete: {created} created, {updated} updated.")
+        path = job_storage().save(f'imports/{uuid4().hex}.csv', csvfile)
+        job = enqueue_job('import_products', {'path': path, 'filename': csvfile.name}, user=request.user)
+        if _wants_json(request):
+            return JsonResponse(_serialize_job(job), status=202)
+        messages.success(request, f"Import queued as job #{job.id}.")
     else:
+        if _wants_json(request):
+            return HttpResponseBadRequest('No CSV file uploaded.')
         messages.error(request, "No CSV file uploaded.")
 
     return redirect('admin_products')
 
+# ------------------ ADMIN BACKGROUND JOBS ------------------
+
+def _wants_json(request):
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+
+def _serialize_job(job):
+    result = {key: value for key, value in job.result.items() if key != 'path'}
+    data = {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': min(100, round(job.progress * 100 / job.total)) if job.total else None,
+        'result': result,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': reverse('admin_job_status', args=[job.id]),
+    }
+    if job.status == 'done' and job.result.get('path'):
+        data['download_url'] = reverse('admin_job_download', args=[job.id])
+    return data
+
+
+@login_required(login_url='login')
+@user_passes_test(admin_only, login_url='login')
+@require_GET
+def admin_job_status(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    return JsonResponse(_serialize_job(job))
+
+
+@login_required(login_url='login')
+@user_passes_test(admin_only, login_url='login')
+@require_GET
+def admin_job_download(request, job_id):
+    job = get_object_or_404(Job, pk=job_id, status='done')
+    path = job.result.get('path')
+    if not path or not job_storage().exists(path):
+        raise Http404('Export file is no longer available.')
+    return FileResponse(
+        job_storage().open(path, 'rb'),
+        as_attachment=True,
+        filename=job.result.get('filename') or os.path.basename(path),
+        content_type=job.result.get('content_type'),
+    )
+
 # ------------------ ADMIN MEDIA / GALLERY ------------------
 
 @login_required(login_url='login')
@@ -1151,7 +1307,15 @@ def admin_campaigns(request):
         content = request.POST.get('content')
         action = request.POST.get('action', 'draft')
         
-        if action == 'send':
+        if action == 'send' and settings.CAMPAIGN_EMAILS_ENABLED:
+            campaign = Campaign.objects.create(
+                subject=subject,
+                content=content,
+                status='Scheduled'
+            )
+            job = enqueue_job('campaign_send', {'campaign_id': campaign.id}, user=request.user)
+            messages.success(request, f"Campaign '{subject}' queued for sending (job #{job.id}).")
+        elif action == 'send':
             Campaign.objects.create(
                 subject=subject,
                 content=content,
@@ -1235,10 +1399,6 @@ def admin_blog(request):
 
 # ------------------ CART & PAYMENT ------------------
 
-client = razorpay.Client(
-    auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
-)
-
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required, user_passes_test
@@ -1321,14 +1481,19 @@ def admin_contact_messages(request):
     
     paginator = Paginator(messages_list, 15)
     page_obj = paginator.get_page(request.GET.get('page'))
+    message_counts = count_breakdown(ContactMessage.objects.all(), {
+        'total': None,
+        'unread': Q(is_read=False),
+        'read': Q(is_read=True),
+    })
     
     context = {
         'messages': page_obj,
         'page_obj': page_obj,
         'is_paginated': page_obj.has_other_pages(),
-        'total_messages': ContactMessage.objects.count(),
-        'unread_count': ContactMessage.objects.filter(is_read=False).count(),
-        'read_count': ContactMessage.objects.filter(is_read=True).count(),
+        'total_messages': message_counts['total'],
+        'unread_count': message_counts['unread'],
+        'read_count': message_counts['read'],
         'filter_status': filter_status,
     }
     return render(request, 'admin/admin_contact_messages.html', context)
@@ -1410,9 +1575,16 @@ from decimal import Decimal, InvalidOperation
 from django.views.decorators.http import require_GET, require_POST
 
 
+ORDER_HISTORY_PAGE_SIZE = 20
+ORDER_SUMMARY_FIELDS = (
+    'id', 'date_ordered', 'status', 'payment_method', 'complete', 'transaction_id', 'total', 'item_count',
+)
+MIN_ORDER_VALUE = Decimal('30.00')
+MAX_QUOTE_LINES = 100
+
+
 def get_site_settings():
-    settings_obj, _ = SiteSetting.objects.get_or_create(id=1)
-    return settings_obj
+    return get_cached_site_settings()
 
 
 def get_customer_for_user(user):
@@ -1436,10 +1608,8 @@ def get_customer_for_user(user):
     return customer
 
 
-def parse_checkout_items(raw_items):
-    parsed_items = []
-    product_ids = []
-
+def _normalize_cart_lines(raw_items):
+    lines = []
     for raw_item in raw_items:
         product_id = raw_item.get('id')
         quantity = raw_item.get('quantity', 1)
@@ -1453,10 +1623,17 @@ def parse_checkout_items(raw_items):
         if quantity <= 0:
             continue
 
-        product_ids.append(product_id)
-        parsed_items.append({'id': product_id, 'quantity': quantity})
+        lines.append({'id': product_id, 'quantity': quantity})
+    return lines
 
-    products = Product.objects.filter(id__in=product_ids, available=True)
+
+def _clamp_quantity(quantity, free_stock):
+    return min(quantity, max(free_stock, 1)) if free_stock else quantity
+
+
+def parse_checkout_items(raw_items):
+    parsed_items = _normalize_cart_lines(raw_items)
+    products = Product.objects.filter(id__in=[item['id'] for item in parsed_items], available=True)
     product_map = {product.id: product for product in products}
 
     valid_items = []
@@ -1467,7 +1644,7 @@ def parse_checkout_items(raw_items):
         if not product:
             continue
 
-        quantity = min(item['quantity'], max(product.stock, 1)) if product.stock else item['quantity']
+        quantity = _clamp_quantity(item['quantity'], product.available_stock)
         line_total = product.price * quantity
         subtotal += line_total
         valid_items.append({
@@ -1482,11 +1659,13 @@ def parse_checkout_items(raw_items):
 def build_checkout_totals(items, site_info, shipping_override=None):
     subtotal = sum((item['line_total'] for item in items), Decimal('0.00'))
     tax_rate = Decimal(str(site_info.tax_rate))
-    if shipping_override is not None:
+    if not items:
+        # Nothing to ship, whatever rate the pincode or distance would select.
+        shipping = Decimal('0.00')
+    elif shipping_override is not None:
         shipping = Decimal(str(shipping_override))
     else:
-        shipping_rate = Decimal(str(site_info.shipping_flat_rate))
-        shipping = shipping_rate if items else Decimal('0.00')
+        shipping = Decimal(str(site_info.shipping_flat_rate))
     tax = (subtotal * tax_rate) / Decimal('100.00')
     total = subtotal + shipping + tax
     return {
@@ -1498,72 +1677,34 @@ def build_checkout_totals(items, site_info, shipping_override=None):
 
 
 def create_order_records(customer, items, payment_method, totals, shipping_data):
-    order = Order.objects.create(
-        customer=customer,
-        complete=False,
-        payment_method=payment_method,
-        status='Pending',
-    )
-
-    for item in items:
-        OrderItem.objects.create(
-            order=order,
-            product=item['product'],
-            quantity=item['quantity'],
+    cents = Decimal('0.01')
+    with transaction.atomic():
+        order = Order.objects.create(
+            customer=customer,
+            complete=False,
+            payment_method=payment_method,
+            status='Pending',
+            subtotal=totals['subtotal'].quantize(cents),
+            tax=totals['tax'].quantize(cents),
+            shipping=totals['shipping'].quantize(cents),
+            total=totals['total'].quantize(cents),
+            item_count=sum(item['quantity'] for item in items),
         )
 
-    ShippingAddress.objects.create(
-        customer=customer,
-        order=order,
-        address=shipping_data['address'],
-        city=shipping_data['city'],
-        state=shipping_data['state'],
-        zipcode=shipping_data['zipcode'],
-    )
-
-    return order
-
-
-def finalize_order(order, payment_id=''):
-    if order.complete:
-        return order
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item['product'], quantity=item['quantity'], unit_price=item['product'].price)
+            for item in items
+        ])
 
-    for order_item in order.orderitem_set.select_related('product'):
-        product = order_item.product
-        if not product:
-            continue
-        if product.stock >= order_item.quantity:
-            product.stock -= order_item.quantity
-        else:
-            product.stock = 0
-        product.available = product.stock > 0
-        product.save(update_fields=['stock', 'available', 'updated_at'])
-
-    order.complete = True
-    order.status = 'Processing'
-    if payment_id:
-        order.razorpay_payment_id = payment_id
-        order.transaction_id = payment_id
-    elif order.payment_method == 'COD':
-        order.transaction_id = f'COD-{order.id}'
-    order.save()
-    return order
-
-
-def restock_order(order):
-    if not order.complete:
-        return order
-
-    for order_item in order.orderitem_set.select_related('product'):
-        product = order_item.product
-        if not product:
-            continue
-        product.stock += order_item.quantity
-        product.available = product.stock > 0
-        product.save(update_fields=['stock', 'available', 'updated_at'])
+        ShippingAddress.objects.create(
+            customer=customer,
+            order=order,
+            address=shipping_data['address'],
+            city=shipping_data['city'],
+            state=shipping_data['state'],
+            zipcode=shipping_data['zipcode'],
+        )
 
-    order.complete = False
-    order.save(update_fields=['complete'])
     return order
 
 
@@ -1593,10 +1734,7 @@ def _restock_return_request(return_request):
 
 
 def payment_keys_configured():
-    key_id = getattr(settings, 'RAZORPAY_KEY_ID', '') or ''
-    key_secret = getattr(settings, 'RAZORPAY_KEY_SECRET', '') or ''
-    invalid_markers = {'rzp_test_YOUR_KEY_HERE', 'YOUR_SECRET_HERE', ''}
-    return key_id not in invalid_markers and key_secret not in invalid_markers
+    return get_gateway().configured
 
 
 def cart_page(request):
@@ -1607,6 +1745,69 @@ def cart_page(request):
 
 
 
+def _parse_quote_items(value):
+    raw_items = []
+    for part in (value or '').split(',')[:MAX_QUOTE_LINES]:
+        product_id, _, quantity = part.partition(':')
+        raw_items.append({'id': product_id.strip(), 'quantity': quantity.strip() or 1})
+    return _normalize_cart_lines(raw_items)
+
+
+@require_GET
+def cart_quote(request):
+    """Price the cart from the cached price/stock snapshots.
+
+    ``items`` is ``id:qty,id:qty``; ``pincode`` and ``delivery_km`` are
+    optional and select the shipping rate. The response carries an ETag, so
+    an unchanged cart re-polled by the client is a 304.
+    """
+    lines = _parse_quote_items(request.GET.get('items'))
+    snapshots = get_price_snapshots([line['id'] for line in lines])
+
+    items = []
+    quoted = []
+    unavailable = []
+    for line in lines:
+        snapshot = snapshots.get(line['id'])
+        if not snapshot:
+            unavailable.append(line['id'])
+            continue
+
+        price = Decimal(snapshot['price'])
+        quantity = _clamp_quantity(line['quantity'], snapshot['available_stock'])
+        line_total = price * quantity
+        items.append({'line_total': line_total, 'quantity': quantity})
+        quoted.append({
+            'id': line['id'],
+            'name': snapshot['name'],
+            'quantity': quantity,
+            'requested_quantity': line['quantity'],
+            'unit_price': f'{price:.2f}',
+            'line_total': f'{line_total:.2f}',
+            'available_stock': snapshot['available_stock'],
+        })
+
+    shipping_override = quote_shipping(request.GET.get('pincode'), request.GET.get('delivery_km'))
+    totals = build_checkout_totals(items, get_site_settings(), shipping_override=shipping_override)
+    data = {
+        'items': quoted,
+        'unavailable': unavailable,
+        'item_count': sum(item['quantity'] for item in items),
+        'min_order': f'{MIN_ORDER_VALUE:.2f}',
+        'meets_min_order': totals['subtotal'] >= MIN_ORDER_VALUE,
+    }
+    data.update({name: f'{value:.2f}' for name, value in totals.items()})
+
+    body = json.dumps(data, sort_keys=True)
+    etag = f'"{hashlib.md5(body.encode(), usedforsecurity=False).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 def wishlist_page(request):
     featured_products = Product.objects.filter(available=True).select_related('category')[:6]
     return render(request, 'wishlist.html', {
@@ -1630,6 +1831,7 @@ def checkout(request):
 
 @login_required
 @require_POST
+@idempotent('checkout')
 def create_checkout_order(request):
     try:
         payload = json.loads(request.body)
@@ -1661,8 +1863,7 @@ def create_checkout_order(request):
         return JsonResponse({'success': False, 'error': 'Your cart is empty.'}, status=400)
 
     # Minimum order check: Rs. 30
-    MIN_ORDER = Decimal('30.00')
-    if subtotal < MIN_ORDER:
+    if subtotal < MIN_ORDER_VALUE:
         return JsonResponse({'success': False, 'error': f'Minimum order value is ₹30. Your current total is ₹{subtotal:.2f}.'}, status=400)
 
     customer = get_customer_for_user(request.user)
@@ -1672,27 +1873,25 @@ def create_checkout_order(request):
     customer.address = shipping_data['address']
     customer.save()
 
-    # Distance-based shipping: under 10 km = flat Rs.30; beyond = Rs.5 per km
-    try:
-        delivery_km = float(payload.get('delivery_km') or 0)
-    except (TypeError, ValueError):
-        delivery_km = 0
-
-    if delivery_km > 0:
-        if delivery_km <= 10:
-            shipping_override = 30.0
-        else:
-            shipping_override = delivery_km * 5.0
-    else:
-        shipping_override = None  # fall back to site flat rate
-
     site_info = get_site_settings()
+    shipping_override = quote_shipping(shipping_data['zipcode'], payload.get('delivery_km'))
     totals = build_checkout_totals(items, site_info, shipping_override=shipping_override)
-    order = create_order_records(customer, items, payment_method, totals, shipping_data)
+    try:
+        with transaction.atomic():
+            order = create_order_records(customer, items, payment_method, totals, shipping_data)
+            if payment_method == 'COD':
+                finalize_order(order, strict=True)
+            else:
+                reserve_stock(order, order_quantities(order))
+    except InsufficientStock as exc:
+        return JsonResponse({
+            'success': False,
+            'error': 'Some items in your cart just sold out. Please review your cart and try again.',
+            'unavailable': exc.product_ids,
+        }, status=409)
     request.session['latest_order_id'] = order.id
 
     if payment_method == 'COD':
-        finalize_order(order)
         return JsonResponse({
             'success': True,
             'mode': 'cod',
@@ -1700,17 +1899,22 @@ def create_checkout_order(request):
         })
 
     if not payment_keys_configured():
+        release_order_reservations(order)
         order.delete()
         return JsonResponse({'success': False, 'error': 'Razorpay keys are not configured in Django settings yet.'}, status=400)
 
     amount_paise = int(totals['total'] * 100)
     if amount_paise < 100:  # Razorpay minimum is Rs. 1 (100 paise)
         amount_paise = 100
-    razorpay_order = client.order.create({
-        'amount': amount_paise,
-        'currency': 'INR',
-        'payment_capture': '1',
-    })
+    try:
+        razorpay_order = get_gateway().create_order(amount_paise, 'INR', receipt=f'order_{order.id}')
+    except PaymentGatewayError:
+        release_order_reservations(order)
+        order.delete()
+        return JsonResponse({
+            'success': False,
+            'error': 'Online payments are temporarily unavailable. Please try again shortly or choose Cash on Delivery.',
+        }, status=503)
 
     order.razorpay_order_id = razorpay_order['id']
     order.transaction_id = razorpay_order['id']
@@ -1735,9 +1939,15 @@ def create_checkout_order(request):
     })
 
 
+def _verify_payment_key(request):
+    # Razorpay's payment id identifies the payment, so retries dedupe without a header.
+    return request.POST.get('razorpay_payment_id')
+
+
 @csrf_exempt
 @login_required
 @require_POST
+@idempotent('verify_payment', key_func=_verify_payment_key)
 def verify_payment(request):
     payload = {
         'razorpay_payment_id': request.POST.get('razorpay_payment_id'),
@@ -1748,9 +1958,9 @@ def verify_payment(request):
     if not all(payload.values()):
         return JsonResponse({'status': 'error', 'error': 'Missing payment verification data.'}, status=400)
 
-    try:
-        client.utility.verify_payment_signature(payload)
-    except Exception:
+    if not get_gateway().verify_payment_signature(
+        payload['razorpay_order_id'], payload['razorpay_payment_id'], payload['razorpay_signature'],
+    ):
         return JsonResponse({'status': 'error', 'error': 'Payment signature verification failed.'}, status=400)
 
     order = get_object_or_404(Order, razorpay_order_id=payload['razorpay_order_id'])
@@ -1759,6 +1969,18 @@ def verify_payment(request):
     return JsonResponse({'status': 'success', 'redirect_url': '/payment-success/'})
 
 
+@csrf_exempt
+@require_POST
+def razorpay_webhook(request):
+    # Verify, store and acknowledge; process_payment_events applies the event later.
+    if not get_gateway().verify_webhook_signature(request.body, request.headers.get('X-Razorpay-Signature')):
+        return JsonResponse({'status': 'error', 'error': 'Invalid webhook signature.'}, status=400)
+
+    event_id = request.headers.get('X-Razorpay-Event-Id') or hashlib.sha256(request.body).hexdigest()
+    PaymentEvent.objects.create(event_id=event_id[:100], body=request.body.decode('utf-8', 'replace'))
+    return JsonResponse({'status': 'ok'})
+
+
 @login_required
 def payment_success(request):
     order_id = request.session.get('latest_order_id')
@@ -1771,13 +1993,59 @@ def payment_success(request):
 @login_required
 def my_orders(request):
     customer = get_customer_for_user(request.user)
-    orders = (
-        Order.objects.filter(customer=customer)
-        .select_related('customer')
-        .prefetch_related('orderitem_set__product', 'shippingaddress_set', 'return_requests__order_item__product')
-        .order_by('-date_ordered')
+    history = Order.objects.filter(customer=customer)
+
+    # Summary cards only need the totals stored on the order row; items,
+    # address and returns are fetched per order from my_order_detail_api.
+    orders = history.only(*ORDER_SUMMARY_FIELDS).order_by('-date_ordered', '-id')
+    cursor = _decode_cursor(request.GET.get('cursor'), _parse_cursor_datetime)
+    orders = _keyset_after(orders, 'date_ordered', True, cursor)
+
+    page = list(orders[:ORDER_HISTORY_PAGE_SIZE + 1])
+    next_cursor = ''
+    if len(page) > ORDER_HISTORY_PAGE_SIZE:
+        page = page[:ORDER_HISTORY_PAGE_SIZE]
+        next_cursor = _encode_cursor([page[-1].date_ordered.isoformat(), page[-1].id])
+
+    return render(request, 'my_orders.html', {
+        'orders': page,
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
+        'order_count': history.count(),
+        'latest_status': history.order_by('-date_ordered', '-id').values_list('status', flat=True).first(),
+    })
+
+
+@login_required
+@require_GET
+def my_order_detail_api(request, order_id):
+    customer = get_customer_for_user(request.user)
+    order = get_object_or_404(Order.objects.only(*ORDER_SUMMARY_FIELDS), id=order_id, customer=customer)
+    items = order.orderitem_set.select_related('product').only(
+        'quantity', 'unit_price', 'product__id', 'product__name',
     )
-    return render(request, 'my_orders.html', {'orders': orders})
+    address = order.shippingaddress_set.only('address', 'city', 'state', 'zipcode').first()
+    latest_return = order.return_requests.only('status', 'created_at').order_by('-created_at').first()
+
+    return JsonResponse({
+        'id': order.id,
+        'items': [{
+            'name': item.product.name if item.product else 'Removed product',
+            'url': reverse('product_detail', args=[item.product.id]) if item.product else '',
+            'quantity': item.quantity,
+            'unit_price': str(item.unit_price),
+            'line_total': str(item.get_total),
+        } for item in items],
+        'shipping_address': {
+            'address': address.address,
+            'city': address.city,
+            'state': address.state,
+            'zipcode': address.zipcode,
+        } if address else None,
+        'return_status': latest_return.status if latest_return else '',
+        'can_request_return': _can_request_return(order),
+        'return_url': reverse('return_product', args=[order.id]),
+    })
 
 
 @login_required
@@ -1856,13 +2124,122 @@ def submit_return_request(request, order_id):
 @login_required(login_url='login')
 @user_passes_test(admin_only, login_url='login')
 def admin_orders(request):
+    # Read the cursor first: anything written while the page renders is
+    # streamed again rather than missed.
+    change_cursor = latest_change_cursor()
+    filtered, filters = _filter_admin_orders(Order.objects.all(), request.GET)
+    # Prefetches run on the sliced page below, so only its orders load items.
     orders = (
-        Order.objects.all()
-        .select_related('customer')
+        filtered.select_related('customer')
         .prefetch_related('orderitem_set__product', 'shippingaddress_set')
-        .order_by('-date_ordered')
+        .order_by('-date_ordered', '-id')
     )
-    return render(request, 'admin/orders_realtime.html', {'orders': orders})
+    cursor = _decode_cursor(request.GET.get('cursor'), _parse_cursor_datetime)
+    orders = _keyset_after(orders, 'date_ordered', True, cursor)
+
+    page = list(orders[:ORDER_FEED_PAGE_SIZE + 1])
+    next_cursor = ''
+    if len(page) > ORDER_FEED_PAGE_SIZE:
+        page = page[:ORDER_FEED_PAGE_SIZE]
+        next_cursor = _encode_cursor([page[-1].date_ordered.isoformat(), page[-1].id])
+
+    active_filters = {name: value for name, value in filters.items() if value}
+    return render(request, 'admin/orders_realtime.html', {
+        'orders': page,
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
+        'change_cursor': change_cursor,
+        'status_choices': Order.STATUS_CHOICES,
+        'payment_method_choices': Order.PAYMENT_METHOD_CHOICES,
+        'filters': filters,
+        'is_filtered': bool(active_filters),
+        'filter_query': urlencode(active_filters),
+    })
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _parse_filter_date(value):
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def _filter_admin_orders(orders, params):
+    """Apply the admin order list filters; returns (queryset, cleaned filter values).
+
+    Dates become a half-open range on date_ordered itself so the
+    (status|complete, date_ordered) indexes stay usable.
+    """
+    filters = {name: (params.get(name) or '').strip() for name in ('q', 'status', 'payment', 'confirmed', 'from', 'to')}
+
+    if filters['status'] in dict(Order.STATUS_CHOICES):
+        orders = orders.filter(status=filters['status'])
+    else:
+        filters['status'] = ''
+    if filters['payment'] in dict(Order.PAYMENT_METHOD_CHOICES):
+        orders = orders.filter(payment_method=filters['payment'])
+    else:
+        filters['payment'] = ''
+    if filters['confirmed'] in ('yes', 'no'):
+        orders = orders.filter(complete=filters['confirmed'] == 'yes')
+    else:
+        filters['confirmed'] = ''
+
+    date_from = _parse_filter_date(filters['from'])
+    date_to = _parse_filter_date(filters['to'])
+    if date_from:
+        orders = orders.filter(date_ordered__gte=_start_of_day(date_from))
+    if date_to:
+        orders = orders.filter(date_ordered__lt=_start_of_day(date_to + timedelta(days=1)))
+    filters['from'] = date_from.isoformat() if date_from else ''
+    filters['to'] = date_to.isoformat() if date_to else ''
+
+    query = filters['q']
+    if query:
+        order_id = query.lstrip('#')
+        if order_id.isdigit():
+            orders = orders.filter(pk=int(order_id))
+        elif query.startswith('order_'):
+            orders = orders.filter(razorpay_order_id=query)
+        else:
+            orders = orders.filter(customer__email__istartswith=query)
+    return orders, filters
+
+
+def _parse_change_cursor(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+@login_required(login_url='login')
+@user_passes_test(admin_only, login_url='login')
+@require_GET
+async def admin_orders_stream(request):
+    """Server-Sent Events feed of new and updated orders after a change cursor.
+
+    EventSource resends the last event id on reconnect, which takes priority
+    over the ``cursor`` the page was rendered with.
+    """
+    cursor = _parse_change_cursor(request.headers.get('Last-Event-ID'))
+    if cursor is None:
+        cursor = _parse_change_cursor(request.GET.get('cursor'))
+    if cursor is None:
+        cursor = await sync_to_async(latest_change_cursor)()
+
+    if isinstance(request, ASGIRequest):
+        events = stream_order_changes(cursor)
+    else:
+        events = iter_order_changes_once(cursor)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @login_required(login_url='login')
@@ -1879,12 +2256,19 @@ def admin_returns(request):
         .order_by('-created_at')
     )
 
+    return_counts = count_breakdown(ReturnRequest.objects.all(), {
+        'total': None,
+        'pending': Q(status='Pending'),
+        'approved': Q(status='Approved'),
+        'completed': Q(status__in=['Received', 'Refunded']),
+    })
+
     return render(request, 'admin/returns.html', {
         'return_requests': return_requests,
-        'return_count': return_requests.count(),
-        'pending_count': return_requests.filter(status='Pending').count(),
-        'approved_count': return_requests.filter(status='Approved').count(),
-        'completed_count': return_requests.filter(status__in=['Received', 'Refunded']).count(),
+        'return_count': return_counts['total'],
+        'pending_count': return_counts['pending'],
+        'approved_count': return_counts['approved'],
+        'completed_count': return_counts['completed'],
         'status_choices': ReturnRequest.STATUS_CHOICES,
     })
 
@@ -0,0 +1,94 @@
+import json
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import PaymentEvent
+from .orders import finalize_paid_orders
+
+
+logger = logging.getLogger('core.webhooks')
+
+EVENT_BATCH_SIZE = 500
+PAID_EVENTS = {'payment.captured', 'order.paid'}
+
+
+def _paid_payment(body):
+    """Return (razorpay_order_id, payment_id) for a paid-payment event, or None.
+
+    Raises ValueError, KeyError, TypeError or AttributeError for a body that
+    isn't shaped like a Razorpay event.
+    """
+    event = json.loads(body)
+    if event.get('event') not in PAID_EVENTS:
+        return None
+    payment = event['payload']['payment']['entity']
+    if not payment.get('order_id'):
+        return None
+    return payment['order_id'], payment['id']
+
+
+def _process_batch(events):
+    # Razorpay redelivers until acknowledged and may send both payment.captured
+    # and order.paid for one payment, so dedupe on the event id first.
+    seen = set(
+        PaymentEvent.objects.filter(event_id__in={event_id for _, event_id, _ in events}, processed_at__isnull=False)
+        .values_list('event_id', flat=True)
+    )
+    outcomes = {}
+    payments = {}
+    claims = {}
+    for pk, event_id, body in events:
+        if event_id in seen:
+            outcomes[pk] = 'duplicate'
+            continue
+        seen.add(event_id)
+
+        try:
+            paid = _paid_payment(body)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logger.warning('Unreadable payment event %s', event_id)
+            outcomes[pk] = 'invalid'
+            continue
+        if paid is None:
+            outcomes[pk] = 'ignored'
+            continue
+        payments.setdefault(paid[0], paid[1])
+        claims[pk] = paid[0]
+
+    finalized = set(finalize_paid_orders(payments))
+    for pk, razorpay_order_id in claims.items():
+        if razorpay_order_id in finalized:
+            outcomes[pk] = 'finalized'
+            finalized.discard(razorpay_order_id)
+        else:
+            outcomes[pk] = 'skipped'
+
+    now = timezone.now()
+    grouped = {}
+    for pk, outcome in outcomes.items():
+        grouped.setdefault(outcome, []).append(pk)
+    for outcome, pks in grouped.items():
+        PaymentEvent.objects.filter(pk__in=pks).update(processed_at=now, outcome=outcome)
+    return Counter(outcomes.values())
+
+
+def process_payment_events(batch_size=EVENT_BATCH_SIZE):
+    """Apply stored webhook events in arrival order, one batch per transaction.
+
+    Paid orders in a batch are finalized together with a single stock update.
+    Run one processor at a time. Returns a Counter of outcomes.
+    """
+    totals = Counter()
+    while True:
+        with transaction.atomic():
+            events = list(
+                PaymentEvent.objects.filter(processed_at__isnull=True)
+                .order_by('id')
+                .values_list('id', 'event_id', 'body')[:batch_size]
+            )
+            if not events:
+                return totals
+            totals += _process_batch(events)
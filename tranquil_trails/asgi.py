@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+Serve through this module (e.g. with uvicorn) for the admin live order feed:
+under ASGI its Server-Sent Events stream stays open without holding a
+worker, while under WSGI each feed request returns a single batch.
 """
 
 import os
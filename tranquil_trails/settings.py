@@ -92,6 +92,18 @@ DATABASES = {
     }
 }
 
+# Cache
+# The backend must be shared by every gunicorn worker: version stamps stored
+# here are how a save in one worker invalidates the others' cached settings,
+# home sections and shipping rates. The file cache works on a single host;
+# point DJANGO_CACHE_BACKEND at Redis/Memcached when running on several.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', str(BASE_DIR / '.django_cache')),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -135,11 +147,62 @@ STORAGES = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = Path(os.environ.get('DJANGO_MEDIA_ROOT', BASE_DIR / 'media'))
 
+# Background job files (import uploads, finished exports) hold customer and
+# order data, so they live outside MEDIA_ROOT and are only served by the
+# authenticated download view. The worker deletes them after JOB_FILES_TTL.
+JOB_FILES_ROOT = Path(os.environ.get('JOB_FILES_ROOT', BASE_DIR / 'job_files'))
+JOB_FILES_TTL = int(os.environ.get('JOB_FILES_TTL', 24 * 60 * 60))
+STORAGES['job_files'] = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': JOB_FILES_ROOT},
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Razorpay Settings
 RAZORPAY_KEY_ID = os.environ.get('RAZORPAY_KEY_ID', 'rzp_test_SbbbAKhDflCVYY')
 RAZORPAY_KEY_SECRET = os.environ.get('RAZORPAY_KEY_SECRET', 'UgFNil6UWnzEhTSrHg7AqGLU')
+# Set in the Razorpay dashboard for the /webhooks/razorpay/ endpoint; webhooks are rejected while empty.
+RAZORPAY_WEBHOOK_SECRET = os.environ.get('RAZORPAY_WEBHOOK_SECRET', '')
+
+# Payment gateway backend: 'razorpay', or 'fake' for tests and local load runs
+PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY', 'razorpay')
+PAYMENT_GATEWAY_CONNECT_TIMEOUT = float(os.environ.get('PAYMENT_GATEWAY_CONNECT_TIMEOUT', 3.05))
+PAYMENT_GATEWAY_READ_TIMEOUT = float(os.environ.get('PAYMENT_GATEWAY_READ_TIMEOUT', 10))
+PAYMENT_GATEWAY_RETRIES = int(os.environ.get('PAYMENT_GATEWAY_RETRIES', 2))
+# Total time one gateway call may spend on attempts and backoff. Keep it well
+# under gunicorn's worker timeout (30s by default).
+PAYMENT_GATEWAY_MAX_CALL_SECONDS = float(os.environ.get('PAYMENT_GATEWAY_MAX_CALL_SECONDS', 20))
+PAYMENT_GATEWAY_POOL_SIZE = int(os.environ.get('PAYMENT_GATEWAY_POOL_SIZE', 10))
+PAYMENT_GATEWAY_BREAKER_THRESHOLD = int(os.environ.get('PAYMENT_GATEWAY_BREAKER_THRESHOLD', 5))
+PAYMENT_GATEWAY_BREAKER_RESET = float(os.environ.get('PAYMENT_GATEWAY_BREAKER_RESET', 30))
+
+# How long a successful checkout/verify response is replayed for a retried Idempotency-Key (seconds)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+# How long an in-flight request holds its key before a retry may take it over (seconds)
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# Off by default: "Send" only marks a campaign Sent. When on, sending queues a
+# background job that emails the campaign to every customer address.
+CAMPAIGN_EMAILS_ENABLED = env_bool('CAMPAIGN_EMAILS_ENABLED', False)
+
+# How long an unpaid online checkout holds its stock (seconds)
+STOCK_RESERVATION_TTL = int(os.environ.get('STOCK_RESERVATION_TTL', 15 * 60))
+
+# Admin analytics series are served from cache; after ANALYTICS_FRESH_SECONDS a
+# request gets the cached copy while a background thread recomputes it.
+ANALYTICS_FRESH_SECONDS = int(os.environ.get('ANALYTICS_FRESH_SECONDS', 60))
+ANALYTICS_CACHE_TIMEOUT = int(os.environ.get('ANALYTICS_CACHE_TIMEOUT', 60 * 60))
+ANALYTICS_BACKGROUND_REFRESH = env_bool('ANALYTICS_BACKGROUND_REFRESH', True)
+
+# Live admin order feed (Server-Sent Events). Under ASGI a stream polls the
+# change log every ORDER_FEED_POLL_SECONDS and closes after ORDER_FEED_MAX_SECONDS
+# so the browser reconnects; under WSGI each request returns one batch.
+ORDER_FEED_POLL_SECONDS = float(os.environ.get('ORDER_FEED_POLL_SECONDS', 2))
+ORDER_FEED_MAX_SECONDS = int(os.environ.get('ORDER_FEED_MAX_SECONDS', 5 * 60))
+# How long the change log is kept by prune_order_changes (seconds). A page
+# reconnecting with an older cursor is told to reload.
+ORDER_FEED_RETENTION_SECONDS = int(os.environ.get('ORDER_FEED_RETENTION_SECONDS', 24 * 60 * 60))
 
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
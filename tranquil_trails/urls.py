@@ -11,6 +11,8 @@ urlpatterns = [
     # ===== MAIN SITE PAGES =====
     path('', views.home, name='home'),
     path('shop/', views.shop, name='shop'),
+    path('api/shop/products/', views.shop_products_api, name='shop_products_api'),
+    path('api/search/', views.search_api, name='search_api'),
     path('product/<int:pk>/', views.product_detail, name='product_detail'),
 
     # Gallery
@@ -50,12 +52,15 @@ urlpatterns = [
 
     # ===== Cart & Payments =====
     path('cart/', views.cart_page, name='cart'),
+    path('api/cart/quote/', views.cart_quote, name='cart_quote'),
     path('wishlist/', views.wishlist_page, name='wishlist'),
     path('checkout/', views.checkout, name='checkout'),
     path('checkout/create-order/', views.create_checkout_order, name='create_checkout_order'),
     path('verify-payment/', views.verify_payment, name='verify_payment'),
+    path('webhooks/razorpay/', views.razorpay_webhook, name='razorpay_webhook'),
     path('payment-success/', views.payment_success, name='payment_success'),
     path('my-orders/', views.my_orders, name='my_orders'),
+    path('api/my-orders/<int:order_id>/', views.my_order_detail_api, name='my_order_detail_api'),
     path('return-product/<int:order_id>/', views.return_product, name='return_product'),
     path('return-product/<int:order_id>/submit/', views.submit_return_request, name='submit_return_request'),
 
@@ -65,6 +70,7 @@ urlpatterns = [
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin-analytics/', views.admin_analytics, name='admin_analytics'),
+    path('admin-analytics/api/sales/', views.admin_analytics_api, name='admin_analytics_api'),
 
     # Products
     path('admin-products/', views.admin_products, name='admin_products'),
@@ -84,6 +90,10 @@ urlpatterns = [
     path('admin-edit-category/<int:pk>/', views.admin_edit_category, name='admin_edit_category'),
     path('admin-delete-category/<int:pk>/', views.admin_delete_category, name='admin_delete_category'),
 
+    # Background jobs
+    path('admin/jobs/<int:job_id>/', views.admin_job_status, name='admin_job_status'),
+    path('admin/jobs/<int:job_id>/download/', views.admin_job_download, name='admin_job_download'),
+
     # Gallery / Media
     path('admin-media/', views.admin_media, name='admin_media'),
     path('admin/media/', views.admin_media, name='admin_media'),
@@ -100,6 +110,7 @@ urlpatterns = [
     # Orders
     path('admin-orders/', views.admin_orders, name='admin_orders'),
     path('admin/orders/', views.admin_orders, name='admin_orders'),
+    path('admin-orders/stream/', views.admin_orders_stream, name='admin_orders_stream'),
     path('admin/orders/<int:order_id>/status/', views.admin_update_order_status, name='admin_update_order_status'),
     path('admin-returns/', views.admin_returns, name='admin_returns'),
     path('admin/returns/', views.admin_returns, name='admin_returns'),